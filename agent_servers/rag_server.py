@@ -9,7 +9,14 @@ from dotenv import load_dotenv
 load_dotenv(override=True)
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from backend.utils.llamaindex_utils import retrieve_chunks
+from backend.utils.llamaindex_utils import RETRIEVAL_MODE, retrieve_chunks
+from backend.utils.query_cache import embed_query, get_query_cache_stats
+from backend.utils.answer_cache import SEMANTIC_CACHE_ENABLED, lookup_answer, store_answer, get_answer_cache_stats
+from backend.utils.embedding_service import get_embedding_service_stats
+from backend.utils.context_assembly import CONTEXT_FETCH_K, assemble_context
+from backend.utils.reranker import RERANK_CANDIDATES, RERANK_ENABLED, get_reranker, get_rerank_stats, rerank
+from starlette.requests import Request
+from starlette.responses import JSONResponse
 MODEL = os.getenv("MODEL")
 
 mcp = FastMCP(
@@ -19,21 +26,56 @@ mcp = FastMCP(
     port = 8050
 )
 
-@traceable(run_type="retriever", name="retrieve_chunks_from_db")
-def traced_retrieve_chunks(query: str, k: int = 5):
-    """
-    Recupera chunks y los retorna en formato compatible con LangSmith para visualizacion.
-    """
-    top_chunks = retrieve_chunks(query, k)
+def _to_documents(chunks) -> list:
+    """Formato compatible con LangSmith para visualizacion"""
     return [
         {
             "page_content": chunk.text,
             "type": "Document",
-            "metadata": getattr(chunk, "metadata", {})
+            "metadata": {**getattr(chunk, "metadata", {}), "score": getattr(chunk, "score", None)}
         }
-        for chunk in top_chunks
+        for chunk in chunks
     ]
 
+@traceable(run_type="retriever", name="first_stage_retrieval")
+def traced_first_stage(query: str, k: int, ef_search: int = None, probes: int = None):
+    """Recuperacion inicial (pgvector / hibrida / mmap) de los candidatos"""
+    return _to_documents(retrieve_chunks(query, k, ef_search=ef_search, probes=probes))
+
+@traceable(run_type="chain", name="rerank_cross_encoder")
+def traced_rerank(query: str, candidates: list, k: int) -> dict:
+    """
+    Reordena los candidatos con el cross-encoder. Si se excede el presupuesto
+    de latencia se mantiene el orden de la primera etapa.
+    """
+    ranking, stats = rerank(query, [doc["page_content"] for doc in candidates], k)
+    documents = []
+    for position, score in ranking:
+        doc = candidates[position]
+        documents.append({**doc, "metadata": {**doc["metadata"], "rerank_score": score, "first_stage_rank": position + 1}})
+    return {"documents": documents, "stats": stats}
+
+@traceable(run_type="retriever", name="retrieve_chunks_from_db")
+def traced_retrieve_chunks(query: str, k: int = 5, ef_search: int = None, probes: int = None):
+    """
+    Recupera chunks y los retorna en formato compatible con LangSmith para visualizacion.
+    ef_search / probes permiten ajustar la precision del indice ANN por consulta.
+    Con RERANK_ENABLED=1 se recuperan RERANK_CANDIDATES candidatos y se reordenan
+    con un cross-encoder local (cada etapa tiene su propia traza con tiempos).
+    """
+    if not RERANK_ENABLED:
+        return traced_first_stage(query, k, ef_search=ef_search, probes=probes)
+    candidates = traced_first_stage(query, max(k, RERANK_CANDIDATES), ef_search=ef_search, probes=probes)
+    return traced_rerank(query, candidates, k)["documents"]
+
+@traceable(run_type="chain", name="assemble_context")
+def traced_assemble_context(retrieved_docs: list) -> dict:
+    """
+    Filtra por similitud, elimina duplicados, une chunks contiguos y corta
+    en el presupuesto de tokens. Las estadisticas quedan en la traza.
+    """
+    return assemble_context(retrieved_docs)
+
 @mcp.tool
 @traceable(run_type="tool", name="search_documents")
 def search_documents(query: str):
@@ -45,17 +87,28 @@ def search_documents(query: str):
 @traceable(run_type="tool", name="faq_query")
 def faq_query(query: str) -> str:
     """
-    Herramienta RAG avanzada que recupera los 5 chunks mas relevantes desde la base de datos,
-    los pasa como contexto a Gemini y genera una respuesta final usando LangChain.
+    Herramienta RAG avanzada que recupera los chunks mas relevantes desde la base de datos,
+    arma un contexto adaptativo (umbral de similitud, sin duplicados, presupuesto de tokens),
+    lo pasa a Gemini y genera una respuesta final usando LangChain.
     Argumentos: query:str
     """
     try:
-        retrieved_docs = traced_retrieve_chunks(query, 5)
+        retrieved_docs = traced_retrieve_chunks(query, CONTEXT_FETCH_K)
         
         if not retrieved_docs:
             return "No se encontraron documentos relevantes para tu consulta."
         
-        context_text = "\n\n".join([doc["page_content"] for doc in retrieved_docs])
+        assembled = traced_assemble_context(retrieved_docs)
+        context_text = assembled["context"]
+
+        # Cache semantico: una pregunta parafraseada reutiliza la respuesta ya generada,
+        # solo si su propia recuperacion eligio los mismos chunks (evita cruzar productos o planes)
+        query_embedding = embed_query(query) if SEMANTIC_CACHE_ENABLED else None
+        if query_embedding is not None:
+            chunk_ids = [doc["metadata"]["chunk_id"] for doc in assembled["sources"] if doc["metadata"].get("chunk_id")]
+            cached = lookup_answer(query_embedding, chunk_ids)
+            if cached:
+                return cached["answer"]
         
         prompt_template = ChatPromptTemplate.from_template("""
         Eres un asistente experto en la empresa. Responde de manera clara, concisa y util 
@@ -82,12 +135,38 @@ def faq_query(query: str) -> str:
         
         chain = prompt_template | llm
         gemini_response = chain.invoke({"context": context_text, "query": query})
-        
-        return gemini_response.content.strip()
+        answer = gemini_response.content.strip()
+
+        if query_embedding is not None and answer:
+            store_answer(query, query_embedding, assembled["sources"], answer)
+
+        return answer
         
     except Exception as e:
         return f"Error en el procesamiento RAG: {str(e)}"
 
 
+@mcp.custom_route("/stats", methods=["GET"])
+async def retrieval_stats(request: Request) -> JSONResponse:
+    """Estadisticas de los caches de la capa de recuperacion de este worker"""
+    stats = {
+        "query_embedding_cache": get_query_cache_stats(),
+        "semantic_answer_cache": get_answer_cache_stats(),
+        "embedding_service": get_embedding_service_stats(),
+        "rerank": get_rerank_stats(),
+    }
+    if RETRIEVAL_MODE == "mmap":
+        from backend.utils.mmap_index import get_mmap_index
+        stats["mmap_index"] = get_mmap_index().stats()
+    return JSONResponse(stats)
+
+
 if __name__ == "__main__":
+    if RETRIEVAL_MODE == "mmap":
+        from backend.utils.mmap_index import get_mmap_index
+        # Se mapea antes de atender consultas; los workers forkeados comparten las paginas
+        get_mmap_index().refresh(force=True)
+    if RERANK_ENABLED:
+        # La carga del cross-encoder no debe consumir el presupuesto de la primera consulta
+        get_reranker()
     mcp.run(transport="sse")
\ No newline at end of file
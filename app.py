@@ -7,6 +7,7 @@ import os
 from dotenv import load_dotenv
 import pdfplumber
 import io
+import json
 
 from backend.tasks import process_local_file
 
@@ -68,6 +69,33 @@ def ask_gemini(imagen_pil: Image.Image) -> str:
     else:
         return f"Gemini error ({response.status_code}): {response.text}"
 
+def stream_chat(chat_data: dict, status):
+    """
+    Yields the answer sentences from /chat/stream as they arrive
+    (progress events update the status placeholder)
+    """
+    with requests.post(f"{BACKEND_URL}/chat/stream", json=chat_data, stream=True, timeout=120) as resp:
+        if resp.status_code != 200:
+            yield f"Error en el chat: {resp.text}"
+            return
+        event = None
+        for line in resp.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "progress":
+                    status.caption(f"⏳ {data['node']}…")
+                elif event == "delta":
+                    status.empty()
+                    yield data["text"]
+                elif event == "filtered":
+                    yield "[contenido filtrado] "
+                elif event == "error":
+                    yield data["detail"]
+                elif event == "done":
+                    status.empty()
+
 # ------------------------------ UI ------------------------------
 
 st.set_page_config(page_title="Startup Support Agent", page_icon="🤖", layout="centered")
@@ -120,14 +148,9 @@ if option == "🤖 Ir al chat":
         try:
             chat_data = {"message": user_input, "session_id": st.session_state["session_id"]}
             with st.chat_message("assistant"):
-                with st.spinner("Pensando…"):
-                    resp = requests.post(f"{BACKEND_URL}/chat/send", json=chat_data, timeout=120)
-                    if resp.status_code == 200:
-                        result = resp.json()
-                        assistant_text = result.get("response", "(Sin respuesta)")
-                    else:
-                        assistant_text = f"Error en el chat: {resp.text}"
-                st.markdown(assistant_text)
+                # The answer is shown sentence by sentence as the backend generates it
+                status = st.empty()
+                assistant_text = st.write_stream(stream_chat(chat_data, status)) or "(Sin respuesta)"
             st.session_state["messages"].append({"role": "assistant", "content": assistant_text})
         except Exception as e:
             error_text = f"Error de conexión: {e}"
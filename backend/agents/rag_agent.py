@@ -2,20 +2,17 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
 import os
 from dotenv import load_dotenv
-import asyncio
-import nest_asyncio
-from mcp import ClientSession
-from mcp.client.sse import sse_client
+from backend.utils.mcp_client import call_tool, list_tools
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 from langchain.memory import ConversationBufferMemory
+from langchain_core.chat_history import InMemoryChatMessageHistory
 from backend.utils.db_chat_history import SQLAlchemyChatMessageHistory
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-nest_asyncio.apply()
 load_dotenv(override=True)
 
 MCP_SERVER_URL= os.getenv("MCP_RAG_SERVER_URL")
@@ -56,20 +53,7 @@ llm = ChatGoogleGenerativeAI(model=MODEL, temperature=0,google_api_key=os.getenv
 async def get_available_tools():
     """Obtiene todas las herramientas disponibles del servidor MCP"""
     try:
-        async with sse_client(f"{MCP_SERVER_URL}/sse") as (read_stream, write_stream):
-            async with ClientSession(read_stream, write_stream) as session:
-                await session.initialize()
-                
-                tools_result = await session.list_tools("list_tools")
-                tools_info = []
-                for tool in tools_result.tools:
-                    tools_info.append({
-                        "name": tool.name,
-                        "description": tool.description
-                    })
-                
-                return tools_info
-                
+        return await list_tools(MCP_SERVER_URL)
     except Exception as e:
         logger.info(f"Error obteniendo herramientas: {e}")
         return []
@@ -77,39 +61,24 @@ async def get_available_tools():
 async def execute_tool(tool_name: str, arguments: dict):
     """Ejecuta una herramienta específica con los argumentos dados"""
     try:
-        async with sse_client(f"{MCP_SERVER_URL}/sse") as (read_stream, write_stream):
-            async with ClientSession(read_stream, write_stream) as session:
-                await session.initialize()
-                
-                result = await session.call_tool(tool_name, arguments=arguments)
-                return result.content[0].text if result.content else "No se obtuvo resultado"
-                
+        return await call_tool(MCP_SERVER_URL, tool_name, arguments)
     except Exception as e:
         logger.info(f"Error ejecutando herramienta {tool_name}: {e}")
         return f"Error al ejecutar {tool_name}: {str(e)}"
 
 
-def get_tools_sync():
-    """Wrapper síncrono para obtener herramientas"""
-    return asyncio.run(get_available_tools())
-
-def execute_tool_sync(tool_name: str, arguments: dict):
-    """Wrapper síncrono para ejecutar herramienta"""
-    return asyncio.run(execute_tool(tool_name, arguments))
-
-
 def get_tool_selection_chain(llm):
     prompt = PromptTemplate.from_template(
         SELECT_TOOL_PROMPT  
     )
     return LLMChain(llm=llm, prompt=prompt)
-def get_chat_memory(session_id: str):
-    """Devuelve la memoria basada en historial en PostgreSQL"""
-    
+async def get_chat_memory(session_id: str):
+    """Devuelve la memoria con el historial de PostgreSQL, leido fuera del event loop"""
     try:
-        history = SQLAlchemyChatMessageHistory(session_id=session_id,persist=False)
+        history = SQLAlchemyChatMessageHistory(session_id=session_id, persist=False)
+        messages = await history.aget_messages()
         return ConversationBufferMemory(
-            chat_memory=history,
+            chat_memory=InMemoryChatMessageHistory(messages=messages),
             return_messages=True
         )
     except Exception as e:
@@ -118,7 +87,7 @@ def get_chat_memory(session_id: str):
 
 
 
-def rag_agent_node(state):
+async def rag_agent_node(state):
     try:
         user_input = state.get("input", "")
         session_id = state.get("session_id")  
@@ -129,19 +98,19 @@ def rag_agent_node(state):
             return {"tool_response": "Error: No se recibió input del usuario."}
 
 
-        tools = asyncio.run(get_available_tools())
+        tools = await get_available_tools()
 
         tools_str = "\n".join([f"{t['name']}: {t['description']}" for t in tools])
 
         tool_selector = get_tool_selection_chain(llm)
-        tool_decision = tool_selector.run(tools=tools_str, user_input=user_input).strip()
+        tool_decision = (await tool_selector.arun(tools=tools_str, user_input=user_input)).strip()
         tool_name_raw = tool_decision.strip()
         tool_name = tool_name_raw.replace("Action:", "").strip()
 
         
-        tool_result = asyncio.run(execute_tool(tool_name, {"query": user_input}))
+        tool_result = await execute_tool(tool_name, {"query": user_input})
 
-        memory = get_chat_memory(session_id)
+        memory = await get_chat_memory(session_id)
 
         agent_prompt = ChatPromptTemplate.from_messages([
             ("system", EXECUTE_TOOL_PROMPT),
@@ -150,7 +119,7 @@ def rag_agent_node(state):
         input_block = f"Consulta: {user_input}\n\nInformación recuperada:\n{tool_result}"
 
         reasoning_chain = LLMChain(llm=llm, prompt=agent_prompt, memory=memory)
-        final_output = reasoning_chain.invoke({"input_block": input_block})
+        final_output = await reasoning_chain.ainvoke({"input_block": input_block})
 
         if isinstance(final_output, dict):
             final_response = final_output.get("text", str(final_output))
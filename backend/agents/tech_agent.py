@@ -3,17 +3,14 @@ from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 from langchain_core.prompts import ChatPromptTemplate
 import os
-import asyncio
-import nest_asyncio
 from dotenv import load_dotenv
-from mcp import ClientSession
-from mcp.client.sse import sse_client
+from backend.utils.mcp_client import call_tool, list_tools
 from langchain.memory import ConversationBufferMemory
+from langchain_core.chat_history import InMemoryChatMessageHistory
 from backend.utils.db_chat_history import SQLAlchemyChatMessageHistory
 from backend.utils.db_actions import insert_chat_session
 import logging
 
-nest_asyncio.apply()
 load_dotenv(override=True)
 logger = logging.getLogger(__name__)
 
@@ -63,26 +60,14 @@ Genera una respuesta natural y útil:"""
 
 async def get_available_tools():
     try:
-        async with sse_client(f"{MCP_SERVER_URL}/sse") as (read_stream, write_stream):
-            async with ClientSession(read_stream, write_stream) as session:
-                await session.initialize()
-                tools_result = await session.list_tools("list_tools")
-                tools = [{"name": tool.name, "description": tool.description} for tool in tools_result.tools]
-                return tools
+        return await list_tools(MCP_SERVER_URL)
     except Exception as e:
         logger.info(f"Error obteniendo herramientas: {e}")
-        return [
-            {"name": "generate_excel_from_data", "description": "Genera archivo Excel desde datos CSV"},
-            {"name": "summarize_text", "description": "Resume texto largo"}
-        ]
+        return []
 
 async def execute_tool(tool_name: str, arguments: dict):
     try:
-        async with sse_client(f"{MCP_SERVER_URL}/sse") as (read_stream, write_stream):
-            async with ClientSession(read_stream, write_stream) as session:
-                await session.initialize()
-                result = await session.call_tool(tool_name, arguments=arguments)
-                return result.content[0].text if result.content else "No se obtuvo resultado"
+        return await call_tool(MCP_SERVER_URL, tool_name, arguments)
     except Exception as e:
         logger.info(f"Error ejecutando herramienta {tool_name}: {e}")
         return f"Error al ejecutar {tool_name}: {str(e)}"
@@ -91,12 +76,13 @@ def get_tool_selection_chain(llm):
     prompt = PromptTemplate.from_template(SELECT_TOOL_PROMPT)
     return LLMChain(llm=llm, prompt=prompt)
 
-def get_chat_memory(session_id: str):
-    """Devuelve la memoria basada en historial en PostgreSQL"""
+async def get_chat_memory(session_id: str):
+    """Devuelve la memoria con el historial de PostgreSQL, leido fuera del event loop"""
     try:
-        history = SQLAlchemyChatMessageHistory(session_id=session_id,persist=False)
+        history = SQLAlchemyChatMessageHistory(session_id=session_id, persist=False)
+        messages = await history.aget_messages()
         return ConversationBufferMemory(
-            chat_memory=history,
+            chat_memory=InMemoryChatMessageHistory(messages=messages),
             return_messages=True
         )
     except Exception as e:
@@ -105,7 +91,7 @@ def get_chat_memory(session_id: str):
 
 
 
-def tech_agent_node(state):
+async def tech_agent_node(state):
     try:
         user_input = state.get("input", "")
         session_id = state.get("session_id")  
@@ -117,25 +103,22 @@ def tech_agent_node(state):
 
 
         try:
-            tools = asyncio.run(get_available_tools())
+            # Catálogo cacheado (el último conocido si el servidor no responde)
+            tools = await get_available_tools()
             if not tools:
-                logger.info("[Tech Agent] No se pudieron obtener herramientas, usando herramientas por defecto")
-                tools = [
-                    {"name": "generate_excel_from_data", "description": "Genera archivo Excel desde datos CSV"},
-                    {"name": "summarize_text", "description": "Resume texto largo"}
-                ]
+                raise ConnectionError("Catálogo de herramientas no disponible")
             
             tools_str = "\n".join([f"{t['name']}: {t['description']}" for t in tools])
             
             tool_selector = get_tool_selection_chain(llm)
-            tool_decision = tool_selector.run(tools=tools_str, user_input=user_input).strip()
+            tool_decision = (await tool_selector.arun(tools=tools_str, user_input=user_input)).strip()
             tool_name_raw = tool_decision.strip()
             tool_name = tool_name_raw.replace("Action:", "").strip()
             
             logger.info(f"[Tech Agent] Tool seleccionada: {tool_name}")
 
             argument_key = "tabla" if tool_name == "generate_excel_from_data" else "text"
-            tool_result = asyncio.run(execute_tool(tool_name, {argument_key: user_input}))
+            tool_result = await execute_tool(tool_name, {argument_key: user_input})
             logger.info(f"[Tech Agent] Resultado de tool: {tool_result}")
         except Exception as e:
             logger.info(f"[Tech Agent] Error obteniendo/ejecutando herramientas: {e}")
@@ -146,7 +129,7 @@ def tech_agent_node(state):
                 tool_name = "summarize_text"
                 tool_result = "Análisis local realizado - Texto largo detectado"
 
-        memory = get_chat_memory(session_id)
+        memory = await get_chat_memory(session_id)
 
         agent_prompt = ChatPromptTemplate.from_messages([
             ("system", EXECUTE_TECH_PROMPT),
@@ -155,7 +138,7 @@ def tech_agent_node(state):
         input_block = f"Input del usuario: {user_input}\n\nResultado de la herramienta: {tool_result}"
 
         reasoning_chain = LLMChain(llm=llm, prompt=agent_prompt, memory=memory)
-        final_output = reasoning_chain.invoke({"input_block": input_block})
+        final_output = await reasoning_chain.ainvoke({"input_block": input_block})
         if isinstance(final_output, dict):
             final_response = final_output.get("text", str(final_output))
         else:
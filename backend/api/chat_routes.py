@@ -1,36 +1,45 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+import json
+import time
 import uuid
 from datetime import datetime
 from backend.supervisor.graph_builder import app as graph_app
 from backend.models.api import ChatRequest, ChatResponse
-from backend.utils.db_actions import insert_chat_session, save_message
+from backend.utils.db_actions import ainsert_chat_session, asave_message
+from backend.supervisor.intent_classifier import get_intent_classifier
+from backend.supervisor.policy import get_policy_stats
+from backend.moderation.streaming import stream_stats
+from backend.utils.mcp_client import get_mcp_stats
 
 router = APIRouter(prefix="/chat", tags=["Chat Agent"])
 
 @router.post("/send", response_model=ChatResponse)
-def send_message(request: ChatRequest):
+async def send_message(request: ChatRequest):
     """
     Sends a message to the chat agent and receives a response
+    The graph runs on the event loop (async LLM, MCP and DB calls), so a worker
+    is not blocked for the whole conversation turn
     """
     try:
         # Generate session_id if not provided
         session_id = request.session_id or str(uuid.uuid4())
         
         # Insert the session into the database before processing
-        insert_chat_session(session_id)
+        await ainsert_chat_session(session_id)
         
         # Prepare the state for the graph
         state = {
             "input": request.message,
             "session_id": session_id
         }
-        save_message(session_id, "human", request.message)
+        await asave_message(session_id, "human", request.message)
         # Add context if provided
         if request.context:
             state.update(request.context)
         
         # Invoke the agent graph
-        result = graph_app.invoke(state)
+        result = await graph_app.ainvoke(state)
         print("!!!!!RESULT!!!")
         print(result)
 
@@ -45,6 +54,77 @@ def send_message(request: ChatRequest):
         raise HTTPException(status_code=500, detail=f"Error en el chat: {str(e)}")
 
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/stream")
+async def stream_message(request: ChatRequest):
+    """
+    Server-Sent Events version of /chat/send
+    Events:
+        session   session_id of the conversation
+        progress  after every graph node (node, next agent, elapsed_ms)
+        delta     next sentence of the final answer, already validated by the toxicity guard
+        filtered  a sentence was dropped by the toxicity guard
+        done      full response, ttft_ms (time to the first delta) and total_ms
+        error     the graph failed
+    """
+    start = time.perf_counter()
+    session_id = request.session_id or str(uuid.uuid4())
+    await ainsert_chat_session(session_id)
+
+    state = {
+        "input": request.message,
+        "session_id": session_id,
+        "stream": True
+    }
+    await asave_message(session_id, "human", request.message)
+    if request.context:
+        state.update(request.context)
+
+    async def events():
+        ttft_ms, final_output, filtered = None, None, 0
+        yield sse_event("session", {"session_id": session_id})
+        try:
+            async for mode, chunk in graph_app.astream(state, stream_mode=["updates", "custom"]):
+                elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+                if mode == "custom":
+                    if chunk["type"] == "delta" and ttft_ms is None:
+                        ttft_ms = elapsed_ms
+                    filtered += int(chunk["type"] == "filtered")
+                    yield sse_event(chunk["type"], {"text": chunk.get("text", ""), "elapsed_ms": elapsed_ms})
+                    continue
+                for node, update in chunk.items():
+                    update = update or {}
+                    final_output = update.get("final_output") or final_output
+                    yield sse_event("progress", {
+                        "node": node,
+                        "next_agent": update.get("next_agent") or update.get("supervisor_decision"),
+                        "elapsed_ms": elapsed_ms
+                    })
+        except Exception as e:
+            stream_stats.record_error()
+            yield sse_event("error", {"detail": f"Error en el chat: {str(e)}"})
+            return
+
+        total_ms = round((time.perf_counter() - start) * 1000, 1)
+        stream_stats.record(ttft_ms, total_ms, filtered)
+        print(f"[Chat stream] ttft={ttft_ms}ms total={total_ms}ms")
+        yield sse_event("done", {
+            "response": final_output or "No se pudo generar una respuesta",
+            "session_id": session_id,
+            "timestamp": datetime.now().isoformat(),
+            "ttft_ms": ttft_ms,
+            "total_ms": total_ms
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.delete("/session/{session_id}")
 async def delete_session(session_id: str):
     """
@@ -60,6 +140,22 @@ async def delete_session(session_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al eliminar sesión: {str(e)}")
 
+@router.get("/stats")
+async def chat_stats():
+    """
+    Intent classification stats (share of requests answered by the local
+    fast path, estimated Gemini latency saved), supervisor policy stats
+    (hops decided by rules vs by the LLM), /chat/stream latency
+    (time to first token, total), the shared MCP sessions and tool catalogs
+    """
+    return {
+        "intent_classifier": get_intent_classifier().stats(),
+        "supervisor_policy": get_policy_stats(),
+        "stream": stream_stats.stats(),
+        "mcp": get_mcp_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @router.get("/health")
 async def chat_health_check():
     """
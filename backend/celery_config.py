@@ -20,7 +20,9 @@ BASE_CONFIG = {
     'task_acks_late': True,
     'worker_disable_rate_limits': True,
     'worker_max_tasks_per_child': 1000,
-    'worker_max_memory_per_child': 200000,  # 200MB
+    # The embedding model alone takes ~440MB, a lower limit would recycle the
+    # child (and reload the model) after every task
+    'worker_max_memory_per_child': int(os.getenv("CELERY_MAX_MEMORY_PER_CHILD_KB", "1500000")),  # 1.5GB
     'broker_connection_retry_on_startup': True,
     'broker_connection_max_retries': 10,
     'result_expires': 3600,  # 1 hour
@@ -1,9 +1,11 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import os
-from sqlalchemy.sql import text
-from backend.utils.db_connection import Base, engine
+from backend.utils.db_connection import engine
+from backend.utils.db_schema import prepare_database
+from backend.utils.mcp_client import MCP_SERVER_URLS, get_mcp_manager
 
 
 # Import routers
@@ -17,17 +19,15 @@ from backend.api.config import (
     HOST, PORT
 )
 
-# Database configuration
-print("🛠️ Enabling vector extension in database...")
-with engine.connect() as connection:
-    connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
-    connection.commit()
-print("✅ Vector extension enabled.")
+# Database configuration: pgvector extension, tables and ANN index
+prepare_database(engine)
 
-# Create tables in database if they don't exist
-print("🛠️ Creating tables in database...")
-Base.metadata.create_all(bind=engine)
-print("✅ Tables created successfully.")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the MCP sessions and load their tool catalogs before the first chat request needs them
+    get_mcp_manager().prewarm(MCP_SERVER_URLS)
+    yield
 
 
 app = FastAPI(
@@ -35,7 +35,8 @@ app = FastAPI(
     description=API_DESCRIPTION,
     version=API_VERSION,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configure CORS
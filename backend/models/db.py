@@ -2,6 +2,7 @@ import sys
 sys.path.append("..")
 
 from sqlalchemy import Column, Integer, Text, String, TIMESTAMP, UUID, ForeignKey, func
+from sqlalchemy.dialects.postgresql import ARRAY
 from pgvector.sqlalchemy import Vector
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -15,6 +16,37 @@ class DocumentEmbedding(Base):
     chunk_id = Column(String, index=True)
     text = Column(Text)
     embedding = Column(Vector(768)) 
+    # sha256 of model + normalized text, used to diff document versions
+    content_hash = Column(String(64), index=True)
+    # position of the chunk inside its document
+    chunk_index = Column(Integer)
+
+class DocumentVersion(Base):
+    __tablename__ = "document_versions"
+    doc_id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    chunk_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+class EmbeddingCache(Base):
+    __tablename__ = "embedding_cache"
+    # sha256 of model name + normalized chunk text
+    content_hash = Column(String(64), primary_key=True)
+    model_name = Column(String, nullable=False)
+    embedding = Column(Vector(768), nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+class SemanticAnswerCache(Base):
+    __tablename__ = "semantic_answer_cache"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    query_text = Column(Text, nullable=False)
+    query_embedding = Column(Vector(768), nullable=False)
+    chunk_ids = Column(ARRAY(String), nullable=False)
+    # documents that contributed to the answer, used for invalidation
+    doc_ids = Column(ARRAY(String), nullable=False)
+    answer = Column(Text, nullable=False)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(TIMESTAMP, server_default=func.now())
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -9,8 +10,10 @@ from guardrails import Guard
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.memory import ConversationBufferMemory
+from langchain_core.chat_history import InMemoryChatMessageHistory
 from backend.utils.db_chat_history import SQLAlchemyChatMessageHistory
-from backend.utils.db_actions import save_message
+from backend.utils.db_actions import asave_message
+from backend.moderation.streaming import LINE_END_RE, SentenceBuffer, split_bilingual
 
 load_dotenv(override=True)
 
@@ -35,12 +38,13 @@ llm = ChatGoogleGenerativeAI(model=MODEL, temperature=0.0, google_api_key=GEMINI
 toxic_guard = Guard().use(ToxicLanguage, threshold=0.9, validation_method="sentence", on_fail="exception")
 
 
-def get_chat_memory(session_id: str):
-    """Returns memory based on PostgreSQL history"""
+async def get_chat_memory(session_id: str):
+    """Returns memory based on PostgreSQL history, read off the event loop"""
     try:
         history = SQLAlchemyChatMessageHistory(session_id=session_id, persist=False)
+        messages = await history.aget_messages()
         return ConversationBufferMemory(
-            chat_memory=history,
+            chat_memory=InMemoryChatMessageHistory(messages=messages),
             return_messages=True
         )
     except Exception as e:
@@ -77,6 +81,42 @@ FINAL_RESPONSE_PROMPT = ChatPromptTemplate.from_messages([
      "Mensaje original del usuario: {original_input}")
 ])
 
+# Streaming version: "es ||| en" lines instead of the es/en JSON, so each
+# sentence can be shown as soon as its English twin passed the toxicity check
+STREAM_RESPONSE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "Eres un asistente experto y amigable que debe generar una respuesta final natural y conversacional "
+     "basándote en todo el historial de la conversación entre el usuario y los diferentes agentes.\n\n"
+     "INSTRUCCIONES:\n"
+     "1. Analiza todo el historial de mensajes para entender el contexto completo\n"
+     "2. Identifica la necesidad original del usuario\n"
+     "3. Revisa las respuestas de todos los agentes que han intervenido\n"
+     "4. Genera una respuesta final que:\n"
+     "   - Sea natural y conversacional, como si la escribiera un humano\n"
+     "   - Combine toda la información relevante de manera fluida\n"
+     "   - Use un tono amigable y cercano\n"
+     "   - Evite lenguaje técnico o formal excesivo\n"
+     "   - Incluya transiciones naturales entre ideas\n"
+     "   - Sea clara y fácil de entender\n\n"
+     "5. Traduce cada oración al inglés manteniendo el mismo tono natural\n\n"
+     "Responde SOLO con la respuesta, sin JSON ni formato adicional: una oración por línea, "
+     "primero en español y luego su traducción al inglés separadas por |||, por ejemplo:\n"
+     "¡Hola! Con gusto te ayudo. ||| Hi! I'm happy to help.\n"
+     "El horario de atención es de 9 a 18. ||| Our support hours are from 9 to 18.\n"),
+
+    ("human",
+     "Aquí tienes el historial completo y el input original. Por favor genera la respuesta final siguiendo las instrucciones.\n\n"
+     "HISTORIAL:\n{conversation_history}\n\n"
+     "Mensaje original del usuario: {original_input}")
+])
+
+SENTENCE_TRANSLATION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "Translate the following Spanish sentence into English. Answer ONLY with the translation."),
+    ("human", "{sentence}")
+])
+
+FILTERED_WARNING = "⚠️ ADVERTENCIA: La respuesta original contenía lenguaje inapropiado y ha sido filtrada."
+
 TRANSLATION_PROMPT = ChatPromptTemplate.from_messages([
     ("system", "Traduce al español la siguiente respuesta en inglés, añadiendo una advertencia al inicio: '⚠️ ADVERTENCIA: La respuesta original contenía lenguaje inapropiado y ha sido filtrada.'"),
     ("human", "Traduce: {english_response}")
@@ -166,7 +206,7 @@ def format_conversation_history(messages: list) -> str:
     return "\n".join(formatted_history)
 
 @traceable(name="toxic_guardrail_moderation", run_type="chain")
-def apply_toxic_guardrail_and_store(state: dict) -> dict:
+async def apply_toxic_guardrail_and_store(state: dict) -> dict:
     session_id = state.get("session_id")
     messages = state.get("messages", [])
     user_input = state.get("input", "")
@@ -175,7 +215,6 @@ def apply_toxic_guardrail_and_store(state: dict) -> dict:
         return state
 
     obtain_history = format_conversation_history(messages)
-    memory = get_chat_memory(session_id)
     
     # Validate that parameters are not empty
     if not user_input or not obtain_history:
@@ -192,7 +231,7 @@ def apply_toxic_guardrail_and_store(state: dict) -> dict:
         | llm
     )
 
-    response_text = final_response_chain.invoke({
+    response_text = await final_response_chain.ainvoke({
         "conversation_history": obtain_history,
         "original_input": user_input
     })
@@ -224,7 +263,8 @@ def apply_toxic_guardrail_and_store(state: dict) -> dict:
         
         # Validate English with toxic_guard
         try:
-            toxic_guard.validate(english_response)
+            # The toxicity model runs on the CPU, keep it off the event loop
+            await asyncio.to_thread(toxic_guard.validate, english_response)
             final_validated_response = extract_spanish_response(final_response)
         except Exception as toxic_error:
             print(f"⚠️ Contenido tóxico detectado: {toxic_error}")
@@ -234,7 +274,7 @@ def apply_toxic_guardrail_and_store(state: dict) -> dict:
                 final_validated_response = extract_spanish_response(final_response)
             else:
                 formatted_translation_prompt = TRANSLATION_PROMPT.format(english_response=english_response)
-                translated_response = llm.run(formatted_translation_prompt)
+                translated_response = await llm.ainvoke(formatted_translation_prompt)
                 final_validated_response = translated_response.content if hasattr(translated_response, 'content') else str(translated_response)
             
     except json.JSONDecodeError as json_error:
@@ -254,7 +294,7 @@ def apply_toxic_guardrail_and_store(state: dict) -> dict:
         "timestamp": "final_response"
     })
 
-    save_message(session_id, "ai", final_validated_response)
+    await asave_message(session_id, "ai", final_validated_response)
 
     return {
         **state,
@@ -263,6 +303,79 @@ def apply_toxic_guardrail_and_store(state: dict) -> dict:
         "messages": updated_messages
     }
 
+@traceable(name="toxic_guardrail_streaming", run_type="chain")
+async def stream_toxic_guardrail_and_store(state: dict, emit) -> dict:
+    """
+    Streaming variant of apply_toxic_guardrail_and_store for /chat/stream
+    Args:
+        state: Graph state
+        emit: Callable that receives the events for the client:
+            {"type": "delta", "text"} one Spanish sentence whose English twin was validated
+            {"type": "filtered"}      a sentence failed the toxicity check and was dropped
+    Returns:
+        The same state update as apply_toxic_guardrail_and_store
+    """
+    session_id = state.get("session_id")
+    messages = state.get("messages", [])
+    user_input = state.get("input", "")
+
+    if not session_id or not messages or not user_input:
+        return state
+
+    obtain_history = format_conversation_history(messages)
+    chain = STREAM_RESPONSE_PROMPT | llm
+    # One "es ||| en" pair per line, never cut in the middle
+    buffer = SentenceBuffer(max_chars=None, pattern=LINE_END_RE)
+    validated, filtered = [], 0
+
+    async def publish(line: str):
+        nonlocal filtered
+        spanish, english = split_bilingual(line)
+        if not spanish:
+            return
+        try:
+            if not english:
+                # The model left out the twin: ToxicLanguage is English-only, translate before validating
+                translation = await llm.ainvoke(SENTENCE_TRANSLATION_PROMPT.format(sentence=spanish))
+                english = translation.content if hasattr(translation, "content") else str(translation)
+            await asyncio.to_thread(toxic_guard.validate, english)
+        except Exception as toxic_error:
+            print(f"⚠️ Contenido tóxico detectado: {toxic_error}")
+            filtered += 1
+            emit({"type": "filtered"})
+            return
+        sentence = f"{spanish} "
+        validated.append(sentence)
+        emit({"type": "delta", "text": sentence})
+
+    async for chunk in chain.astream({"conversation_history": obtain_history, "original_input": user_input}):
+        for sentence in buffer.feed(chunk.content if hasattr(chunk, "content") else str(chunk)):
+            await publish(sentence)
+    for sentence in buffer.flush():
+        await publish(sentence)
+
+    final_validated_response = "".join(validated).strip() or "Lo siento, no pude generar una respuesta."
+    if filtered:
+        final_validated_response = f"{FILTERED_WARNING}\n\n{final_validated_response}"
+
+    updated_messages = messages.copy()
+    updated_messages.append({
+        "role": "system",
+        "agent": "toxic_guardrail",
+        "content": final_validated_response,
+        "timestamp": "final_response"
+    })
+
+    await asave_message(session_id, "ai", final_validated_response)
+
+    return {
+        **state,
+        "final_output": final_validated_response,
+        "tool_response": final_validated_response,
+        "messages": updated_messages,
+        "filtered_sentences": filtered
+    }
+
 # ======================
 # Quick test
 # ======================
@@ -272,5 +385,5 @@ if __name__ == "__main__":
         "session_id": "ee0dec71-726c-4898-b471-32c5944ba273",
         
     }
-    result = apply_toxic_guardrail_and_store(test_state)
+    result = asyncio.run(apply_toxic_guardrail_and_store(test_state))
     print("Final Output:", result["final_output"])
@@ -0,0 +1,129 @@
+"""
+Helpers for the streamed final answer (/chat/stream)
+
+SentenceBuffer collects the tokens of the synthesis LLM call and releases
+complete sentences, so the toxicity guard validates each sentence before it is
+sent to the client instead of validating the whole answer at the end. The
+toxicity model is English-only: the streamed answer is written one sentence
+per line as "spanish ||| english" and split_bilingual separates the Spanish
+text shown to the user from the English twin that is validated.
+StreamLatencyStats keeps the time-to-first-token (the headline latency of the
+streaming endpoint) and total time of the last requests.
+"""
+import os
+import re
+import threading
+from collections import deque
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+# A sentence without punctuation is released at a whitespace after this many chars
+STREAM_SENTENCE_MAX_CHARS = int(os.getenv("STREAM_SENTENCE_MAX_CHARS", "300"))
+# Latency samples kept for the percentiles
+STATS_WINDOW = 1000
+
+# End of sentence: . ! ? or … followed by whitespace, or a line break
+SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+|\n+")
+# Bilingual stream: one "spanish ||| english" pair per line
+LINE_END_RE = re.compile(r"\n+")
+BILINGUAL_SEPARATOR = "|||"
+
+
+class SentenceBuffer:
+    """Accumulates streamed text and returns it one complete sentence at a time"""
+
+    def __init__(self, max_chars: int = STREAM_SENTENCE_MAX_CHARS, pattern: re.Pattern = SENTENCE_END_RE):
+        """
+        Args:
+            max_chars: Length at which an unterminated sentence is released (None never cuts,
+                needed when a cut would split a bilingual pair)
+            pattern: Regex of the sentence end
+        """
+        self.max_chars = max_chars
+        self.pattern = pattern
+        self.buffer = ""
+
+    def feed(self, text: str) -> list:
+        """
+        Returns:
+            The sentences completed by text, with their trailing whitespace
+            (joining every returned sentence gives back the streamed text)
+        """
+        self.buffer += text or ""
+        sentences = []
+        while True:
+            match = self.pattern.search(self.buffer)
+            if match is None:
+                break
+            sentences.append(self.buffer[:match.end()])
+            self.buffer = self.buffer[match.end():]
+        if self.max_chars is not None and len(self.buffer) > self.max_chars:
+            cut = self.buffer.rfind(" ", 0, self.max_chars)
+            if cut > 0:
+                sentences.append(self.buffer[:cut + 1])
+                self.buffer = self.buffer[cut + 1:]
+        return sentences
+
+    def flush(self) -> list:
+        """Returns the text left after the stream ended"""
+        rest, self.buffer = self.buffer, ""
+        return [rest] if rest.strip() else []
+
+
+def split_bilingual(line: str) -> tuple:
+    """
+    Returns:
+        (spanish, english) of a "spanish ||| english" line, english is None
+        when the model left out the separator
+    """
+    spanish, separator, english = line.partition(BILINGUAL_SEPARATOR)
+    if not separator:
+        return line.strip(), None
+    return spanish.strip(), english.strip()
+
+
+class StreamLatencyStats:
+    """Time-to-first-token and total time percentiles of the streamed requests"""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self._lock = threading.Lock()
+        self._ttft_ms = deque(maxlen=window)
+        self._total_ms = deque(maxlen=window)
+        self._counts = {"requests": 0, "errors": 0, "filtered_sentences": 0}
+
+    def record(self, ttft_ms: float, total_ms: float, filtered: int = 0):
+        with self._lock:
+            self._counts["requests"] += 1
+            self._counts["filtered_sentences"] += filtered
+            if ttft_ms is not None:
+                self._ttft_ms.append(ttft_ms)
+            self._total_ms.append(total_ms)
+
+    def record_error(self):
+        with self._lock:
+            self._counts["errors"] += 1
+
+    @staticmethod
+    def _summary(samples: list) -> dict:
+        if not samples:
+            return None
+        values = np.array(samples)
+        return {
+            "p50": round(float(np.percentile(values, 50)), 1),
+            "p95": round(float(np.percentile(values, 95)), 1),
+            "mean": round(float(values.mean()), 1),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counts)
+            ttft, total = list(self._ttft_ms), list(self._total_ms)
+        stats["ttft_ms"] = self._summary(ttft)
+        stats["total_ms"] = self._summary(total)
+        return stats
+
+
+stream_stats = StreamLatencyStats()
@@ -2,8 +2,11 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.chains import LLMChain
 from dotenv import load_dotenv
+import asyncio
 import os
+import time
 from typing import List, Optional
+from backend.supervisor.intent_classifier import INTENT_FASTPATH_ENABLED, get_intent_classifier
 load_dotenv(override=True)
 
 MODEL= os.getenv("MODEL")
@@ -92,8 +95,31 @@ supervisor_prompt = ChatPromptTemplate.from_messages([
 ])
 
 
+# Multi-intent classification for the fan-out mode: every need in the message
+# and whether a later need uses the result of an earlier one
+multi_intent_prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "Sos un agente que debe detectar TODAS las tareas que pide un mensaje de usuario, en el orden en que aparecen.\n\n"
+     "Tareas posibles: consulta_documento, analisis_sentimiento, generar_email, tarea_tecnica, guardrail "
+     "(mismas definiciones que en la clasificación simple).\n\n"
+     "REGLAS:\n"
+     "1. Si el mensaje contiene enojo, agresión, insultos o frustración, devolvé solo analisis_sentimiento.\n"
+     "2. Indicá dependientes: si cuando una tarea necesita el resultado de otra (por ejemplo: 'buscá la política de envíos y mandala por correo'), "
+     "dependientes: no cuando se pueden resolver por separado (por ejemplo: '¿Cuál es el horario? Y redactame un correo pidiendo una reunión').\n"
+     "3. Respondé en una sola línea con este formato exacto:\n"
+     "tareas: tarea1, tarea2 | dependientes: si\n\n"
+     "EJEMPLOS:\n"
+     "- '¿Cuál es el horario?' → tareas: consulta_documento | dependientes: no\n"
+     "- 'Necesito info de precios y aparte un correo para mi jefe pidiendo vacaciones' → tareas: consulta_documento, generar_email | dependientes: no\n"
+     "- 'Buscá la política de devoluciones y armá un correo con eso para el cliente' → tareas: consulta_documento, generar_email | dependientes: si\n"
+     "- 'Esta app es una mierda, necesito un correo' → tareas: analisis_sentimiento | dependientes: no"),
+    ("human", "Mensaje del usuario: {user_input}")
+])
+
+
 # LangChain chains
 classification_chain = LLMChain(llm=llm, prompt=initial_prompt)
+multi_intent_chain = LLMChain(llm=llm, prompt=multi_intent_prompt)
 supervisor_chain = LLMChain(llm=llm, prompt=supervisor_prompt)
 
 def classify_with_gemini(user_input: str) -> str:
@@ -107,6 +133,139 @@ def classify_with_gemini(user_input: str) -> str:
         print("[Error en classify_with_gemini]:", e)
         return "rag_agent"
 
+async def aclassify_with_gemini(user_input: str) -> str:
+    """Async version of classify_with_gemini"""
+    try:
+        result = (await classification_chain.arun(user_input=user_input)).strip()
+        return AGENT_MAP.get(result, "rag_agent")
+    except Exception as e:
+        print("[Error en classify_with_gemini]:", e)
+        return "rag_agent"
+
+def classify_intent(user_input: str) -> tuple:
+    """
+    Initial classification with a local fast path: heuristics and a kNN head
+    over e5 embeddings answer confident cases, Gemini classifies the rest
+    Returns:
+        (agent, path) where path is "heuristic", "knn" or "llm"
+    """
+    if not INTENT_FASTPATH_ENABLED:
+        return classify_with_gemini(user_input), "llm"
+
+    classifier = get_intent_classifier()
+    prediction = classifier.predict(user_input)
+    if prediction.confident:
+        print(f"[Intent fast path] {prediction.label} ({prediction.source}, confidence={prediction.confidence})")
+        return AGENT_MAP[prediction.label], prediction.source
+
+    start = time.perf_counter()
+    agent = classify_with_gemini(user_input)
+    classifier.record_llm_call((time.perf_counter() - start) * 1000)
+    return agent, "llm"
+
+async def aclassify_intent(user_input: str) -> tuple:
+    """
+    Async version of classify_intent, the fast path (embedding the input) runs
+    in a worker thread so it doesn't block the event loop
+    """
+    if not INTENT_FASTPATH_ENABLED:
+        return await aclassify_with_gemini(user_input), "llm"
+
+    classifier = get_intent_classifier()
+    prediction = await asyncio.to_thread(classifier.predict, user_input)
+    if prediction.confident:
+        print(f"[Intent fast path] {prediction.label} ({prediction.source}, confidence={prediction.confidence})")
+        return AGENT_MAP[prediction.label], prediction.source
+
+    start = time.perf_counter()
+    agent = await aclassify_with_gemini(user_input)
+    classifier.record_llm_call((time.perf_counter() - start) * 1000)
+    return agent, "llm"
+
+def parse_multi_intent(result: str) -> tuple:
+    """
+    Parses "tareas: a, b | dependientes: si"
+    Returns:
+        (list of agents in order without duplicates, dependent flag)
+    """
+    tasks_part, _, dependent_part = result.partition("|")
+    tasks_part = tasks_part.split(":", 1)[-1]
+    agents = []
+    for label in tasks_part.split(","):
+        agent = AGENT_MAP.get(label.strip().lower())
+        if agent and agent not in agents:
+            agents.append(agent)
+    dependent = dependent_part.split(":", 1)[-1].strip().lower().startswith("s")
+    return agents, dependent
+
+async def aclassify_intents(user_input: str) -> dict:
+    """
+    Multi-intent classification for the fan-out mode. A confident local fast
+    path prediction is a single intent; otherwise one Gemini call returns every
+    intent and whether they depend on each other
+    Returns:
+        Dict with agents (in order), dependent and path
+    """
+    if INTENT_FASTPATH_ENABLED:
+        prediction = await asyncio.to_thread(get_intent_classifier().predict, user_input)
+        if prediction.confident:
+            return {"agents": [AGENT_MAP[prediction.label]], "dependent": False, "path": prediction.source}
+
+    start = time.perf_counter()
+    try:
+        agents, dependent = parse_multi_intent((await multi_intent_chain.arun(user_input=user_input)).strip())
+    except Exception as e:
+        print("[Error en aclassify_intents]:", e)
+        agents, dependent = [], False
+    if INTENT_FASTPATH_ENABLED:
+        get_intent_classifier().record_llm_call((time.perf_counter() - start) * 1000)
+    # Aggression is handled alone, like in the single classification
+    if "sentiment_agent" in agents:
+        agents = ["sentiment_agent"]
+    # guardrail only means "no task" when nothing else was detected
+    agents = [agent for agent in agents if agent != "guardrail"] or agents
+    return {"agents": agents or ["rag_agent"], "dependent": dependent, "path": "llm"}
+
+def _supervisor_inputs(
+    original_input: str,
+    current_agent: str,
+    agent_response: str,
+    messages: Optional[List[dict]] = None,
+    executed_agents: Optional[List[str]] = None,
+) -> dict:
+    """Prompt variables of the supervisor chain"""
+    conversation_history = ""
+    if messages:
+        conversation_history = "\n".join([
+            f"{msg['role']} ({msg.get('agent', 'user')}): {msg['content']}"
+            for msg in messages
+        ])
+    
+    
+    executed_agents_str = ", ".join(executed_agents) if executed_agents else "ninguno"
+    
+    print("Conversation history: ", conversation_history)
+    print("Agent Response: ", agent_response)
+    print("Executed agents: ", executed_agents_str)
+    
+    return {
+        "original_input": original_input,
+        "current_agent": current_agent,
+        "agent_response": agent_response,
+        "conversation_history": conversation_history,
+        "executed_agents": executed_agents_str
+    }
+
+def _validate_decision(result: str) -> str:
+    print("Result: ", result)
+    # Validate that the result is valid
+    valid_options = ["guardrail", "rag_agent", "sentiment_agent", "email_agent", "tech_agent"]
+    if result in valid_options:
+        return result
+    else:
+        print(f"[Warning] Supervisor devolvió resultado inválido: {result}, usando guardrail")
+        return "guardrail"
+
 def supervise_agent_response(
     original_input: str,
     current_agent: str,
@@ -119,36 +278,24 @@ def supervise_agent_response(
     Now receives the complete message history and executed agents to make more intelligent decisions
     """
     try:
-    
-        conversation_history = ""
-        if messages:
-            conversation_history = "\n".join([
-                f"{msg['role']} ({msg.get('agent', 'user')}): {msg['content']}"
-                for msg in messages
-            ])
-        
-        
-        executed_agents_str = ", ".join(executed_agents) if executed_agents else "ninguno"
-        
-        print("Conversation history: ", conversation_history)
-        print("Agent Response: ", agent_response)
-        print("Executed agents: ", executed_agents_str)
-        
-        result = supervisor_chain.run(
-            original_input=original_input,
-            current_agent=current_agent,
-            agent_response=agent_response,
-            conversation_history=conversation_history,
-            executed_agents=executed_agents_str
-        ).strip()
-        print("Result: ", result)
-        # Validate that the result is valid
-        valid_options = ["guardrail", "rag_agent", "sentiment_agent", "email_agent", "tech_agent"]
-        if result in valid_options:
-            return result
-        else:
-            print(f"[Warning] Supervisor devolvió resultado inválido: {result}, usando guardrail")
-            return "guardrail"
+        inputs = _supervisor_inputs(original_input, current_agent, agent_response, messages, executed_agents)
+        return _validate_decision(supervisor_chain.run(**inputs).strip())
+            
+    except Exception as e:
+        print("[Error en supervise_agent_response]:", e)
+        return "guardrail"
+
+async def asupervise_agent_response(
+    original_input: str,
+    current_agent: str,
+    agent_response: str,
+    messages: Optional[List[dict]] = None,
+    executed_agents: Optional[List[str]] = None,
+) -> str:
+    """Async version of supervise_agent_response"""
+    try:
+        inputs = _supervisor_inputs(original_input, current_agent, agent_response, messages, executed_agents)
+        return _validate_decision((await supervisor_chain.arun(**inputs)).strip())
             
     except Exception as e:
         print("[Error en supervise_agent_response]:", e)
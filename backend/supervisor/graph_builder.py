@@ -1,7 +1,11 @@
+import operator
 import os
+import time
 from typing import TypedDict
-from typing import List
+from typing import Annotated, Dict, List
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph
+from langgraph.types import Send
 from backend.utils.db_actions import save_message
 # LangGraph expects a dict as state
 # These are the following keys
@@ -12,6 +16,13 @@ from backend.utils.db_actions import save_message
 # - current_agent: agent that just executed
 # - supervisor_decision: supervisor's decision
 # - messages: array with all conversation message history
+# - agent_executions: executions per agent in this request (policy limits)
+# - decision_log: which path (rule / llm / fast path) decided each hop
+# - parallel_agents: independent agents run as parallel branches (fan-out mode)
+# - branch_agent: agent of one parallel branch (only in the Send payload)
+# - branch_results: responses of the parallel branches, concatenated by the reducer
+# - stream: the guardrail streams the final answer (/chat/stream)
+# - filtered_sentences: streamed sentences dropped by the toxicity check
 from IPython.display import display, Image
 
 
@@ -25,23 +36,39 @@ class State(TypedDict):
     supervisor_decision: str
     messages: List[dict]  # Array with message history
     executed_agents: List[str]  # Array with executed agents history
+    agent_executions: Dict[str, int]  # Executions per agent
+    decision_log: List[dict]  # One entry per supervisor decision
+    parallel_agents: List[str]  # Fan-out agents of this request
+    branch_agent: str  # Agent of a parallel branch
+    branch_results: Annotated[List[dict], operator.add]  # Written concurrently by the branches
+    stream: bool  # Stream the final answer as custom events
+    filtered_sentences: int  # Streamed sentences dropped by the guardrail
 
 # Supervisor node that evaluates agent response and decides next step
-from backend.supervisor.agent_supervisor import classify_with_gemini, supervise_agent_response
+from backend.supervisor.agent_supervisor import aclassify_intent, aclassify_intents, asupervise_agent_response
+from backend.supervisor.policy import SUPERVISOR_FANOUT, adecide_next_step, fanout_agents
 
-def supervisor_node(state):
+# current_agent after the parallel branches were merged
+FANOUT_AGENT = "fanout"
+
+async def supervisor_node(state):
     """
     Main supervisor node that:
     1. Receives the initial user input
     2. Decides which agent should handle the task
     3. Evaluates agent responses
     4. Decides whether to go to guardrail or delegate to another agent
+       (deterministic policy rules first, the LLM only for ambiguous hops)
+    With SUPERVISOR_FANOUT, independent intents of the input are sent to
+    their agents at once and evaluated together after merge_branches
     """
     user_input = state["input"]
     current_agent = state.get("current_agent", "")
     agent_response = state.get("tool_response", "")
     messages = state.get("messages", [])
     executed_agents = state.get("executed_agents", [])
+    agent_executions = dict(state.get("agent_executions") or {})
+    decision_log = list(state.get("decision_log") or [])
     
     # If it's the first time (no current_agent), classify the initial input
     if not current_agent:
@@ -52,35 +79,74 @@ def supervisor_node(state):
             "timestamp": "initial"
         })
         
-        # Classify initial input to determine the first agent
-        agent = classify_with_gemini(user_input)
+        # Classify initial input to determine the first agent (local fast path, then Gemini)
+        start = time.perf_counter()
+        parallel_agents = []
+        if SUPERVISOR_FANOUT:
+            intents = await aclassify_intents(user_input)
+            agent, path = intents["agents"][0], intents["path"]
+            # Dependent intents keep the sequential chain, starting with the first one
+            parallel_agents = fanout_agents(intents["agents"], intents["dependent"], user_input)
+        else:
+            agent, path = await aclassify_intent(user_input)
+        decision_log.append({
+            "hop": 0,
+            "agent": None,
+            "decision": " + ".join(parallel_agents) if parallel_agents else agent,
+            "path": path,
+            "rule": None,
+            "ms": round((time.perf_counter() - start) * 1000, 2)
+        })
         
         return {
             "next_agent": agent,
+            "parallel_agents": parallel_agents,
             "messages": messages,
-            "executed_agents": executed_agents
+            "executed_agents": executed_agents,
+            "agent_executions": agent_executions,
+            "decision_log": decision_log
         }
     else:
-        # Add agent response to history
-        messages.append({
-            "role": "agent",
-            "agent": current_agent,
-            "content": agent_response,
-            "timestamp": "after_agent"
-        })
-        
-        # Add current agent to executed agents history
-        if current_agent not in executed_agents:
-            executed_agents.append(current_agent)
+        fanout = current_agent == FANOUT_AGENT
+        if fanout:
+            # merge_branches already added every branch response to the history
+            current_agent = ", ".join(state.get("parallel_agents") or [])
+        else:
+            # Add agent response to history
+            messages.append({
+                "role": "agent",
+                "agent": current_agent,
+                "content": agent_response,
+                "timestamp": "after_agent"
+            })
+            
+            # Add current agent to executed agents history
+            if current_agent not in executed_agents:
+                executed_agents.append(current_agent)
+            agent_executions[current_agent] = agent_executions.get(current_agent, 0) + 1
         
-        # Supervisor evaluates the response and decides the next step
-        decision = supervise_agent_response(user_input, current_agent, agent_response, messages, executed_agents)
+        # Policy rules settle the deterministic cases, the supervisor LLM the rest
+        entry = await adecide_next_step(
+            current_agent,
+            agent_executions,
+            hops=sum(agent_executions.values()),
+            llm_decide=lambda: asupervise_agent_response(
+                user_input, current_agent, agent_response, messages,
+                [f"{agent} ({count})" for agent, count in agent_executions.items()]
+            ),
+            fanout=fanout
+        )
+        decision_log.append(entry)
+        decision = entry["decision"]
+        print(f"[Supervisor] {current_agent} -> {decision} ({entry['path']}{', ' + entry['rule'] if entry['rule'] else ''})")
         
         return {
             "supervisor_decision": decision,
             "next_agent": decision if decision != "guardrail" else "",
             "messages": messages,
-            "executed_agents": executed_agents
+            "executed_agents": executed_agents,
+            "agent_executions": agent_executions,
+            "decision_log": decision_log
         }
 
 # Message logging nodes
@@ -113,19 +179,96 @@ from backend.agents.sentiment_agent import sentiment_agent_node
 from backend.agents.email_agent import email_agent_node
 from backend.agents.tech_agent import tech_agent_node
 
+AGENT_NODES = {
+    "rag_agent": rag_agent_node,
+    "sentiment_agent": sentiment_agent_node,
+    "email_agent": email_agent_node,
+    "tech_agent": tech_agent_node,
+}
+
+
+# Fan-out nodes
+# Every branch runs one agent over its own copy of the history; LangGraph runs
+# the branches of a superstep concurrently and merge_branches runs once after all
+async def parallel_agent_node(state: dict) -> dict:
+    agent = state["branch_agent"]
+    branch_state = {
+        **state,
+        "messages": list(state.get("messages") or []),
+        "executed_agents": list(state.get("executed_agents") or []),
+    }
+    start = time.perf_counter()
+    try:
+        response = (await AGENT_NODES[agent](branch_state)).get("tool_response", "")
+    except Exception as e:
+        print(f"[Fan-out] {agent} error: {e}")
+        response = f"Error en {agent}: {e}"
+    return {"branch_results": [{
+        "agent": agent,
+        "content": response,
+        "ms": round((time.perf_counter() - start) * 1000, 2)
+    }]}
+
+def merge_branches_node(state: dict) -> dict:
+    """
+    Adds the branch responses to the history in the classified order, so the
+    supervisor and the guardrail see them as consecutive agent turns
+    """
+    order = state.get("parallel_agents") or []
+    results = sorted(state.get("branch_results") or [], key=lambda result: order.index(result["agent"]))
+    messages = state.get("messages", [])
+    executed_agents = state.get("executed_agents", [])
+    agent_executions = dict(state.get("agent_executions") or {})
+    decision_log = list(state.get("decision_log") or [])
+
+    for result in results:
+        messages.append({
+            "role": "agent",
+            "agent": result["agent"],
+            "content": result["content"],
+            "timestamp": "after_agent"
+        })
+        if result["agent"] not in executed_agents:
+            executed_agents.append(result["agent"])
+        agent_executions[result["agent"]] = agent_executions.get(result["agent"], 0) + 1
+
+    branch_ms = {result["agent"]: result["ms"] for result in results}
+    decision_log.append({
+        "hop": sum(agent_executions.values()),
+        "agent": None,
+        "decision": "merge",
+        "path": "fanout",
+        "rule": None,
+        "ms": max(branch_ms.values(), default=0.0),
+        "branches": branch_ms
+    })
+    print(f"[Fan-out] {', '.join(branch_ms)} in {max(branch_ms.values(), default=0.0)}ms "
+          f"(sequential {round(sum(branch_ms.values()), 2)}ms)")
+
+    return {
+        "current_agent": FANOUT_AGENT,
+        "tool_response": "\n\n".join(result["content"] for result in results),
+        "messages": messages,
+        "executed_agents": executed_agents,
+        "agent_executions": agent_executions,
+        "decision_log": decision_log
+    }
+
 # Graph construction
 builder = StateGraph(State)
 
 
-from backend.moderation.guardrail import apply_toxic_guardrail_and_store
+from backend.moderation.guardrail import apply_toxic_guardrail_and_store, stream_toxic_guardrail_and_store
 
-def guardrail_node(state: dict) -> dict:
+async def guardrail_node(state: dict) -> dict:
     """
     Guardrail node that processes all message history,
     generates a coherent final response and validates it
     """
-    
-    return apply_toxic_guardrail_and_store(state)
+    if state.get("stream"):
+        # Validated sentences reach app.astream(stream_mode="custom") as they are generated
+        return await stream_toxic_guardrail_and_store(state, get_stream_writer())
+    return await apply_toxic_guardrail_and_store(state)
 
 
 builder.add_node("guardrail", guardrail_node)
@@ -134,15 +277,20 @@ builder.add_node("rag_agent", rag_agent_node)
 builder.add_node("sentiment_agent", sentiment_agent_node)
 builder.add_node("email_agent", email_agent_node)
 builder.add_node("tech_agent", tech_agent_node)
+builder.add_node("parallel_agent", parallel_agent_node)
+builder.add_node("merge_branches", merge_branches_node)
 builder.add_node("finalize", finalize_output)
 
 # Graph flow - SUPERVISOR IS THE ENTRY POINT
 builder.set_entry_point("supervisor")
 
 # Function to route from supervisor
-def route_from_supervisor(state: State) -> str:
+def route_from_supervisor(state: State):
     # If there's no current_agent, it's the first time and goes to an agent
     if not state.get("current_agent"):
+        # Fan-out: one parallel branch per independent agent
+        if state.get("parallel_agents"):
+            return [Send("parallel_agent", {**state, "branch_agent": agent}) for agent in state["parallel_agents"]]
         return state["next_agent"]
     else:
         # If there's already an executed agent, evaluate supervisor's decision
@@ -162,6 +310,7 @@ builder.add_conditional_edges(
         "sentiment_agent": "sentiment_agent",
         "email_agent": "email_agent",
         "tech_agent": "tech_agent",
+        "parallel_agent": "parallel_agent",
     },
 )
 
@@ -171,6 +320,10 @@ builder.add_edge("sentiment_agent", "supervisor")
 builder.add_edge("email_agent", "supervisor")
 builder.add_edge("tech_agent", "supervisor")
 
+# Parallel branches are merged once, then one supervisor pass
+builder.add_edge("parallel_agent", "merge_branches")
+builder.add_edge("merge_branches", "supervisor")
+
 # Guardrail goes to the end
 builder.add_edge("guardrail", "finalize")
 
@@ -178,6 +331,7 @@ builder.add_edge("guardrail", "finalize")
 builder.set_finish_point("finalize")
 
 # Compile graph
+# Agent, supervisor and guardrail nodes are coroutines: run it with app.ainvoke
 app = builder.compile()
 
 if __name__ == "__main__":
@@ -0,0 +1,192 @@
+"""
+Local fast path for the initial intent classification
+
+Cheap heuristics (small talk, obvious insults, CSV-like data) and a kNN head
+over the e5 embeddings of labeled examples (data/intent_examples.json) classify
+the input before Gemini is asked. Only predictions with a confidence of at
+least INTENT_CONFIDENCE_THRESHOLD short-circuit the LLM; the rest still go
+through classify_with_gemini.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+INTENT_FASTPATH_ENABLED = os.getenv("INTENT_FASTPATH_ENABLED", "1") == "1"
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.8"))
+# Nearest example must be at least this similar for the kNN vote to count
+INTENT_MIN_SIMILARITY = float(os.getenv("INTENT_MIN_SIMILARITY", "0.85"))
+INTENT_KNN_K = int(os.getenv("INTENT_KNN_K", "5"))
+INTENT_EXAMPLES_PATH = os.getenv(
+    "INTENT_EXAMPLES_PATH", os.path.join(os.path.dirname(__file__), "data", "intent_examples.json")
+)
+
+# Greetings, thanks and farewells. Confirmations ("si", "no", "dale", "ok", "listo")
+# are left out on purpose: they usually answer the agent's last question
+# ("¿Querés que envíe el email?") and must reach the kNN / LLM with that context
+SMALL_TALK_WORDS = {
+    "hola", "buen", "buenos", "buena", "buenas", "dia", "dias", "tarde", "tardes", "noche", "noches",
+    "gracias", "muchas", "chau", "adios", "saludos", "jaja", "jajaja", "hey", "que", "tal", "como", "va",
+    "estas",
+}
+MAX_SMALL_TALK_WORDS = 4
+# Obvious insults only: the prompt sends any aggression to analisis_sentimiento.
+# Words with an everyday or slang meaning ("separar la basura", "de puta madre") are left to the LLM
+INSULT_RE = re.compile(
+    r"\b(mierda|porqueria|idiotas?|inutiles?|estupid[oa]s?|imbeciles?|pelotud[oa]s?|"
+    r"carajo|tarad[oa]s?|forr[oa]s?|hijos? de puta|la concha)\b"
+)
+# Three or more fields joined by a delimiter without spaces ("nombre,edad,ciudad")
+DELIMITED_RE = re.compile(r"(?:^|[\s:])[^\s,;|]+(?:[,;|\t][^\s,;|]+){2,}")
+# Thousands groups ("1,200,000") match DELIMITED_RE too, data rows have a text field
+ALPHA_RE = re.compile(r"[^\W\d_]")
+WORD_RE = re.compile(r"[a-zñ0-9]+")
+ACCENTS = str.maketrans("áéíóúü", "aeiouu")
+
+IntentPrediction = namedtuple("IntentPrediction", ["label", "confidence", "source", "confident"])
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase without accents, the heuristics don't depend on spelling them"""
+    return (text or "").lower().translate(ACCENTS)
+
+
+def heuristic_intent(text: str):
+    """
+    Returns:
+        (label, confidence) for trivially classifiable inputs, or None
+    """
+    normalized = normalize_text(text)
+    words = WORD_RE.findall(normalized)
+    if INSULT_RE.search(normalized):
+        return "analisis_sentimiento", 0.95
+    if not words:
+        return "guardrail", 0.9
+    if len(words) <= MAX_SMALL_TALK_WORDS and all(word in SMALL_TALK_WORDS for word in words):
+        return "guardrail", 0.95
+    # A question that lists names ("¿Soportan CSV,XLSX,JSON?") is not data to process
+    if "?" not in (text or "") and any(ALPHA_RE.search(m.group()) for m in DELIMITED_RE.finditer(text or "")):
+        return "tarea_tecnica", 0.9
+    return None
+
+
+def load_examples(path: str = INTENT_EXAMPLES_PATH) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [(item["text"], item["label"]) for item in json.load(f)]
+
+
+def _default_embed(texts: list) -> list:
+    from backend.utils.embedding_service import embed_queries
+
+    return embed_queries(texts)
+
+
+class IntentClassifier:
+    """Heuristics + similarity-weighted kNN vote over embedded examples"""
+
+    def __init__(self, examples: list = None, embed=None, k: int = INTENT_KNN_K,
+                 threshold: float = INTENT_CONFIDENCE_THRESHOLD, min_similarity: float = INTENT_MIN_SIMILARITY):
+        self.examples = examples if examples is not None else load_examples()
+        self.embed = embed or _default_embed
+        self.k = k
+        self.threshold = threshold
+        self.min_similarity = min_similarity
+        self._matrix = None
+        self._labels = [label for _, label in self.examples]
+        self._lock = threading.Lock()
+        self._matrix_lock = threading.Lock()
+        self._stats = {"requests": 0, "heuristic": 0, "knn": 0, "llm": 0, "errors": 0,
+                       "fastpath_ms": 0.0, "shortcut_fastpath_ms": 0.0, "llm_ms": 0.0}
+
+    def _example_matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            with self._matrix_lock:
+                if self._matrix is None:
+                    vectors = np.asarray(self.embed([text for text, _ in self.examples]), dtype=np.float32)
+                    vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+                    self._matrix = vectors
+        return self._matrix
+
+    def knn_intent(self, text: str) -> tuple:
+        """
+        Returns:
+            (label, confidence): share of the similarity mass of the k nearest
+            examples that votes for the label (0 if the nearest is too far)
+        """
+        matrix = self._example_matrix()
+        query = np.asarray(self.embed([text])[0], dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        similarities = matrix @ query
+        nearest = np.argsort(-similarities)[:self.k]
+        if similarities[nearest[0]] < self.min_similarity:
+            return self._labels[nearest[0]], 0.0
+        votes = {}
+        for i in nearest:
+            votes[self._labels[i]] = votes.get(self._labels[i], 0.0) + max(float(similarities[i]), 0.0)
+        label = max(votes, key=votes.get)
+        total = sum(votes.values())
+        return label, (votes[label] / total if total else 0.0)
+
+    def predict(self, text: str) -> IntentPrediction:
+        start = time.perf_counter()
+        source = "heuristic"
+        try:
+            result = heuristic_intent(text)
+            if result is None:
+                source = "knn"
+                result = self.knn_intent(text)
+        except Exception as e:
+            print(f"❌ Intent fast path error: {e}")
+            self._count(errors=1)
+            result, source = ("guardrail", 0.0), "error"
+        label, confidence = result
+        confident = source != "error" and confidence >= self.threshold
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self._count(requests=1, fastpath_ms=elapsed_ms)
+        if confident:
+            self._count(**{source: 1}, shortcut_fastpath_ms=elapsed_ms)
+        return IntentPrediction(label, round(confidence, 4), source, confident)
+
+    def record_llm_call(self, elapsed_ms: float):
+        self._count(llm=1, llm_ms=elapsed_ms)
+
+    def _count(self, **values):
+        with self._lock:
+            for key, value in values.items():
+                self._stats[key] += value
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        shortcuts = stats["heuristic"] + stats["knn"]
+        avg_llm_ms = stats["llm_ms"] / stats["llm"] if stats["llm"] else 0.0
+        stats["short_circuit_rate"] = round(shortcuts / stats["requests"], 4) if stats["requests"] else 0.0
+        stats["avg_llm_ms"] = round(avg_llm_ms, 2)
+        stats["avg_fastpath_ms"] = round(stats["fastpath_ms"] / stats["requests"], 3) if stats["requests"] else 0.0
+        # Every short-circuit skips an average Gemini call but the fast path runs on every request
+        stats["estimated_saved_ms"] = round(shortcuts * avg_llm_ms - stats["fastpath_ms"], 1)
+        for key in ("fastpath_ms", "shortcut_fastpath_ms", "llm_ms"):
+            stats[key] = round(stats[key], 2)
+        stats.update(threshold=self.threshold, examples=len(self.examples))
+        return stats
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_intent_classifier() -> IntentClassifier:
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = IntentClassifier()
+    return _classifier
@@ -0,0 +1,152 @@
+"""
+Rule-based policy that settles supervisor hops without an LLM call
+
+After an agent runs, these rules from the supervisor prompt are deterministic
+and decided in code:
+    hop_limit       SUPERVISOR_MAX_HOPS agent executions reached   -> guardrail
+    sentiment_final sentiment_agent already calmed/warned the user -> guardrail
+    all_exhausted   every agent reached its max executions         -> guardrail
+    fanout_complete the independent intents ran as parallel branches -> guardrail
+Only the remaining (ambiguous) hops ask supervise_agent_response, and its
+answer is still checked against the per-agent limits. Every hop is recorded
+in the state's decision_log with the path (rule / llm) that decided it.
+"""
+import os
+import re
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from backend.supervisor.intent_classifier import normalize_text
+
+load_dotenv(override=True)
+
+# Max executions per agent within one request (rag_agent: "maximo 2 veces" in the prompt)
+DEFAULT_MAX_EXECUTIONS = {"rag_agent": 2, "sentiment_agent": 1, "email_agent": 1, "tech_agent": 1}
+SUPERVISOR_MAX_HOPS = int(os.getenv("SUPERVISOR_MAX_HOPS", "4"))
+
+
+def parse_limits(value: str) -> dict:
+    limits = dict(DEFAULT_MAX_EXECUTIONS)
+    for item in (value or "").split(","):
+        if "=" in item:
+            agent, limit = item.split("=", 1)
+            limits[agent.strip()] = int(limit)
+    return limits
+
+
+# SUPERVISOR_MAX_EXECUTIONS="rag_agent=3,tech_agent=2" overrides single agents
+AGENT_MAX_EXECUTIONS = parse_limits(os.getenv("SUPERVISOR_MAX_EXECUTIONS", ""))
+
+# Fan-out mode: independent intents of one message run as parallel branches
+SUPERVISOR_FANOUT = os.getenv("SUPERVISOR_FANOUT", "0") == "1"
+FANOUT_AGENTS = {"rag_agent", "email_agent", "tech_agent"}
+# A task that uses the result of another one ("...y mandalo por correo") keeps
+# the sequential chain even if the classifier called them independent
+DEPENDENCY_RE = re.compile(
+    r"\b(con (eso|esto|esa|esos|esas|ese|la respuesta|el resultado|lo que)|"
+    r"(mand|envi|pas|arm)a(lo|la|los|las|melo|mela)|resumi(lo|la|melo|mela)|lo anterior|en base a (eso|esa|lo))\b"
+)
+
+_stats_lock = threading.Lock()
+_policy_stats = {"hops": 0, "rule": 0, "llm": 0, "llm_overridden": 0, "llm_ms": 0.0}
+
+
+def available_agents(executions: dict, limits: dict = None) -> list:
+    """Agents that have not reached their max executions"""
+    limits = limits or AGENT_MAX_EXECUTIONS
+    return [agent for agent, limit in limits.items() if executions.get(agent, 0) < limit]
+
+
+def fanout_agents(agents: list, dependent: bool, user_input: str) -> list:
+    """
+    Returns:
+        The agents to run as parallel branches, or [] when the request must
+        follow the sequential chain (single intent, dependent tasks, sentiment)
+    """
+    if dependent or len(agents) < 2 or not set(agents) <= FANOUT_AGENTS:
+        return []
+    if DEPENDENCY_RE.search(normalize_text(user_input)):
+        return []
+    return list(agents)
+
+
+def rule_decision(current_agent: str, executions: dict, hops: int, limits: dict = None,
+                  max_hops: int = None, fanout: bool = False):
+    """
+    Returns:
+        (decision, rule) when a deterministic rule applies, otherwise None
+    """
+    max_hops = max_hops or SUPERVISOR_MAX_HOPS
+    if hops >= max_hops:
+        return "guardrail", "hop_limit"
+    if current_agent == "sentiment_agent":
+        return "guardrail", "sentiment_final"
+    if not available_agents(executions, limits):
+        return "guardrail", "all_exhausted"
+    if fanout:
+        return "guardrail", "fanout_complete"
+    return None
+
+
+def decide_next_step(current_agent: str, executions: dict, hops: int, llm_decide, limits: dict = None,
+                     max_hops: int = None, fanout: bool = False) -> dict:
+    """
+    Decides the step after current_agent
+    Args:
+        current_agent: Agent that just ran
+        executions: Executions per agent in this request (current one included)
+        hops: Agent executions so far in this request
+        llm_decide: Callable without arguments that asks the LLM supervisor
+        limits: Max executions per agent (defaults to AGENT_MAX_EXECUTIONS)
+        max_hops: Global hop limit (defaults to SUPERVISOR_MAX_HOPS)
+        fanout: current_agent is the merge of parallel branches
+    Returns:
+        decision_log entry: hop, agent, decision, path ("rule" / "llm"), rule and ms
+    """
+    start = time.perf_counter()
+    ruled = rule_decision(current_agent, executions, hops, limits, max_hops, fanout)
+    decision = None if ruled else llm_decide()
+    return _record_entry(current_agent, executions, hops, limits, ruled, decision, start)
+
+
+async def adecide_next_step(current_agent: str, executions: dict, hops: int, llm_decide, limits: dict = None,
+                            max_hops: int = None, fanout: bool = False) -> dict:
+    """Async version of decide_next_step, llm_decide returns an awaitable"""
+    start = time.perf_counter()
+    ruled = rule_decision(current_agent, executions, hops, limits, max_hops, fanout)
+    decision = None if ruled else await llm_decide()
+    return _record_entry(current_agent, executions, hops, limits, ruled, decision, start)
+
+
+def _record_entry(current_agent: str, executions: dict, hops: int, limits: dict, ruled, decision: str,
+                  start: float) -> dict:
+    entry = {"hop": hops, "agent": current_agent}
+    if ruled:
+        entry.update(decision=ruled[0], path="rule", rule=ruled[1])
+    else:
+        rule = None
+        # The prompt asks the LLM to respect the limits, the code enforces them
+        if decision != "guardrail" and decision not in available_agents(executions, limits):
+            rule, decision = "limit_enforced", "guardrail"
+        entry.update(decision=decision, path="llm", rule=rule)
+    entry["ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    with _stats_lock:
+        _policy_stats["hops"] += 1
+        _policy_stats[entry["path"]] += 1
+        if entry["path"] == "llm":
+            _policy_stats["llm_ms"] += entry["ms"]
+            _policy_stats["llm_overridden"] += int(entry["rule"] == "limit_enforced")
+    return entry
+
+
+def get_policy_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_policy_stats)
+    stats["rule_rate"] = round(stats["rule"] / stats["hops"], 4) if stats["hops"] else 0.0
+    stats["avg_llm_ms"] = round(stats["llm_ms"] / stats["llm"], 2) if stats["llm"] else 0.0
+    stats["llm_ms"] = round(stats["llm_ms"], 2)
+    stats.update(max_hops=SUPERVISOR_MAX_HOPS, max_executions=AGENT_MAX_EXECUTIONS, fanout=SUPERVISOR_FANOUT)
+    return stats
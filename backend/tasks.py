@@ -1,8 +1,12 @@
 from celery import Celery
+from celery.signals import worker_process_init
 import boto3
 import os
 from dotenv import load_dotenv
-from backend.utils.llamaindex_utils import chunk_faq_recursive
+from backend.utils.streaming_ingestion import READ_SIZE, decode_stream, iter_file_text, stream_ingest
+from backend.utils.embeddings import get_embed_model, get_embed_model_stats
+from backend.utils.embedding_cache import get_embedding_cache_stats
+from backend.utils.embedding_service import get_embedding_service_stats
 from .celery_config import CELERY_CONFIG
 
 load_dotenv(override=True)
@@ -11,33 +15,63 @@ load_dotenv(override=True)
 celery_app = Celery("tasks")
 celery_app.config_from_object(CELERY_CONFIG)
 
+
+@worker_process_init.connect
+def preload_embed_model(**kwargs):
+    """Loads the embedding model once per worker process, before any task runs"""
+    try:
+        get_embed_model()
+        stats = get_embed_model_stats()
+        print(f"📊 Embedding model stats (pid {stats['pid']}): loads={stats['loads']}, load_seconds={stats['load_seconds']:.2f}")
+    except Exception as e:
+        # Tasks will retry the lazy load on first use
+        print(f"❌ Error preloading embedding model: {e}")
+
+
+def _log_preview(pieces):
+    """Prints the start of the document without reading the rest of it"""
+    first = next(pieces, "")
+    print(f"✅ Text processed:\n{first[:200]}...")
+    yield first
+    yield from pieces
+
+
+def _ingest_stream(pieces, doc_key: str = None):
+    """
+    New documents append chunks, a stable doc_key updates the stored version.
+    The text is consumed as a stream: memory stays bounded for any file size
+    """
+    stats = stream_ingest(_log_preview(iter(pieces)), doc_id=doc_key, versioned=bool(doc_key))
+    if doc_key:
+        print(f"✅ Document {doc_key} updated to version {stats['version']}")
+    return stats["doc_id"]
+
+
 @celery_app.task
-def process_s3_file(bucket, key):
+def process_s3_file(bucket, key, doc_key=None):
     s3 = boto3.client(
         "s3",
         aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
         aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
     )
     response = s3.get_object(Bucket=bucket, Key=key)
-    content = response["Body"].read().decode("utf-8")
-    print(f"✅ Text processed:\n{content[:200]}...")
+    pieces = decode_stream(response["Body"].iter_chunks(chunk_size=READ_SIZE))
 
-    # chunk_faq_recursive already handles saving chunks to the database
-    doc_id = chunk_faq_recursive(content)
+    doc_id = _ingest_stream(pieces, doc_key)
     print(f"✅ Processing completed with doc_id: {doc_id}")
+    print(f"📊 Embedding model loads in this worker: {get_embed_model_stats()['loads']}")
+    print(f"📊 Embedding cache stats in this worker: {get_embedding_cache_stats()}")
+    print(f"📊 Embedding service stats in this worker: {get_embedding_service_stats()}")
 
  
 @celery_app.task
-def process_local_file(file_path):
+def process_local_file(file_path, doc_key=None):
     if not os.path.exists(file_path):
         print(f"❌ File not found: {file_path}")
         return
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        content = f.read()
-
-    print(f"✅ Text processed:\n{content[:200]}...")
-
-    # chunk_faq_recursive already handles saving chunks to the database
-    doc_id = chunk_faq_recursive(content)
-    print(f"✅ Processing completed with doc_id: {doc_id}")
\ No newline at end of file
+    doc_id = _ingest_stream(iter_file_text(file_path), doc_key)
+    print(f"✅ Processing completed with doc_id: {doc_id}")
+    print(f"📊 Embedding model loads in this worker: {get_embed_model_stats()['loads']}")
+    print(f"📊 Embedding cache stats in this worker: {get_embedding_cache_stats()}")
+    print(f"📊 Embedding service stats in this worker: {get_embedding_service_stats()}")
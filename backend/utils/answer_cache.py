@@ -0,0 +1,154 @@
+"""
+Semantic answer cache for faq_query
+
+Stores (query embedding, retrieved chunk ids, final answer). A new query reuses
+a cached answer only when its embedding is within SEMANTIC_CACHE_THRESHOLD
+cosine similarity of the cached query AND its own fresh retrieval selected the
+same sources: same top chunk and at least SEMANTIC_CACHE_MIN_OVERLAP Jaccard
+overlap of the chunk ids. e5 puts most in-domain questions in a narrow, high
+similarity band, so two questions that only differ in a product, plan or date
+can pass the similarity check; they retrieve different chunks and miss. Off by
+default. Entries are deleted when any contributing doc_id is re-ingested.
+"""
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+sys.path.append("..")
+
+from dotenv import load_dotenv
+
+from backend.models.db import SemanticAnswerCache
+from backend.utils.db_connection import SessionLocal
+
+load_dotenv(override=True)
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "0") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.98"))
+SEMANTIC_CACHE_MIN_OVERLAP = float(os.getenv("SEMANTIC_CACHE_MIN_OVERLAP", "0.6"))
+SEMANTIC_CACHE_TTL_HOURS = float(os.getenv("SEMANTIC_CACHE_TTL_HOURS", "168"))  # 0 = no expiry
+
+_stats_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "rejected": 0, "stores": 0, "invalidated": 0}
+
+
+def _count(key: str, amount: int = 1):
+    with _stats_lock:
+        _cache_stats[key] += amount
+
+
+def sources_match(cached_chunk_ids: list, chunk_ids: list, min_overlap: float = None) -> bool:
+    """
+    True if a fresh retrieval selected the same sources as the cached answer:
+    same top chunk and a Jaccard overlap of at least min_overlap
+    """
+    min_overlap = SEMANTIC_CACHE_MIN_OVERLAP if min_overlap is None else min_overlap
+    if not cached_chunk_ids or not chunk_ids or cached_chunk_ids[0] != chunk_ids[0]:
+        return False
+    cached, fresh = set(cached_chunk_ids), set(chunk_ids)
+    return len(cached & fresh) / len(cached | fresh) >= min_overlap
+
+
+def lookup_answer(query_embedding, chunk_ids: list, threshold: float = None):
+    """
+    Returns the cached answer of the most similar previous query, if close enough
+    Args:
+        query_embedding: Embedding of the new query
+        chunk_ids: Chunks selected by the new query's own retrieval, in rank order
+        threshold: Minimum cosine similarity (defaults to SEMANTIC_CACHE_THRESHOLD)
+    Returns:
+        Dict with answer, similarity, query_text and chunk_ids, or None
+    """
+    threshold = threshold or SEMANTIC_CACHE_THRESHOLD
+    db = SessionLocal()
+    try:
+        distance = SemanticAnswerCache.query_embedding.cosine_distance(query_embedding)
+        query = db.query(SemanticAnswerCache, distance.label("distance"))
+        if SEMANTIC_CACHE_TTL_HOURS:
+            cutoff = datetime.now() - timedelta(hours=SEMANTIC_CACHE_TTL_HOURS)
+            query = query.filter(SemanticAnswerCache.created_at >= cutoff)
+        row = query.order_by(distance).limit(1).first()
+
+        if row is None or 1.0 - float(row.distance) < threshold:
+            _count("misses")
+            return None
+        if not sources_match(list(row.SemanticAnswerCache.chunk_ids), chunk_ids):
+            # Similar wording, different sources (another product, plan or date)
+            _count("rejected")
+            _count("misses")
+            return None
+
+        entry = row.SemanticAnswerCache
+        entry.hits += 1
+        db.commit()
+        _count("hits")
+        return {
+            "answer": entry.answer,
+            "similarity": 1.0 - float(row.distance),
+            "query_text": entry.query_text,
+            "chunk_ids": list(entry.chunk_ids),
+        }
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Semantic cache lookup error: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def store_answer(query_text: str, query_embedding, retrieved_docs: list, answer: str):
+    """Caches the answer together with the chunks and documents it was built from"""
+    chunk_ids = [doc["metadata"].get("chunk_id") for doc in retrieved_docs if doc["metadata"].get("chunk_id")]
+    doc_ids = sorted({doc["metadata"].get("doc_id") for doc in retrieved_docs if doc["metadata"].get("doc_id")})
+    if not doc_ids:
+        # Without source documents the entry could never be invalidated
+        return
+
+    db = SessionLocal()
+    try:
+        db.add(SemanticAnswerCache(
+            query_text=query_text,
+            query_embedding=query_embedding,
+            chunk_ids=chunk_ids,
+            doc_ids=doc_ids,
+            answer=answer,
+        ))
+        db.commit()
+        _count("stores")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Semantic cache store error: {e}")
+    finally:
+        db.close()
+
+
+def invalidate_answers_for_docs(doc_ids: list) -> int:
+    """Deletes every cached answer built from any of the given documents"""
+    if not doc_ids:
+        return 0
+    db = SessionLocal()
+    try:
+        deleted = (
+            db.query(SemanticAnswerCache)
+            .filter(SemanticAnswerCache.doc_ids.overlap(list(doc_ids)))
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        _count("invalidated", deleted)
+        if deleted:
+            print(f"🧹 Semantic cache: {deleted} answers invalidated for {list(doc_ids)}")
+        return deleted
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Semantic cache invalidation error: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+def get_answer_cache_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    return stats
@@ -0,0 +1,143 @@
+"""
+Bulk writer for document_embeddings
+
+Streams rows to Postgres with COPY ... FROM STDIN (text format, pgvector
+accepts the '[x1,x2,...]' literal) and falls back to batched multi-row
+INSERTs (psycopg2 execute_values) when COPY is not available.
+"""
+import io
+import os
+import sys
+import time
+from itertools import islice
+sys.path.append("..")
+
+from dotenv import load_dotenv
+
+from backend.utils.db_connection import engine
+
+load_dotenv(override=True)
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+# "copy" (COPY FROM STDIN) or "values" (multi-row INSERT)
+BULK_INSERT_METHOD = os.getenv("BULK_INSERT_METHOD", "copy")
+
+TABLE_NAME = "document_embeddings"
+CHUNK_COLUMNS = ("doc_id", "chunk_id", "text", "embedding", "content_hash", "chunk_index")
+
+
+def vector_to_text(embedding) -> str:
+    """Formats an embedding as a pgvector text literal"""
+    return "[" + ",".join(repr(float(x)) for x in embedding) + "]"
+
+
+def _copy_escape(value) -> str:
+    """Escapes a value for COPY text format"""
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\x00", "")
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _column_value(row: dict, column: str):
+    value = row.get(column)
+    if column == "embedding" and value is not None:
+        return vector_to_text(value)
+    return value
+
+
+def format_copy_row(row: dict, columns=CHUNK_COLUMNS) -> str:
+    """Builds one tab-separated COPY line for the given row"""
+    return "\t".join(_copy_escape(_column_value(row, column)) for column in columns) + "\n"
+
+
+def iter_batches(items, batch_size: int):
+    """Yields lists of up to batch_size items from any iterable, without materializing it"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _copy_batch(cursor, batch: list, columns):
+    buffer = io.StringIO()
+    for row in batch:
+        buffer.write(format_copy_row(row, columns))
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {TABLE_NAME} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def _values_batch(cursor, batch: list, columns):
+    from psycopg2.extras import execute_values
+
+    values = [tuple(_column_value(row, column) for column in columns) for row in batch]
+    execute_values(
+        cursor,
+        f"INSERT INTO {TABLE_NAME} ({', '.join(columns)}) VALUES %s",
+        values,
+        page_size=len(batch),
+    )
+
+
+def write_chunk_batches(cursor, rows, batch_size: int = None, method: str = None, columns=CHUNK_COLUMNS) -> dict:
+    """
+    Writes rows with an existing DB-API cursor (the caller owns the transaction)
+    Args:
+        cursor: psycopg2 cursor
+        rows: Iterable of dicts with doc_id, chunk_id, text, embedding,
+            content_hash and chunk_index
+        batch_size: Rows per round trip
+        method: "copy" or "values"
+    Returns:
+        Stats dict with rows, batches, seconds, rows_per_sec and method
+    """
+    batch_size = batch_size or INGEST_BATCH_SIZE
+    method = method or BULK_INSERT_METHOD
+    if method == "copy" and not hasattr(cursor, "copy_expert"):
+        method = "values"
+    write_batch = _copy_batch if method == "copy" else _values_batch
+
+    total_rows = 0
+    batches = 0
+    start = time.perf_counter()
+    for batch in iter_batches(rows, batch_size):
+        write_batch(cursor, batch, columns)
+        total_rows += len(batch)
+        batches += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        "rows": total_rows,
+        "batches": batches,
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(total_rows / elapsed, 1) if elapsed > 0 else float(total_rows),
+        "method": method,
+    }
+
+
+def bulk_insert_chunks(rows, batch_size: int = None, method: str = None) -> dict:
+    """Inserts all rows in a single transaction, one round trip per batch"""
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        stats = write_chunk_batches(cursor, rows, batch_size, method)
+        raw.commit()
+        print(
+            f"✅ Bulk insert: {stats['rows']} rows in {stats['batches']} batches "
+            f"({stats['rows_per_sec']} rows/s, {stats['method']})"
+        )
+        return stats
+    except Exception as e:
+        raw.rollback()
+        print(f"❌ Bulk insert error: {e}")
+        raise e
+    finally:
+        raw.close()
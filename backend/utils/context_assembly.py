@@ -0,0 +1,180 @@
+"""
+Adaptive context assembly for faq_query
+
+Instead of joining a fixed top-5 into the prompt, the retrieved chunks go
+through:
+    1. score filter   below CONTEXT_MIN_SIMILARITY or more than
+                      CONTEXT_MAX_SCORE_GAP under the best chunk (the best one
+                      is always kept, so Gemini can still say it lacks data)
+    2. de-duplication chunks whose words are mostly contained in an already
+                      selected chunk (splitter overlap, repeated FAQ entries)
+    3. token budget   chunks are taken in retrieval order (cosine, RRF or
+                      cross-encoder) until CONTEXT_TOKEN_BUDGET
+    4. merge          chunks of the same doc_id that are adjacent (chunk_index)
+                      or whose texts overlap are joined in document order,
+                      without repeating the overlapping words
+"""
+import os
+import re
+
+from dotenv import load_dotenv
+
+from backend.utils.faq_chunker import estimate_tokens
+
+load_dotenv(override=True)
+
+# Candidates fetched from the retriever, the budget decides how many are used
+CONTEXT_FETCH_K = int(os.getenv("CONTEXT_FETCH_K", "8"))
+CONTEXT_MIN_SIMILARITY = float(os.getenv("CONTEXT_MIN_SIMILARITY", "0.75"))
+CONTEXT_MAX_SCORE_GAP = float(os.getenv("CONTEXT_MAX_SCORE_GAP", "0.08"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+# Fraction of a chunk's words already present in a selected chunk to drop it
+CONTEXT_DUPLICATE_RATIO = float(os.getenv("CONTEXT_DUPLICATE_RATIO", "0.85"))
+# Shortest word run accepted as the overlap between two consecutive chunks
+MIN_OVERLAP_WORDS = 3
+MAX_OVERLAP_WORDS = 80
+
+WORD_RE = re.compile(r"\w+")
+
+
+def _words(text: str) -> set:
+    return set(WORD_RE.findall(text.lower()))
+
+
+def containment(a: set, b: set) -> float:
+    """Fraction of the smaller word set contained in the other"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def merge_overlap(first: str, second: str, min_words: int = MIN_OVERLAP_WORDS) -> str:
+    """
+    Joins two consecutive chunks when the end of first repeats as the start of second
+    Returns:
+        Merged text, or None if they do not overlap
+    """
+    head = list(re.finditer(r"\S+", second))
+    tail = first.split()
+    for size in range(min(len(head), len(tail), MAX_OVERLAP_WORDS), min_words - 1, -1):
+        if tail[-size:] == [match.group(0) for match in head[:size]]:
+            rest = second[head[size - 1].end():].strip()
+            return f"{first.rstrip()} {rest}".rstrip()
+    return None
+
+
+def _score(doc: dict) -> float:
+    score = doc["metadata"].get("score")
+    return float(score) if score is not None else 0.0
+
+
+def select_chunks(docs: list, min_similarity: float = None, max_gap: float = None,
+                  token_budget: int = None, duplicate_ratio: float = None) -> tuple:
+    """
+    Steps 1-3: score filter, de-duplication and token budget
+    Returns:
+        (selected docs in retrieval order, stats dict)
+    """
+    min_similarity = CONTEXT_MIN_SIMILARITY if min_similarity is None else min_similarity
+    max_gap = CONTEXT_MAX_SCORE_GAP if max_gap is None else max_gap
+    token_budget = token_budget or CONTEXT_TOKEN_BUDGET
+    duplicate_ratio = duplicate_ratio or CONTEXT_DUPLICATE_RATIO
+
+    stats = {"candidates": len(docs), "low_score": 0, "duplicates": 0, "over_budget": 0}
+    if not docs:
+        return [], stats
+
+    best = max(_score(doc) for doc in docs)
+    selected, selected_words, tokens = [], [], 0
+    for i, doc in enumerate(docs):
+        score = _score(doc)
+        # Cross-encoder order overrides the cosine gap, only the absolute floor applies
+        gap_floor = best - max_gap if doc["metadata"].get("rerank_score") is None else min_similarity
+        if i > 0 and (score < min_similarity or score < gap_floor):
+            stats["low_score"] += 1
+            continue
+        words = _words(doc["page_content"])
+        if any(containment(words, other) >= duplicate_ratio for other in selected_words):
+            stats["duplicates"] += 1
+            continue
+        doc_tokens = estimate_tokens(doc["page_content"])
+        if selected and tokens + doc_tokens > token_budget:
+            stats["over_budget"] += 1
+            continue
+        selected.append(doc)
+        selected_words.append(words)
+        tokens += doc_tokens
+    return selected, stats
+
+
+def merge_adjacent(docs: list) -> list:
+    """
+    Step 4: joins chunks of the same document that are consecutive
+    Returns:
+        Passages {"text", "doc_id", "chunk_ids", "score"} in the order of
+        their best-ranked chunk
+    """
+    groups, rank = {}, {}
+    for position, doc in enumerate(docs):
+        groups.setdefault(doc["metadata"].get("doc_id"), []).append(doc)
+        rank[id(doc)] = position
+
+    passages = []
+    for doc_id, group in groups.items():
+        # Document order when chunk_index is known, retrieval order otherwise
+        if all(doc["metadata"].get("chunk_index") is not None for doc in group):
+            group = sorted(group, key=lambda doc: doc["metadata"]["chunk_index"])
+        current = None
+        for doc in group:
+            metadata = doc["metadata"]
+            if current is not None and doc_id is not None:
+                merged = merge_overlap(current["text"], doc["page_content"])
+                adjacent = (
+                    metadata.get("chunk_index") is not None
+                    and current["last_index"] is not None
+                    and metadata["chunk_index"] == current["last_index"] + 1
+                )
+                if merged is None and adjacent:
+                    merged = f"{current['text']}\n{doc['page_content']}"
+                if merged is not None:
+                    current["text"] = merged
+                    current["chunk_ids"].append(metadata.get("chunk_id"))
+                    current["score"] = max(current["score"], _score(doc))
+                    current["rank"] = min(current["rank"], rank[id(doc)])
+                    current["last_index"] = metadata.get("chunk_index")
+                    continue
+            if current is not None:
+                passages.append(current)
+            current = {
+                "text": doc["page_content"],
+                "doc_id": doc_id,
+                "chunk_ids": [metadata.get("chunk_id")],
+                "score": _score(doc),
+                "rank": rank[id(doc)],
+                "last_index": metadata.get("chunk_index"),
+            }
+        if current is not None:
+            passages.append(current)
+
+    passages.sort(key=lambda passage: passage["rank"])
+    for passage in passages:
+        del passage["last_index"], passage["rank"]
+    return passages
+
+
+def assemble_context(docs: list, **limits) -> dict:
+    """
+    Builds the prompt context from retrieved chunks
+    Args:
+        docs: Retrieved chunks, best first, as {"page_content", "metadata"} dicts, metadata
+            with score, doc_id, chunk_id and (optionally) chunk_index
+        limits: Overrides of min_similarity, max_gap, token_budget, duplicate_ratio
+    Returns:
+        Dict with context (text for the prompt), passages, sources (the chunks
+        used, for the answer cache) and stats
+    """
+    selected, stats = select_chunks(docs, **limits)
+    passages = merge_adjacent(selected)
+    context = "\n\n".join(passage["text"] for passage in passages)
+    stats.update(kept=len(selected), passages=len(passages), tokens=estimate_tokens(context))
+    return {"context": context, "passages": passages, "sources": selected, "stats": stats}
@@ -1,34 +1,67 @@
+import asyncio
 import sys
 sys.path.append("..")
 
 from backend.utils.db_connection import SessionLocal
-from backend.models.db import DocumentEmbedding, ChatSession, ChatMessage
+from backend.models.db import DocumentEmbedding, DocumentVersion, ChatSession, ChatMessage
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from backend.utils.bulk_writer import bulk_insert_chunks
+from backend.utils.embedding_cache import content_hash
+from backend.utils.answer_cache import invalidate_answers_for_docs
 from llama_index.core import VectorStoreIndex
 import numpy as np
 
-def save_chunks_to_db(nodes, doc_id: str):
+def save_chunks_to_db(nodes, doc_id: str, batch_size: int = None):
+    """
+    Saves embedded nodes with the bulk writer (COPY, one round trip per batch)
+    Returns:
+        Bulk insert stats (rows, batches, seconds, rows_per_sec, method)
+    """
+    rows = []
+    skipped = 0
+    for position, node in enumerate(nodes):
+        if node.embedding is None:
+            skipped += 1
+            continue
+        rows.append({
+            "doc_id": doc_id,
+            "chunk_id": node.node_id,
+            "text": node.text,
+            "embedding": node.embedding,
+            "content_hash": content_hash(node.text),
+            "chunk_index": position,
+        })
+    if skipped:
+        print(f"❌ {skipped} nodes without embedding were skipped")
+
+    stats = bulk_insert_chunks(rows, batch_size=batch_size)
+    print("✅ Commit successful.")
+    bump_document_version(doc_id, stats["rows"])
+    return stats
+
+def bump_document_version(doc_id: str, added_chunks: int):
+    """Registers a new version of doc_id after chunks were appended"""
     db = SessionLocal()
     try:
-        for node in nodes:
-            if node.embedding is None:
-                print(f"❌ Node without embedding: {node.text[:30]}...")
-                continue
-            print(f"✅ Saving chunk: {node.node_id}")
-            chunk = DocumentEmbedding(
-                doc_id=doc_id,
-                chunk_id=node.node_id,
-                text=node.text,
-                embedding=node.embedding
-            )
-            db.add(chunk)
+        statement = insert(DocumentVersion).values(
+            doc_id=doc_id, version=1, chunk_count=added_chunks
+        ).on_conflict_do_update(
+            index_elements=["doc_id"],
+            set_={
+                "version": DocumentVersion.version + 1,
+                "chunk_count": DocumentVersion.chunk_count + added_chunks,
+                "updated_at": func.now(),
+            },
+        )
+        db.execute(statement)
         db.commit()
-        print("✅ Commit successful.")
     except Exception as e:
         db.rollback()
-        print(f"❌ Error: {e}")
-        raise e
+        print(f"❌ Error updating document version: {e}")
     finally:
         db.close()
+    invalidate_answers_for_docs([doc_id])
 
 def save_message(session_id: str, role: str, message: str):
     db = SessionLocal()
@@ -48,28 +81,17 @@ def save_message(session_id: str, role: str, message: str):
     finally:
         db.close()
 
+async def asave_message(session_id: str, role: str, message: str):
+    """save_message for async callers (worker thread, the event loop keeps serving other requests)"""
+    await asyncio.to_thread(save_message, session_id, role, message)
+
 
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.core import Settings, StorageContext, VectorStoreIndex
 from llama_index.vector_stores.postgres import PGVectorStore  
-# Lazy initialization of embedding model to avoid import-time failures
-_embed_model = None
+from backend.utils.embeddings import get_embed_model
+# Lazy initialization of the vector store to avoid import-time failures
 _vector_store = None
 
-def get_embed_model():
-    """Lazy load the embedding model only when needed"""
-    global _embed_model
-    if _embed_model is None:
-        try:
-            print("🔄 Loading embedding model...")
-            _embed_model = HuggingFaceEmbedding(model_name="intfloat/e5-base-v2")
-            print("✅ Embedding model loaded successfully")
-        except Exception as e:
-            print(f"❌ Error loading embedding model: {e}")
-            # Fallback to a simpler model or raise the error
-            raise e
-    return _embed_model
-
 def get_vector_store():
     """Lazy load the vector store only when needed"""
     global _vector_store
@@ -154,6 +176,10 @@ def insert_chat_session(session_id: str):
         if db:
             db.close()
 
+async def ainsert_chat_session(session_id: str):
+    """insert_chat_session for async callers (worker thread)"""
+    await asyncio.to_thread(insert_chat_session, session_id)
+
 if __name__ == "__main__":
     save_message("39105cb8-ba8c-40c6-aaf7-dd8571b605e0","ai","A ver")
     print("Anduvo")
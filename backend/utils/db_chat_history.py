@@ -1,15 +1,21 @@
+import asyncio
+
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.messages import HumanMessage, AIMessage
-from sqlalchemy.orm import Session
 from backend.models.db import ChatMessage
 from backend.utils.db_connection import SessionLocal
 from uuid import UUID
 
 class SQLAlchemyChatMessageHistory(BaseChatMessageHistory):
+    """
+    Chat history stored in chat_messages. Each call opens its own short-lived
+    session, so the async methods can run the queries on a worker thread
+    (asyncio.to_thread) and keep the graph's event loop free
+    """
+
     def __init__(self, session_id: UUID, persist: bool = True):
         self.session_id = session_id
         self.persist = persist
-        self.db: Session = SessionLocal()
 
     def add_message(self, message):
         """Adds a message to the history. If persist=False, doesn't save to DB."""
@@ -23,16 +29,18 @@ class SQLAlchemyChatMessageHistory(BaseChatMessageHistory):
             role=role,
             message=content
         )
-        self.db.add(new_msg)
-        self.db.commit()
+        with SessionLocal() as db:
+            db.add(new_msg)
+            db.commit()
 
     def get_messages(self):
-        rows = (
-            self.db.query(ChatMessage)
-            .filter(ChatMessage.session_id == self.session_id)
-            .order_by(ChatMessage.timestamp.asc())
-            .all()
-        )
+        with SessionLocal() as db:
+            rows = (
+                db.query(ChatMessage)
+                .filter(ChatMessage.session_id == self.session_id)
+                .order_by(ChatMessage.timestamp.asc())
+                .all()
+            )
 
         messages = []
         for row in rows:
@@ -43,11 +51,23 @@ class SQLAlchemyChatMessageHistory(BaseChatMessageHistory):
         return messages
 
     def clear(self):
-        self.db.query(ChatMessage).filter(
-            ChatMessage.session_id == self.session_id
-        ).delete()
-        self.db.commit()
-    
+        with SessionLocal() as db:
+            db.query(ChatMessage).filter(
+                ChatMessage.session_id == self.session_id
+            ).delete()
+            db.commit()
+
+    async def aget_messages(self):
+        return await asyncio.to_thread(self.get_messages)
+
+    async def aadd_messages(self, messages):
+        if not self.persist:
+            return
+        await asyncio.to_thread(self.add_messages, messages)
+
+    async def aclear(self):
+        await asyncio.to_thread(self.clear)
+
     @property
     def messages(self):
         return self.get_messages()
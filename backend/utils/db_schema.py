@@ -0,0 +1,368 @@
+"""
+Database schema management: pgvector extension, tables and ANN indexes
+on document_embeddings.embedding
+
+Usage:
+    python -m backend.utils.db_schema create-index
+    python -m backend.utils.db_schema create-text-search
+    python -m backend.utils.db_schema rebuild-ivfflat [--lists N]
+    python -m backend.utils.db_schema quantize --mode halfvec|binary|none
+    python -m backend.utils.db_schema status
+"""
+import argparse
+import math
+import os
+import sys
+import time
+sys.path.append("..")
+
+from dotenv import load_dotenv
+from sqlalchemy.sql import text
+
+try:
+    from backend.models.db import Base
+except ModuleNotFoundError:
+    from models.db import Base  # type: ignore
+
+load_dotenv(override=True)
+
+TABLE_NAME = "document_embeddings"
+EMBEDDING_DIM = 768
+
+# ANN index settings: "hnsw", "ivfflat" or "none" (sequential scan)
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw").lower()
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", "100"))
+
+# Precision of the ANN stage: "none" (float32), "halfvec" (float16, half the
+# index size) or "binary" (1 bit per dimension, 1/32). The table keeps the
+# float32 vectors: quantized indexes are expression indexes and candidates
+# are re-ranked with the exact cosine distance
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+# Candidates fetched from the quantized index per requested chunk
+QUANTIZATION_OVERFETCH = int(os.getenv("QUANTIZATION_OVERFETCH", "8"))
+
+# Default query-time settings, each request can override them
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "0")) or None
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", "0")) or None
+
+# Text search configuration of the lexical (full-text) leg of hybrid retrieval.
+# It is baked into the generated text_search column: changing it requires
+# dropping that column and running create-text-search again
+FTS_CONFIG = os.getenv("FTS_CONFIG", "spanish")
+
+# Indexed expression and operator class for each quantization mode
+QUANTIZED_EXPRESSIONS = {
+    "none": ("embedding", "vector_cosine_ops"),
+    "halfvec": (f"(embedding::halfvec({EMBEDDING_DIM}))", "halfvec_cosine_ops"),
+    "binary": (f"(binary_quantize(embedding)::bit({EMBEDDING_DIM}))", "bit_hamming_ops"),
+}
+
+
+def index_name(index_type: str, quantization: str = "none") -> str:
+    suffix = index_type if quantization == "none" else f"{quantization}_{index_type}"
+    return f"ix_{TABLE_NAME}_embedding_{suffix}"
+
+
+INDEX_NAMES = {
+    "hnsw": index_name("hnsw"),
+    "ivfflat": index_name("ivfflat"),
+}
+# Every ANN index this module may create, used to drop the unused ones
+MANAGED_INDEX_NAMES = [
+    index_name(index_type, quantization)
+    for quantization in QUANTIZED_EXPRESSIONS
+    for index_type in ("hnsw", "ivfflat")
+]
+
+
+def _index_ddl(index_type: str, name: str, lists: int = None, concurrently: bool = False,
+               quantization: str = "none", table: str = TABLE_NAME) -> str:
+    """Builds the CREATE INDEX statement for the requested index type and quantization"""
+    concurrently_sql = "CONCURRENTLY " if concurrently else ""
+    if index_type == "hnsw":
+        params = f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}"
+    elif index_type == "ivfflat":
+        params = f"lists = {int(lists or IVFFLAT_LISTS)}"
+    else:
+        raise ValueError(f"Unsupported vector index type: {index_type}")
+    if quantization not in QUANTIZED_EXPRESSIONS:
+        raise ValueError(f"Unsupported vector quantization: {quantization}")
+    expression, opclass = QUANTIZED_EXPRESSIONS[quantization]
+    return (
+        f"CREATE INDEX {concurrently_sql}IF NOT EXISTS {name} ON {table} "
+        f"USING {index_type} ({expression} {opclass}) WITH ({params})"
+    )
+
+
+def ann_distance_sql(quantization: str = None, param: str = ":embedding") -> str:
+    """
+    Distance expression matching the configured ANN index, so ORDER BY ... LIMIT
+    can use it. For quantized modes it only ranks candidates: the exact distance
+    is embedding <=> CAST(param AS vector)
+    """
+    quantization = quantization or VECTOR_QUANTIZATION
+    if quantization == "halfvec":
+        return f"(embedding::halfvec({EMBEDDING_DIM})) <=> CAST({param} AS halfvec({EMBEDDING_DIM}))"
+    if quantization == "binary":
+        return (
+            f"(binary_quantize(embedding)::bit({EMBEDDING_DIM})) "
+            f"<~> binary_quantize(CAST({param} AS vector({EMBEDDING_DIM})))"
+        )
+    return f"embedding <=> CAST({param} AS vector)"
+
+
+# Columns and secondary indexes added after the first release: create_all()
+# does not alter existing tables, so they are applied here idempotently
+SCHEMA_UPGRADES = [
+    f"ALTER TABLE {TABLE_NAME} ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    f"ALTER TABLE {TABLE_NAME} ADD COLUMN IF NOT EXISTS chunk_index INTEGER",
+    f"CREATE INDEX IF NOT EXISTS ix_{TABLE_NAME}_content_hash ON {TABLE_NAME} (content_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_semantic_answer_cache_doc_ids ON semantic_answer_cache USING gin (doc_ids)",
+    "CREATE INDEX IF NOT EXISTS ix_semantic_answer_cache_query_embedding "
+    "ON semantic_answer_cache USING hnsw (query_embedding vector_cosine_ops)",
+]
+
+
+# Full-text leg of hybrid retrieval. Not part of SCHEMA_UPGRADES: adding a
+# STORED generated column rewrites the whole table, so it is an explicit
+# maintenance step (create-text-search) and hybrid search falls back to the
+# vector leg until the column exists
+TEXT_SEARCH_INDEX = f"ix_{TABLE_NAME}_text_search"
+TEXT_SEARCH_COLUMN_DDL = (
+    f"ALTER TABLE {TABLE_NAME} ADD COLUMN IF NOT EXISTS text_search tsvector "
+    f"GENERATED ALWAYS AS (to_tsvector('{FTS_CONFIG}', coalesce(text, ''))) STORED"
+)
+
+
+def upgrade_schema(engine):
+    """Applies SCHEMA_UPGRADES to databases created by older versions"""
+    with engine.connect() as connection:
+        for statement in SCHEMA_UPGRADES:
+            connection.execute(text(statement))
+        connection.commit()
+
+
+def _index_state(connection, name: str):
+    """None if the index doesn't exist, else whether it is valid (a failed CONCURRENTLY build is not)"""
+    return connection.execute(
+        text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name}
+    ).scalar()
+
+
+def ensure_vector_index(engine, index_type: str = None, quantization: str = None):
+    """
+    Creates the configured ANN index if it doesn't exist and drops the other
+    managed indexes, so switching VECTOR_INDEX_TYPE / VECTOR_QUANTIZATION is clean.
+    Everything runs CONCURRENTLY: queries and ingestion keep running while the
+    index is built on a populated table
+    """
+    index_type = (index_type or VECTOR_INDEX_TYPE).lower()
+    quantization = (quantization or VECTOR_QUANTIZATION).lower()
+    name = index_name(index_type, quantization)
+    autocommit = engine.execution_options(isolation_level="AUTOCOMMIT")
+    with autocommit.connect() as connection:
+        if index_type != "none":
+            print(f"🛠️ Ensuring {index_type} index on {TABLE_NAME}.embedding (quantization: {quantization})...")
+            if _index_state(connection, name) is False:
+                # Leftover of an interrupted build, IF NOT EXISTS would keep it
+                connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            connection.execute(text(_index_ddl(index_type, name, concurrently=True, quantization=quantization)))
+        for other_name in MANAGED_INDEX_NAMES:
+            if other_name != name:
+                connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {other_name}"))
+    if index_type != "none":
+        print(f"✅ Vector index ready: {name}")
+
+
+def startup_vector_index(engine):
+    """
+    ANN index step of prepare_database: the index is only built here while
+    the table is empty. On a populated table the build takes minutes, so a
+    missing index is reported and left to the explicit create-index command
+    """
+    index_type = VECTOR_INDEX_TYPE
+    name = index_name(index_type, VECTOR_QUANTIZATION)
+    with engine.connect() as connection:
+        populated = connection.execute(text(f"SELECT EXISTS (SELECT 1 FROM {TABLE_NAME})")).scalar()
+        ready = index_type == "none" or _index_state(connection, name) is True
+    if ready:
+        return
+    if populated:
+        print(f"⚠️ ANN index {name} is missing, queries fall back to a sequential scan. "
+              f"Build it with: python -m backend.utils.db_schema create-index")
+        return
+    ensure_vector_index(engine)
+
+
+def has_text_search(connection) -> bool:
+    """True once create-text-search added the generated text_search column"""
+    return bool(connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = :table AND column_name = 'text_search')"
+    ), {"table": TABLE_NAME}).scalar())
+
+
+def ensure_text_search(engine):
+    """
+    Adds the text_search column and its GIN index (hybrid retrieval).
+    The column takes an ACCESS EXCLUSIVE lock while the table is rewritten,
+    run it in a maintenance window; the index is built CONCURRENTLY
+    """
+    autocommit = engine.execution_options(isolation_level="AUTOCOMMIT")
+    with autocommit.connect() as connection:
+        if not has_text_search(connection):
+            print(f"🛠️ Adding text_search to {TABLE_NAME} (rewrites the table)...")
+            start = time.perf_counter()
+            connection.execute(text(TEXT_SEARCH_COLUMN_DDL))
+            print(f"✅ text_search added in {time.perf_counter() - start:.1f}s")
+        if _index_state(connection, TEXT_SEARCH_INDEX) is False:
+            connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {TEXT_SEARCH_INDEX}"))
+        print(f"🛠️ Ensuring {TEXT_SEARCH_INDEX}...")
+        connection.execute(text(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {TEXT_SEARCH_INDEX} ON {TABLE_NAME} USING gin (text_search)"
+        ))
+    print(f"✅ Full-text search ready: {TEXT_SEARCH_INDEX}")
+
+
+def migrate_quantization(engine, quantization: str, index_type: str = None) -> str:
+    """
+    Moves existing rows to another ANN precision without blocking queries:
+    the new expression index is built concurrently from the stored float32
+    vectors, then the previous managed indexes are dropped concurrently.
+    Set VECTOR_QUANTIZATION to the same mode so queries use the new index
+    Returns:
+        Name of the new index
+    """
+    index_type = (index_type or VECTOR_INDEX_TYPE).lower()
+    quantization = quantization.lower()
+    name = index_name(index_type, quantization)
+    autocommit = engine.execution_options(isolation_level="AUTOCOMMIT")
+    with autocommit.connect() as connection:
+        lists = None
+        if index_type == "ivfflat":
+            row_count = connection.execute(text(f"SELECT count(*) FROM {TABLE_NAME}")).scalar()
+            lists = recommended_ivfflat_lists(row_count)
+        print(f"🔄 Building {name}...")
+        start = time.perf_counter()
+        connection.execute(text(_index_ddl(index_type, name, lists=lists, concurrently=True,
+                                           quantization=quantization)))
+        print(f"✅ {name} built in {time.perf_counter() - start:.1f}s")
+        for other_name in MANAGED_INDEX_NAMES:
+            if other_name != name:
+                connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {other_name}"))
+    return name
+
+
+def prepare_database(engine):
+    """Enables pgvector, creates tables and, on an empty table, the ANN index (startup hook)"""
+    print("🛠️ Enabling vector extension in database...")
+    with engine.connect() as connection:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
+        connection.commit()
+    print("✅ Vector extension enabled.")
+
+    print("🛠️ Creating tables in database...")
+    Base.metadata.create_all(bind=engine)
+    print("✅ Tables created successfully.")
+
+    upgrade_schema(engine)
+    startup_vector_index(engine)
+
+
+def apply_search_params(db, ef_search: int = None, probes: int = None):
+    """
+    Sets query-time ANN parameters for the current transaction only
+    Args:
+        db: SQLAlchemy session (the settings end with its transaction)
+        ef_search: HNSW candidate list size (higher = better recall, slower)
+        probes: IVFFlat lists to visit (higher = better recall, slower)
+    """
+    ef_search = ef_search or HNSW_EF_SEARCH
+    probes = probes or IVFFLAT_PROBES
+    # SET does not accept bind parameters, values are forced to int
+    if ef_search:
+        db.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+    if probes:
+        db.execute(text(f"SET LOCAL ivfflat.probes = {int(probes)}"))
+
+
+def recommended_ivfflat_lists(row_count: int) -> int:
+    """pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) above that"""
+    if row_count <= 1_000_000:
+        return max(1, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+
+def rebuild_ivfflat_index(engine, lists: int = None) -> int:
+    """
+    Re-clusters the IVFFlat index after large ingestions. The new index is
+    built concurrently and swapped in, so queries keep running meanwhile
+    Returns:
+        Number of lists used, or None when the configured index is not IVFFlat
+    """
+    if VECTOR_INDEX_TYPE != "ivfflat":
+        print(f"⚠️ VECTOR_INDEX_TYPE={VECTOR_INDEX_TYPE}, nothing to rebuild: only IVFFlat needs re-clustering. "
+              "Use create-index to build the configured index")
+        return None
+    name = index_name("ivfflat", VECTOR_QUANTIZATION)
+    tmp_name = f"{name}_rebuild"
+    old_name = f"{name}_old"
+    autocommit = engine.execution_options(isolation_level="AUTOCOMMIT")
+    with autocommit.connect() as connection:
+        if lists is None:
+            row_count = connection.execute(text(f"SELECT count(*) FROM {TABLE_NAME}")).scalar()
+            lists = recommended_ivfflat_lists(row_count)
+        print(f"🔄 Rebuilding {name} with lists={lists}...")
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {tmp_name}"))
+        connection.execute(text(_index_ddl("ivfflat", tmp_name, lists=lists, concurrently=True,
+                                           quantization=VECTOR_QUANTIZATION)))
+        # The old index is renamed out of the way before the new one takes its
+        # name and dropped last, so there is always a valid ANN index
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {old_name}"))
+        connection.execute(text(f"ALTER INDEX IF EXISTS {name} RENAME TO {old_name}"))
+        connection.execute(text(f"ALTER INDEX {tmp_name} RENAME TO {name}"))
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {old_name}"))
+    print(f"✅ IVFFlat index rebuilt with lists={lists}")
+    return lists
+
+
+def index_status(engine) -> list:
+    """Lists the ANN indexes on document_embeddings with their size"""
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT indexname, indexdef, pg_size_pretty(pg_relation_size(indexname::regclass)) AS size "
+            "FROM pg_indexes WHERE tablename = :table AND indexdef ILIKE '%embedding%'"
+        ), {"table": TABLE_NAME}).all()
+    return [dict(row._mapping) for row in rows]
+
+
+if __name__ == "__main__":
+    from backend.utils.db_connection import engine
+
+    parser = argparse.ArgumentParser(description="Vector index maintenance for document_embeddings")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    create_parser = subparsers.add_parser("create-index", help="Create the configured ANN index")
+    create_parser.add_argument("--type", choices=["hnsw", "ivfflat", "none"], default=None)
+    create_parser.add_argument("--quantization", choices=list(QUANTIZED_EXPRESSIONS), default=None)
+    subparsers.add_parser("create-text-search", help="Add the full-text column and GIN index (hybrid retrieval)")
+    rebuild_parser = subparsers.add_parser("rebuild-ivfflat", help="Re-cluster the IVFFlat index (VECTOR_INDEX_TYPE=ivfflat)")
+    rebuild_parser.add_argument("--lists", type=int, default=None)
+    quantize_parser = subparsers.add_parser("quantize", help="Move the ANN index to another precision")
+    quantize_parser.add_argument("--mode", choices=list(QUANTIZED_EXPRESSIONS), required=True)
+    quantize_parser.add_argument("--type", choices=["hnsw", "ivfflat"], default=None)
+    subparsers.add_parser("status", help="Show ANN indexes and their size")
+    args = parser.parse_args()
+
+    if args.command == "create-index":
+        ensure_vector_index(engine, args.type, args.quantization)
+    elif args.command == "create-text-search":
+        ensure_text_search(engine)
+    elif args.command == "rebuild-ivfflat":
+        rebuild_ivfflat_index(engine, args.lists)
+    elif args.command == "quantize":
+        migrate_quantization(engine, args.mode, args.type)
+    elif args.command == "status":
+        for index in index_status(engine):
+            print(f"{index['indexname']} ({index['size']}): {index['indexdef']}")
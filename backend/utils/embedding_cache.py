@@ -0,0 +1,116 @@
+"""
+Content-hash embedding cache persisted in Postgres (embedding_cache table)
+
+Chunks are keyed by sha256(model name + normalized text), so re-ingesting an
+unchanged or lightly edited document only embeds the chunks that are new.
+"""
+import hashlib
+import os
+import re
+import sys
+import threading
+import unicodedata
+sys.path.append("..")
+
+from dotenv import load_dotenv
+from sqlalchemy.dialects.postgresql import insert
+
+from backend.models.db import EmbeddingCache
+from backend.utils.db_connection import SessionLocal
+from backend.utils.embedding_service import embed_texts
+from backend.utils.embeddings import EMBED_MODEL_NAME
+
+load_dotenv(override=True)
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") == "1"
+
+_stats_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+
+def normalize_chunk_text(text: str) -> str:
+    """Unicode NFC + collapsed whitespace, so formatting-only edits still hit"""
+    text = unicodedata.normalize("NFC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def content_hash(text: str, model_name: str = EMBED_MODEL_NAME) -> str:
+    normalized = normalize_chunk_text(text)
+    return hashlib.sha256(f"{model_name}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+def lookup_embeddings(hashes: list) -> dict:
+    """Bulk lookup: one query for all hashes, returns {hash: embedding}"""
+    if not hashes:
+        return {}
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(EmbeddingCache.content_hash, EmbeddingCache.embedding)
+            .filter(EmbeddingCache.content_hash.in_(list(set(hashes))))
+            .all()
+        )
+        return {row.content_hash: [float(x) for x in row.embedding] for row in rows}
+    finally:
+        db.close()
+
+
+def store_embeddings(embeddings_by_hash: dict, model_name: str = EMBED_MODEL_NAME):
+    """Inserts new cache entries, ignoring hashes stored concurrently by another worker"""
+    if not embeddings_by_hash:
+        return
+    db = SessionLocal()
+    try:
+        statement = insert(EmbeddingCache).values([
+            {"content_hash": h, "model_name": model_name, "embedding": embedding}
+            for h, embedding in embeddings_by_hash.items()
+        ]).on_conflict_do_nothing(index_elements=["content_hash"])
+        db.execute(statement)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error storing embedding cache entries: {e}")
+    finally:
+        db.close()
+
+
+def embed_texts_cached(texts: list) -> list:
+    """
+    Returns one embedding per text, embedding only cache misses
+    Args:
+        texts: Chunk texts in order
+    Returns:
+        List of embeddings aligned with texts
+    """
+    if not EMBEDDING_CACHE_ENABLED:
+        return embed_texts(texts)
+
+    hashes = [content_hash(t) for t in texts]
+    cached = lookup_embeddings(hashes)
+
+    # Embed each distinct missing text once
+    missing = {}
+    for h, t in zip(hashes, texts):
+        if h not in cached and h not in missing:
+            missing[h] = t
+    if missing:
+        new_embeddings = embed_texts(list(missing.values()))
+        computed = dict(zip(missing.keys(), new_embeddings))
+        store_embeddings(computed)
+        cached.update(computed)
+
+    hits = len(texts) - len(missing)
+    with _stats_lock:
+        _cache_stats["hits"] += hits
+        _cache_stats["misses"] += len(missing)
+    print(f"📊 Embedding cache: {hits} hits, {len(missing)} misses")
+
+    return [cached[h] for h in hashes]
+
+
+def get_embedding_cache_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_cache_stats)
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / total, 4) if total else 0.0
+    return stats
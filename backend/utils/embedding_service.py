@@ -0,0 +1,155 @@
+"""
+Micro-batching embedding service shared by retrieval and ingestion
+
+Callers block on embed_queries / embed_texts while a background thread
+collects pending texts for up to EMBED_BATCH_MAX_WAIT_MS (or until
+EMBED_BATCH_MAX_SIZE texts are waiting) and embeds them in one forward pass.
+Queries are served before ingestion chunks queued at the same time. One
+service per process: it is (re)created lazily after a fork, so Celery
+prefork children get their own thread.
+"""
+import itertools
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+sys.path.append("..")
+
+import numpy as np
+from dotenv import load_dotenv
+
+from backend.utils.embeddings import encode_batch
+
+load_dotenv(override=True)
+
+EMBED_BATCHING_ENABLED = os.getenv("EMBED_BATCHING_ENABLED", "1") == "1"
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+# Queue wait samples kept for the latency percentiles
+STATS_WINDOW = 2000
+
+PRIORITIES = {"query": 0, "text": 1}
+
+
+class EmbeddingBatcher:
+    """Collects concurrent embedding requests and runs them as batches"""
+
+    def __init__(self, encode=encode_batch, max_batch_size: int = EMBED_BATCH_MAX_SIZE,
+                 max_wait_ms: float = EMBED_BATCH_MAX_WAIT_MS):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.pid = os.getpid()
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._stats_lock = threading.Lock()
+        self._stats = {"batches": 0, "embeddings": 0, "encode_seconds": 0.0, "errors": 0}
+        self._queue_waits = deque(maxlen=STATS_WINDOW)
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: list, kind: str = "text") -> list:
+        """Queues the texts and returns one Future per text"""
+        futures = []
+        enqueued_at = time.perf_counter()
+        for text in texts:
+            future = Future()
+            self._queue.put((PRIORITIES[kind], next(self._sequence), kind, text, future, enqueued_at))
+            futures.append(future)
+        return futures
+
+    def embed(self, texts: list, kind: str = "text") -> list:
+        """Blocking embedding of texts through the shared batches"""
+        return [future.result() for future in self.submit(texts, kind)]
+
+    def _collect(self) -> list:
+        """Waits for the first request, then gathers more until the batch is full or max_wait passes"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            # A model call per kind: queries and chunks may use different prompts
+            for kind in sorted({item[2] for item in batch}, key=PRIORITIES.get):
+                items = [item for item in batch if item[2] == kind]
+                try:
+                    embeddings = self.encode([item[3] for item in items], kind)
+                    for item, embedding in zip(items, embeddings):
+                        item[4].set_result(list(embedding))
+                except Exception as e:
+                    print(f"❌ Embedding batch error: {e}")
+                    for item in items:
+                        item[4].set_exception(e)
+                    with self._stats_lock:
+                        self._stats["errors"] += 1
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                self._stats["batches"] += 1
+                self._stats["embeddings"] += len(batch)
+                self._stats["encode_seconds"] += elapsed
+                self._queue_waits.extend((started - item[5]) * 1000 for item in batch)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+            waits = np.array(self._queue_waits) if self._queue_waits else None
+        stats["avg_batch_size"] = round(stats["embeddings"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["embeddings_per_sec"] = (
+            round(stats["embeddings"] / stats["encode_seconds"], 1) if stats["encode_seconds"] else 0.0
+        )
+        stats["queue_wait_ms"] = {
+            "p50": round(float(np.percentile(waits, 50)), 3),
+            "p95": round(float(np.percentile(waits, 95)), 3),
+            "mean": round(float(waits.mean()), 3),
+        } if waits is not None else None
+        stats.update(pending=self._queue.qsize(), max_batch_size=self.max_batch_size,
+                     max_wait_ms=self.max_wait * 1000, pid=self.pid)
+        stats["encode_seconds"] = round(stats["encode_seconds"], 3)
+        return stats
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    global _batcher
+    # The worker thread does not survive fork(): children build their own
+    if _batcher is None or _batcher.pid != os.getpid():
+        with _batcher_lock:
+            if _batcher is None or _batcher.pid != os.getpid():
+                _batcher = EmbeddingBatcher()
+    return _batcher
+
+
+def embed_queries(queries: list) -> list:
+    if not EMBED_BATCHING_ENABLED:
+        return encode_batch(queries, "query")
+    return get_embedding_batcher().embed(queries, "query")
+
+
+def embed_texts(texts: list) -> list:
+    if not EMBED_BATCHING_ENABLED:
+        return encode_batch(texts, "text")
+    return get_embedding_batcher().embed(texts, "text")
+
+
+def get_embedding_service_stats() -> dict:
+    if not EMBED_BATCHING_ENABLED or _batcher is None or _batcher.pid != os.getpid():
+        return {"enabled": EMBED_BATCHING_ENABLED, "batches": 0}
+    return dict(get_embedding_batcher().stats(), enabled=True)
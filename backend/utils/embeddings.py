@@ -0,0 +1,112 @@
+import inspect
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+# "torch" (HuggingFaceEmbedding), "onnx" or "onnx-int8" (ONNX Runtime, see onnx_embedder)
+# or "hashing" (deterministic offline embedder for benchmarks, see hashing_embedder)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch").lower()
+# Also part of the embedding cache keys: hashing vectors must never be served as e5 ones
+EMBED_MODEL_NAME = (
+    "hashing-768" if EMBED_BACKEND == "hashing" else os.getenv("EMBED_MODEL_NAME", "intfloat/e5-base-v2")
+)
+# CPU threads per forward pass, 0 keeps the library default
+EMBED_INTRA_OP_THREADS = int(os.getenv("EMBED_INTRA_OP_THREADS", "0"))
+
+# Process-wide embedding model shared by ingestion and retrieval
+_embed_model = None
+_embed_model_lock = threading.Lock()
+_embed_model_stats = {
+    "model_name": EMBED_MODEL_NAME,
+    "backend": EMBED_BACKEND,
+    "loads": 0,
+    "load_seconds": 0.0,
+    "last_load_at": None,
+    "pid": None,
+}
+
+
+def _load_embed_model(backend: str = None):
+    """Builds the embedding model of the configured backend"""
+    backend = backend or EMBED_BACKEND
+    if backend == "hashing":
+        from backend.utils.hashing_embedder import HashingEmbedding
+
+        return HashingEmbedding()
+    if backend in ("onnx", "onnx-int8"):
+        from backend.utils.onnx_embedder import OnnxEmbedding
+
+        return OnnxEmbedding(EMBED_MODEL_NAME, quantized=backend == "onnx-int8",
+                             intra_op_threads=EMBED_INTRA_OP_THREADS)
+    if backend != "torch":
+        raise ValueError(f"Unknown EMBED_BACKEND: {backend}")
+
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    if EMBED_INTRA_OP_THREADS > 0:
+        import torch
+        torch.set_num_threads(EMBED_INTRA_OP_THREADS)
+    return HuggingFaceEmbedding(model_name=EMBED_MODEL_NAME)
+
+
+def get_embed_model():
+    """Lazy load the embedding model once per process and reuse it afterwards"""
+    global _embed_model
+    if _embed_model is None:
+        with _embed_model_lock:
+            if _embed_model is None:
+                try:
+                    print(f"🔄 Loading embedding model {EMBED_MODEL_NAME} ({EMBED_BACKEND})...")
+                    start = time.perf_counter()
+                    model = _load_embed_model()
+                    elapsed = time.perf_counter() - start
+
+                    _embed_model_stats["loads"] += 1
+                    _embed_model_stats["load_seconds"] += elapsed
+                    _embed_model_stats["last_load_at"] = time.time()
+                    _embed_model_stats["pid"] = os.getpid()
+                    _embed_model = model
+                    print(f"✅ Embedding model loaded in {elapsed:.2f}s (pid {os.getpid()})")
+                except Exception as e:
+                    print(f"❌ Error loading embedding model: {e}")
+                    raise e
+    return _embed_model
+
+
+def get_embed_model_stats() -> dict:
+    """Model load count and cumulative load time for this process"""
+    return dict(_embed_model_stats)
+
+
+def _supports_query_batch(model) -> bool:
+    """True if model._embed takes the prompt_name of the pinned HuggingFaceEmbedding"""
+    embed = getattr(model, "_embed", None)
+    if embed is None:
+        return False
+    try:
+        return "prompt_name" in inspect.signature(embed).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def encode_batch(texts: list, kind: str = "text") -> list:
+    """
+    One forward pass for a list of texts
+    Args:
+        texts: Texts to embed
+        kind: "text" (chunks) or "query" (questions, the model may add a query prompt)
+    """
+    model = get_embed_model()
+    if kind == "query":
+        # HuggingFaceEmbedding has no public batch call for queries: _embed with the
+        # "query" prompt is what get_query_embedding runs for a single query. It is a
+        # private method, llama-index-embeddings-huggingface is pinned in requirements.txt
+        # (0.3 to 0.8 share the signature) and the ONNX / hashing embedders mirror it
+        if _supports_query_batch(model):
+            return model._embed(list(texts), prompt_name="query")
+        return [model.get_query_embedding(text) for text in texts]
+    return model.get_text_embedding_batch(list(texts))
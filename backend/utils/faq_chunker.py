@@ -0,0 +1,160 @@
+"""
+Structure-aware chunking for FAQ documents: one chunk per question/answer pair
+
+Detects numbered or "¿...?" question lines and the "--- Página N ---" markers
+added by app.extract_text_from_pdf (a Q/A split across two pages is joined
+back). Each Q/A stays one chunk while it fits FAQ_CHUNK_MAX_TOKENS; longer
+answers are packed by sentence into several chunks that all repeat the
+question. Documents without enough questions fall back to the sentence
+splitter ("auto" mode).
+"""
+import math
+import os
+import re
+from collections import namedtuple
+
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+# "sentence" (fixed SentenceSplitter), "faq" (always Q/A units) or "auto".
+# Defaults to the splitter so existing ingestion keeps its chunk boundaries
+CHUNKING_MODE = os.getenv("CHUNKING_MODE", "sentence").lower()
+# e5-base-v2 truncates its input at 512 tokens
+FAQ_CHUNK_MAX_TOKENS = int(os.getenv("FAQ_CHUNK_MAX_TOKENS", "384"))
+# Minimum questions for "auto" to treat a document as an FAQ
+FAQ_MIN_QUESTIONS = int(os.getenv("FAQ_MIN_QUESTIONS", "3"))
+# Rough characters per token of the e5 wordpiece tokenizer on Spanish text
+CHARS_PER_TOKEN = 3.0
+
+PAGE_MARKER_RE = re.compile(r"^\s*--- Página (\d+) ---\s*$")
+# "12. ¿...?", "12. **Pregunta 12**: ¿...?", "¿...?" or "12. ... ?"
+QUESTION_RE = re.compile(
+    r"^\s*(?:(?:\d{1,4}[.)]\s*)?(?:\*\*[^*\n]{1,40}\*\*:?\s*)?¿|\d{1,4}[.)]\s+[^\n]{3,}\?\s*$)"
+)
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+FaqUnit = namedtuple("FaqUnit", ["question", "answer", "page"])
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def is_question_line(line: str) -> bool:
+    return bool(QUESTION_RE.match(line))
+
+
+def _join_lines(lines: list) -> str:
+    """PDF extraction wraps lines mid-sentence: rejoin them with spaces"""
+    return re.sub(r"\s+", " ", " ".join(lines)).strip()
+
+
+def split_faq_units(text: str) -> list:
+    """
+    Splits a document into question/answer units in document order
+    Returns:
+        List of FaqUnit; text before the first question is a unit with an empty question
+    """
+    units = []
+    page = 1
+    question, question_page, answer_lines, preamble = None, 1, [], []
+
+    def flush():
+        if question is not None:
+            units.append(FaqUnit(question, _join_lines(answer_lines), question_page))
+
+    for line in (text or "").splitlines():
+        marker = PAGE_MARKER_RE.match(line)
+        if marker:
+            page = int(marker.group(1))
+            continue
+        if is_question_line(line):
+            flush()
+            question, question_page, answer_lines = line.strip(), page, []
+        elif question is None:
+            preamble.append(line)
+        else:
+            answer_lines.append(line)
+    flush()
+
+    preamble_text = _join_lines(preamble)
+    if preamble_text:
+        units.insert(0, FaqUnit("", preamble_text, 1))
+    return units
+
+
+def pack_sentences(text: str, max_tokens: int, prefix: str = "") -> list:
+    """Packs whole sentences into pieces of at most max_tokens (prefix included)"""
+    budget = max(max_tokens - estimate_tokens(prefix), 1)
+    pieces, current = [], ""
+    for sentence in SENTENCE_END_RE.split(text):
+        # A single sentence over budget is cut by characters
+        while estimate_tokens(sentence) > budget:
+            cut = int(budget * CHARS_PER_TOKEN)
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:]
+        candidate = f"{current} {sentence}".strip()
+        if current and estimate_tokens(candidate) > budget:
+            pieces.append(current)
+            candidate = sentence
+        current = candidate
+    if current:
+        pieces.append(current)
+    return [f"{prefix}{piece}" for piece in pieces]
+
+
+def unit_chunks(unit: FaqUnit, max_tokens: int) -> list:
+    """One chunk per unit, or several (each starting with the question) if it is too long"""
+    prefix = f"{unit.question}\n" if unit.question else ""
+    chunk = f"{prefix}{unit.answer}".strip()
+    if estimate_tokens(chunk) <= max_tokens:
+        return [chunk] if chunk else []
+    return pack_sentences(unit.answer, max_tokens, prefix)
+
+
+def chunk_faq_text(text: str, max_tokens: int = None, mode: str = None):
+    """
+    Chunks an FAQ document by question/answer
+    Args:
+        text: Document text (with or without page markers)
+        max_tokens: Token budget per chunk (defaults to FAQ_CHUNK_MAX_TOKENS)
+        mode: "faq" or "auto" (defaults to CHUNKING_MODE)
+    Returns:
+        List of chunk texts, or None when "auto" decides the text is not an FAQ
+    """
+    max_tokens = max_tokens or FAQ_CHUNK_MAX_TOKENS
+    mode = mode or CHUNKING_MODE
+    units = split_faq_units(text)
+    questions = sum(1 for unit in units if unit.question)
+    if mode == "auto" and questions < FAQ_MIN_QUESTIONS:
+        return None
+    chunks = [chunk for unit in units for chunk in unit_chunks(unit, max_tokens)]
+    # A short title/preamble goes with the first Q/A instead of being its own chunk
+    if len(chunks) > 1 and units[0].question == "" and estimate_tokens(f"{chunks[0]}\n{chunks[1]}") <= max_tokens:
+        chunks[:2] = [f"{chunks[0]}\n{chunks[1]}"]
+    return chunks
+
+
+def resolve_chunking_mode(text: str, mode: str = None) -> str:
+    """
+    Resolves "auto" to "faq" or "sentence" for a whole document, from its
+    text or its first streamed block
+    """
+    mode = mode or CHUNKING_MODE
+    if mode != "auto":
+        return mode
+    questions = sum(1 for unit in split_faq_units(text) if unit.question)
+    return "faq" if questions >= FAQ_MIN_QUESTIONS else "sentence"
+
+
+def last_question_start(text: str, limit: int) -> int:
+    """Offset of the last question line starting before limit, or -1 (streaming block cuts)"""
+    position = -1
+    for match in re.finditer(r"^.*$", text[:limit], re.MULTILINE):
+        if match.start() > 0 and is_question_line(match.group(0)):
+            position = match.start()
+    return position
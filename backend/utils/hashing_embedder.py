@@ -0,0 +1,72 @@
+"""
+Deterministic feature-hashing embedder (EMBED_BACKEND=hashing)
+
+Offline stand-in for e5-base-v2 in benchmarks and CI: no model download, the
+same text always gives the same vector in any process. Words and character
+trigrams are hashed (blake2b, not the salted built-in hash) into 768 signed
+buckets and the vector is L2-normalized, so cosine similarity rewards shared
+vocabulary. Retrieval quality is lexical only; use it to compare retrievers
+and measure latency, not to judge the real model.
+"""
+import hashlib
+import re
+from typing import Any, List
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field
+
+HASHING_DIM = 768
+WORD_RE = re.compile(r"\w+")
+# Character trigrams count less than whole words
+TRIGRAM_WEIGHT = 0.5
+
+
+def _bucket(feature: str, dim: int) -> tuple:
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dim, 1.0 if (value >> 63) & 1 else -1.0
+
+
+def hashing_vector(text: str, dim: int = HASHING_DIM) -> list:
+    """Hashed bag of words + character trigrams, L2-normalized"""
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in WORD_RE.findall((text or "").lower()):
+        index, sign = _bucket(f"w:{word}", dim)
+        vector[index] += sign
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            index, sign = _bucket(f"t:{padded[i:i + 3]}", dim)
+            vector[index] += sign * TRIGRAM_WEIGHT
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector.tolist()
+
+
+class HashingEmbedding(BaseEmbedding):
+    """BaseEmbedding wrapper of hashing_vector"""
+
+    dim: int = Field(default=HASHING_DIM, description="Vector dimensions.")
+
+    def __init__(self, dim: int = HASHING_DIM, **kwargs: Any):
+        super().__init__(model_name=f"hashing-{dim}", dim=dim, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashingEmbedding"
+
+    def _embed(self, texts: List[str], prompt_name: str = None) -> List[List[float]]:
+        return [hashing_vector(text, self.dim) for text in texts]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return hashing_vector(query, self.dim)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return hashing_vector(text, self.dim)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
@@ -0,0 +1,154 @@
+"""
+Hybrid lexical + vector retrieval over document_embeddings
+
+One SQL round trip: the vector leg (ORDER BY embedding <=> :q) and the
+full-text leg (text_search @@ tsquery, ranked with ts_rank_cd) each return
+their top candidates, and both rankings are fused with reciprocal-rank
+fusion: score = sum(1 / (HYBRID_RRF_K + rank)).
+
+The text_search column is added by the explicit create-text-search step of
+db_schema; until it exists, text_search_available() is False and callers
+fall back to vector-only retrieval.
+"""
+import os
+import re
+import sys
+import threading
+import time
+sys.path.append("..")
+
+from dotenv import load_dotenv
+from sqlalchemy.sql import text
+
+from backend.utils.bulk_writer import vector_to_text
+from backend.utils.db_connection import SessionLocal, engine
+from backend.utils.db_schema import (
+    FTS_CONFIG,
+    HNSW_EF_SEARCH,
+    TABLE_NAME,
+    ann_distance_sql,
+    apply_search_params,
+    has_text_search,
+)
+
+load_dotenv(override=True)
+
+# Candidates taken from each leg before fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+# RRF constant, 60 is the value from the original paper
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+MAX_QUERY_TERMS = 32
+# A missing text_search column is looked up again after this many seconds
+TEXT_SEARCH_RECHECK_SECONDS = 60
+
+_text_search = {"available": False, "checked_at": None}
+_text_search_lock = threading.Lock()
+
+# {ann_distance} is the expression of the configured (possibly quantized) ANN
+# index, the final select always reports the exact cosine distance
+HYBRID_SQL = """
+WITH vector_hits AS (
+    SELECT id, row_number() OVER (ORDER BY distance) AS rank
+    FROM (
+        SELECT id, {ann_distance} AS distance
+        FROM {table}
+        ORDER BY distance
+        LIMIT :candidates
+    ) nearest
+),
+lexical_hits AS (
+    SELECT id, row_number() OVER (ORDER BY lexical_score DESC, id) AS rank
+    FROM (
+        SELECT id, ts_rank_cd(text_search, query) AS lexical_score
+        FROM {table}, to_tsquery(CAST(:fts_config AS regconfig), :tsquery) AS query
+        WHERE text_search @@ query
+        ORDER BY lexical_score DESC
+        LIMIT :candidates
+    ) matches
+),
+fused AS (
+    SELECT coalesce(v.id, l.id) AS id,
+           coalesce(1.0 / (:rrf_k + v.rank), 0) + coalesce(1.0 / (:rrf_k + l.rank), 0) AS rrf_score,
+           v.rank AS vector_rank,
+           l.rank AS lexical_rank
+    FROM vector_hits v
+    FULL OUTER JOIN lexical_hits l ON v.id = l.id
+)
+SELECT d.id, d.doc_id, d.chunk_id, d.chunk_index, d.text,
+       d.embedding <=> CAST(:embedding AS vector) AS distance,
+       f.rrf_score, f.vector_rank, f.lexical_rank
+FROM fused f
+JOIN {table} d ON d.id = f.id
+ORDER BY f.rrf_score DESC, d.id
+LIMIT :top_k
+"""
+
+
+def text_search_available() -> bool:
+    """
+    True once the text_search column exists. A positive answer is kept for the
+    process lifetime, a negative one is re-checked every TEXT_SEARCH_RECHECK_SECONDS
+    """
+    if _text_search["available"]:
+        return True
+    with _text_search_lock:
+        checked_at = _text_search["checked_at"]
+        if checked_at is None or time.monotonic() - checked_at >= TEXT_SEARCH_RECHECK_SECONDS:
+            try:
+                with engine.connect() as connection:
+                    _text_search["available"] = has_text_search(connection)
+            except Exception as e:
+                print(f"❌ Error checking text_search: {e}")
+            _text_search["checked_at"] = time.monotonic()
+            if not _text_search["available"]:
+                print("⚠️ text_search column missing, hybrid retrieval uses the vector leg only. "
+                      "Add it with: python -m backend.utils.db_schema create-text-search")
+    return _text_search["available"]
+
+
+def build_tsquery(query: str) -> str:
+    """
+    Turns a free-text question into an OR tsquery ("a | b | c")
+    Only word characters are kept, so the result is always valid to_tsquery
+    input; stop words are dropped by Postgres itself. An AND query
+    (websearch_to_tsquery) would almost never match a full question.
+    """
+    terms = []
+    for term in re.findall(r"\w+", (query or "").lower()):
+        if term not in terms:
+            terms.append(term)
+    return " | ".join(terms[:MAX_QUERY_TERMS])
+
+
+def search_hybrid_rows(query: str, query_embedding, top_k: int = 5, candidates: int = None,
+                       ef_search: int = None, probes: int = None) -> list:
+    """
+    Runs the fused lexical + vector query
+    Args:
+        query: User question (lexical leg)
+        query_embedding: Query vector (vector leg)
+        top_k: Number of chunks to return
+        candidates: Candidates per leg (defaults to HYBRID_CANDIDATES)
+        ef_search: HNSW ef_search override (raised to candidates if lower)
+        probes: IVFFlat probes override
+    Returns:
+        Rows with id, doc_id, chunk_id, text, distance, rrf_score, vector_rank, lexical_rank
+    """
+    candidates = max(candidates or HYBRID_CANDIDATES, top_k)
+    # HNSW returns at most ef_search rows, so the vector leg would be truncated otherwise
+    ef_search = max(ef_search or HNSW_EF_SEARCH or 40, candidates)
+
+    db = SessionLocal()
+    try:
+        apply_search_params(db, ef_search=ef_search, probes=probes)
+        sql = HYBRID_SQL.format(table=TABLE_NAME, ann_distance=ann_distance_sql())
+        return db.execute(text(sql), {
+            "embedding": vector_to_text(query_embedding),
+            "fts_config": FTS_CONFIG,
+            "tsquery": build_tsquery(query),
+            "candidates": candidates,
+            "rrf_k": HYBRID_RRF_K,
+            "top_k": top_k,
+        }).all()
+    finally:
+        db.close()
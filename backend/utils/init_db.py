@@ -1,26 +1,18 @@
 from sqlalchemy import create_engine
-from sqlalchemy.sql import text
 try:
     from backend.config import DB_URL_LOCAL
 except ModuleNotFoundError:
     from config import DB_URL_LOCAL  # type: ignore
 try:
     from backend.models.db import Base, DocumentEmbedding
+    from backend.utils.db_schema import prepare_database
 except ModuleNotFoundError:
     from models.db import Base, DocumentEmbedding  # type: ignore
+    from utils.db_schema import prepare_database  # type: ignore
 
-# Enable the pgvector extension
-print("🛠️ Enabling vector extension in database...")
+# Enable pgvector, create tables and the configured ANN index
 engine = create_engine(DB_URL_LOCAL)
-with engine.connect() as connection:
-    connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
-    connection.commit()
-print("✅ Vector extension enabled.")
-
-# Create tables in database if they don't exist
-print("🛠️ Creating tables in database...")
-Base.metadata.create_all(engine)
-print("✅ Tables created successfully.")
+prepare_database(engine)
 
 if __name__ == "__main__": 
     print("[+] Creating tables...") 
@@ -1,12 +1,63 @@
+import os
 import sys
 sys.path.append("..")
 from llama_index.core import Document
 from llama_index.core.node_parser import SentenceSplitter
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from llama_index.core.schema import TextNode
 from .db_actions import  create_index_from_pg, save_chunks_to_db
 from .db_connection import SessionLocal
+from .embedding_cache import embed_texts_cached
+from .faq_chunker import CHUNKING_MODE, chunk_faq_text
+from .vector_search import retrieve_chunks_hybrid, retrieve_chunks_mmap, retrieve_chunks_pgvector
+from .versioned_ingestion import ingest_document_version
 import uuid
 
+# "pgvector" runs one ANN query per question, "hybrid" fuses it with a
+# full-text query (exact product codes, plan names, error strings), "mmap"
+# scans a memory-mapped export of the table in-process (read replicas) and
+# "index" keeps the legacy in-memory VectorStoreIndex rebuild so the paths
+# can be compared
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "pgvector")
+
+
+def split_text_into_nodes(text: str, mode: str = None):
+    """
+    Splits a document into chunk nodes (without embeddings)
+    Args:
+        text: Document text
+        mode: "sentence", "faq" or "auto" (defaults to CHUNKING_MODE): FAQ
+            documents get one node per question/answer pair
+    """
+    mode = mode or CHUNKING_MODE
+    if mode != "sentence":
+        chunks = chunk_faq_text(text, mode=mode)
+        if chunks is not None:
+            return [TextNode(text=chunk) for chunk in chunks]
+
+    doc = Document(text=text)
+    
+    # Use RecursiveCharacterTextSplitter with minimal overlap to optimize database
+    chunker = SentenceSplitter(
+        chunk_size=120,  # Optimal size for database
+        chunk_overlap=5,  # Minimal overlap to maintain context
+    )
+    
+    return chunker.get_nodes_from_documents([doc])
+
+
+def update_document_version(text: str, doc_id: str):
+    """
+    Re-ingests a new version of an existing document: only new chunks are
+    embedded and inserted, removed chunks are deleted (single transaction)
+    Args:
+        text: Full text of the new version
+        doc_id: Stable document key
+    Returns:
+        Stats dict (version, inserted, deleted, unchanged)
+    """
+    nodes = split_text_into_nodes(text)
+    return ingest_document_version(nodes, doc_id)
+
 
 def chunk_faq_recursive(text: str, doc_id: str = None):
     """
@@ -20,19 +71,10 @@ def chunk_faq_recursive(text: str, doc_id: str = None):
     if doc_id is None:
         doc_id = str(uuid.uuid4())
     
-    doc = Document(text=text)
+    nodes = split_text_into_nodes(text)
     
-    # Use RecursiveCharacterTextSplitter with minimal overlap to optimize database
-    chunker = SentenceSplitter(
-        chunk_size=120,  # Optimal size for database
-        chunk_overlap=5,  # Minimal overlap to maintain context
-    )
-    
-    nodes = chunker.get_nodes_from_documents([doc])
-    
-    # Embeddings with e5-base-v2 model for semantic similarity
-    embed_model = HuggingFaceEmbedding(model_name="intfloat/e5-base-v2")
-    embeddings = embed_model.get_text_embedding_batch([n.text for n in nodes])
+    # Embeddings with the shared e5-base-v2 model, unchanged chunks come from the cache
+    embeddings = embed_texts_cached([n.text for n in nodes])
     
     # Assign embeddings to each node
     for node, embedding in zip(nodes, embeddings):
@@ -46,11 +88,34 @@ def chunk_faq_recursive(text: str, doc_id: str = None):
     return doc_id
 
 
-def retrieve_chunks(query: str, top_k: int = 5):
+def retrieve_chunks_from_index(query: str, top_k: int = 5):
+    """Legacy path: rebuilds a VectorStoreIndex with every stored chunk"""
     index = create_index_from_pg()
     retriever = index.as_retriever(similarity_top_k=top_k)
+    return retriever.retrieve(query)
+
 
-    results = retriever.retrieve(query)
+def retrieve_chunks(query: str, top_k: int = 5, mode: str = None, ef_search: int = None, probes: int = None):
+    """
+    Retrieves the top_k chunks most similar to the query
+    Args:
+        query: User question
+        top_k: Number of chunks to return
+        mode: "pgvector", "hybrid", "mmap" or "index" (defaults to RETRIEVAL_MODE)
+        ef_search: HNSW ef_search override for this request
+        probes: IVFFlat probes override for this request
+    Returns:
+        List of NodeWithScore
+    """
+    mode = mode or RETRIEVAL_MODE
+    if mode == "index":
+        results = retrieve_chunks_from_index(query, top_k)
+    elif mode == "hybrid":
+        results = retrieve_chunks_hybrid(query, top_k, ef_search=ef_search, probes=probes)
+    elif mode == "mmap":
+        results = retrieve_chunks_mmap(query, top_k)
+    else:
+        results = retrieve_chunks_pgvector(query, top_k, ef_search=ef_search, probes=probes)
 
     for i, res in enumerate(results):
         print(f"{i+1}. Score: {res.score:.3f} - Texto: {res.text[:100]}...")
@@ -58,18 +123,27 @@ def retrieve_chunks(query: str, top_k: int = 5):
     return results
 
 
-def process_and_store_faqs(faq_text: str, doc_id: str = None):
+def process_and_store_faqs(faq_text: str, doc_id: str = None, versioned: bool = False):
     """
     Main function to process FAQs and store them in the database
     Args:
         faq_text: FAQ text
         doc_id: Document ID (optional)
+        versioned: If True, doc_id is a stable key and the stored version is
+            diffed and updated in place instead of appending new chunks
     Returns:
         doc_id: Processed document ID
+    Raises:
+        ValueError: versioned without a doc_id (appending would duplicate the document)
     """
+    if versioned and not doc_id:
+        raise ValueError("versioned ingestion requires a doc_id")
     try:
         print("🔄 Processing FAQs and storing in PostgreSQL...")
-        doc_id = chunk_faq_recursive(faq_text, doc_id)
+        if versioned:
+            update_document_version(faq_text, doc_id)
+        else:
+            doc_id = chunk_faq_recursive(faq_text, doc_id)
         print(f"✅ FAQs processed and stored. Doc ID: {doc_id}")
         return doc_id
     except Exception as e:
@@ -0,0 +1,255 @@
+"""
+Shared MCP client sessions: one long-lived SSE session per server URL
+
+The agents used to open sse_client + ClientSession + initialize() for every
+list_tools / call_tool, several round trips and a new SSE stream per call.
+The manager keeps one initialized session per server on a background event
+loop (the SSE context managers must be entered and exited by the same task)
+and multiplexes concurrent requests over it (MCP requests carry their own
+ids), so a tool call is a single request/response. Sessions are:
+    - health-checked with a ping every MCP_PING_INTERVAL seconds
+    - reopened after a failed ping or call, with exponential backoff
+      (MCP_RECONNECT_BASE_DELAY doubling up to MCP_RECONNECT_MAX_DELAY)
+Callers on any event loop (FastAPI, asyncio.run in scripts) await
+list_tools / call_tool. list_tools is served from a ToolCatalog (TTL cache,
+invalidated by tools/list_changed notifications and reconnections, last known
+catalog while a server is unreachable). One manager per process, recreated
+lazily after a fork.
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from mcp import ClientSession, types
+from mcp.client.sse import sse_client
+from mcp.shared.exceptions import McpError
+
+from backend.utils.tool_catalog import ToolCatalog
+
+load_dotenv(override=True)
+
+MCP_PING_INTERVAL = float(os.getenv("MCP_PING_INTERVAL", "30"))
+MCP_CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", "10"))
+MCP_CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", "120"))
+MCP_RECONNECT_BASE_DELAY = float(os.getenv("MCP_RECONNECT_BASE_DELAY", "0.5"))
+MCP_RECONNECT_MAX_DELAY = float(os.getenv("MCP_RECONNECT_MAX_DELAY", "30"))
+# Servers used by the agents, connected and catalogued at API startup
+MCP_SERVER_URLS = [
+    url for url in (
+        os.getenv("MCP_RAG_SERVER_URL"),
+        os.getenv("MCP_SENTIMENT_SERVER_URL"),
+        os.getenv("MCP_EMAIL_SERVER_URL"),
+        os.getenv("MCP_TECH_SERVER_URL"),
+    ) if url
+]
+
+
+def backoff_delay(failures: int, base: float = MCP_RECONNECT_BASE_DELAY,
+                  max_delay: float = MCP_RECONNECT_MAX_DELAY) -> float:
+    """Seconds to wait before the reconnection attempt after failures consecutive failures"""
+    return min(base * (2 ** max(failures - 1, 0)), max_delay)
+
+
+@asynccontextmanager
+async def open_sse_session(url: str, message_handler=None):
+    """Initialized ClientSession over the server's SSE endpoint"""
+    async with sse_client(f"{url}/sse") as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream, message_handler=message_handler) as session:
+            await session.initialize()
+            yield session
+
+
+class ServerConnection:
+    """Long-lived session to one MCP server, owned by a task of the manager loop"""
+
+    def __init__(self, url: str, connect=open_sse_session, on_tools_changed=None):
+        self.url = url
+        self.connect = connect
+        self.on_tools_changed = on_tools_changed
+        self.session = None
+        self.failures = 0
+        self._ready = asyncio.Event()
+        self._broken = asyncio.Event()
+        self._task = None
+        self.stats = {"connects": 0, "disconnects": 0, "calls": 0, "errors": 0, "pings": 0, "call_ms": 0.0}
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                async with self.connect(self.url, self._on_message) as session:
+                    self.session = session
+                    self.failures = 0
+                    self._broken.clear()
+                    self._ready.set()
+                    self.stats["connects"] += 1
+                    print(f"✅ MCP session open: {self.url}")
+                    # The server may have been redeployed with other tools
+                    if self.stats["connects"] > 1:
+                        self._tools_changed()
+                    await self._keepalive(session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ MCP session error ({self.url}): {e}")
+            finally:
+                if self.session is not None:
+                    self.stats["disconnects"] += 1
+                self._ready.clear()
+                self.session = None
+            self.failures += 1
+            await asyncio.sleep(backoff_delay(self.failures))
+
+    def _tools_changed(self):
+        if self.on_tools_changed:
+            self.on_tools_changed(self.url)
+
+    async def _on_message(self, message):
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            print(f"🔄 Tool list changed: {self.url}")
+            self._tools_changed()
+
+    async def _keepalive(self, session):
+        """Returns (closing the session) when a call marked it broken, raises if a ping fails"""
+        while True:
+            try:
+                await asyncio.wait_for(self._broken.wait(), MCP_PING_INTERVAL)
+                return
+            except asyncio.TimeoutError:
+                await asyncio.wait_for(session.send_ping(), MCP_CONNECT_TIMEOUT)
+                self.stats["pings"] += 1
+
+    async def request(self, method: str, *args):
+        """Sends one request (a ClientSession method) over the shared session"""
+        self.start()
+        try:
+            await asyncio.wait_for(self._ready.wait(), MCP_CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"MCP server unavailable: {self.url}") from None
+
+        session = self.session
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(getattr(session, method)(*args), MCP_CALL_TIMEOUT)
+        except (McpError, asyncio.TimeoutError):
+            # Error answered by the server or a slow tool: the session itself is fine
+            self.stats["errors"] += 1
+            raise
+        except Exception:
+            self.stats["errors"] += 1
+            if self.session is session:
+                # New requests wait for the reconnection instead of reusing it
+                self._ready.clear()
+                self._broken.set()
+            raise
+        finally:
+            self.stats["calls"] += 1
+            self.stats["call_ms"] += (time.perf_counter() - start) * 1000
+
+    def snapshot(self) -> dict:
+        stats = dict(self.stats)
+        stats["avg_call_ms"] = round(stats["call_ms"] / stats["calls"], 2) if stats["calls"] else 0.0
+        stats["call_ms"] = round(stats["call_ms"], 2)
+        stats.update(connected=self.session is not None, failures=self.failures)
+        return stats
+
+
+class MCPClientManager:
+    """Event loop thread that owns one ServerConnection per server URL"""
+
+    def __init__(self, connect=open_sse_session):
+        self.pid = os.getpid()
+        self.connect = connect
+        self.loop = asyncio.new_event_loop()
+        self._connections = {}
+        self.catalog = ToolCatalog(self._fetch_tools)
+        self._thread = threading.Thread(target=self.loop.run_forever, name="mcp-client", daemon=True)
+        self._thread.start()
+
+    def _connection(self, url: str) -> ServerConnection:
+        # Runs on the manager loop only
+        connection = self._connections.get(url)
+        if connection is None:
+            connection = self._connections[url] = ServerConnection(url, self.connect, self.catalog.invalidate)
+        connection.start()
+        return connection
+
+    async def _request(self, url: str, method: str, *args, retry: bool = False):
+        try:
+            return await self._connection(url).request(method, *args)
+        except McpError:
+            raise
+        except Exception:
+            if not retry:
+                raise
+            # Idempotent requests get a second chance on the reopened session
+            return await self._connection(url).request(method, *args)
+
+    async def _submit(self, coro):
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    async def _fetch_tools(self, url: str) -> list:
+        result = await self._request(url, "list_tools", retry=True)
+        return [{"name": tool.name, "description": tool.description} for tool in result.tools]
+
+    async def list_tools(self, url: str) -> list:
+        """Tool catalog of the server, [{"name", "description"}]"""
+        return await self._submit(self.catalog.get(url))
+
+    async def call_tool(self, url: str, name: str, arguments: dict):
+        # Tools are not idempotent (draft_and_send_email), never retried
+        return await self._submit(self._request(url, "call_tool", name, arguments))
+
+    async def _prewarm(self, url: str):
+        try:
+            await self.catalog.get(url)
+        except Exception as e:
+            print(f"⚠️ Tool catalog not loaded ({url}): {e}")
+
+    def prewarm(self, urls: list):
+        """Opens the sessions and loads the tool catalogs in the background (API startup)"""
+        for url in urls:
+            if url:
+                asyncio.run_coroutine_threadsafe(self._prewarm(url), self.loop)
+
+    def stats(self) -> dict:
+        return {
+            "servers": {url: connection.snapshot() for url, connection in list(self._connections.items())},
+            "tool_catalog": self.catalog.snapshot(),
+        }
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_mcp_manager() -> MCPClientManager:
+    global _manager
+    # The loop thread does not survive fork(): children build their own
+    if _manager is None or _manager.pid != os.getpid():
+        with _manager_lock:
+            if _manager is None or _manager.pid != os.getpid():
+                _manager = MCPClientManager()
+    return _manager
+
+
+async def list_tools(url: str) -> list:
+    """[{"name", "description"}] of the server's tools (cached catalog)"""
+    return await get_mcp_manager().list_tools(url)
+
+
+async def call_tool(url: str, name: str, arguments: dict) -> str:
+    result = await get_mcp_manager().call_tool(url, name, arguments)
+    return result.content[0].text if result.content else "No se obtuvo resultado"
+
+
+def get_mcp_stats() -> dict:
+    if _manager is None or _manager.pid != os.getpid():
+        return {}
+    return _manager.stats()
@@ -0,0 +1,457 @@
+"""
+Memory-mapped in-process vector index (read replicas of the RAG MCP server)
+
+document_embeddings is exported to a directory per generation:
+    vectors.npy   (N, 768) float32 or int8, rows L2-normalized before quantization
+    scales.npy    (N,) float32 per-row scale (int8 only)
+    ids.npy       (N,) int64 document_embeddings.id
+    docs.npy      (N,) int32 ordinal of the row's doc_id in manifest["docs"]
+    offsets.npy   (N + 1,) int64 byte offsets into records.bin
+    records.bin   UTF-8 JSON {"doc_id", "chunk_id", "text"} per row
+    manifest.json generation, dtype, count, max_id, doc versions
+
+Every file is opened with mmap_mode="r", so forked workers share the same
+page-cache pages. The generation is sum(document_versions.version), which
+grows on every ingestion: each process checks it at most every
+MMAP_INDEX_REFRESH_SECONDS and, when it changed, only the rows of new or
+re-versioned documents (selected by doc_id) and rows with an id above the
+previous max_id are read from Postgres to build the next generation.
+
+Usage:
+    python -m backend.utils.mmap_index export [--dtype int8]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+sys.path.append("..")
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+MMAP_INDEX_DIR = os.getenv("MMAP_INDEX_DIR", "storage/mmap_index")
+MMAP_INDEX_DTYPE = os.getenv("MMAP_INDEX_DTYPE", "float32").lower()  # float32 | int8
+MMAP_INDEX_REFRESH_SECONDS = float(os.getenv("MMAP_INDEX_REFRESH_SECONDS", "30"))
+# Rows scored per matrix product, bounds the temporary memory of int8 search
+SEARCH_BLOCK_ROWS = 65536
+EXPORT_FETCH_ROWS = 5000
+DIM = 768
+
+MmapHit = namedtuple("MmapHit", ["id", "doc_id", "chunk_id", "text", "distance"])
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize_int8(vectors: np.ndarray) -> tuple:
+    """Symmetric per-row int8 quantization: vector ~= int8_values * scale"""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.round(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def top_k_scores(vectors: np.ndarray, query: np.ndarray, top_k: int, scales: np.ndarray = None) -> tuple:
+    """
+    Cosine top-k over normalized rows with a vectorized dot product
+    Returns:
+        (positions, similarities) ordered by descending similarity
+    """
+    count = len(vectors)
+    if count == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    scores = np.empty(count, dtype=np.float32)
+    for start in range(0, count, SEARCH_BLOCK_ROWS):
+        block = vectors[start:start + SEARCH_BLOCK_ROWS]
+        block_scores = block.astype(np.float32, copy=False) @ query
+        if scales is not None:
+            block_scores *= scales[start:start + SEARCH_BLOCK_ROWS]
+        scores[start:start + len(block)] = block_scores
+
+    top_k = min(top_k, count)
+    positions = np.argpartition(-scores, top_k - 1)[:top_k]
+    positions = positions[np.argsort(-scores[positions], kind="stable")]
+    return positions, scores[positions]
+
+
+def _lock_file(lock_file, lock: bool):
+    """Exclusive lock on lock_file: fcntl on POSIX, msvcrt on Windows"""
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        lock_file.seek(0)
+        if not lock:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            return
+        # LK_LOCK gives up after ~10 s, a long export can hold the lock longer
+        while True:
+            try:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+    fcntl.flock(lock_file, fcntl.LOCK_EX if lock else fcntl.LOCK_UN)
+
+
+@contextmanager
+def _directory_lock(directory: str):
+    """Only one process builds a generation at a time"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "a+") as lock_file:
+        _lock_file(lock_file, True)
+        try:
+            yield
+        finally:
+            _lock_file(lock_file, False)
+
+
+def _read_current(directory: str):
+    """Returns (generation path, manifest) of the published generation, or (None, None)"""
+    try:
+        with open(os.path.join(directory, "CURRENT"), "r", encoding="utf-8") as f:
+            path = os.path.join(directory, f.read().strip())
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            return path, json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None, None
+
+
+class _GenerationWriter:
+    """Writes the files of a new generation into a temporary directory"""
+
+    def __init__(self, path: str, count: int, dtype: str):
+        os.makedirs(path)
+        self.path = path
+        self.dtype = dtype
+        storage_dtype = np.int8 if dtype == "int8" else np.float32
+        self.vectors = np.lib.format.open_memmap(
+            os.path.join(path, "vectors.npy"), mode="w+", dtype=storage_dtype, shape=(count, DIM))
+        self.scales = np.lib.format.open_memmap(
+            os.path.join(path, "scales.npy"), mode="w+", dtype=np.float32, shape=(count,)) if dtype == "int8" else None
+        self.ids = np.lib.format.open_memmap(os.path.join(path, "ids.npy"), mode="w+", dtype=np.int64, shape=(count,))
+        self.docs = np.lib.format.open_memmap(os.path.join(path, "docs.npy"), mode="w+", dtype=np.int32, shape=(count,))
+        self.offsets = np.lib.format.open_memmap(
+            os.path.join(path, "offsets.npy"), mode="w+", dtype=np.int64, shape=(count + 1,))
+        self.records = open(os.path.join(path, "records.bin"), "wb")
+        self.doc_ordinals = {}
+        self.position = 0
+        self.offsets[0] = 0
+
+    def _doc_ordinal(self, doc_id: str) -> int:
+        if doc_id not in self.doc_ordinals:
+            self.doc_ordinals[doc_id] = len(self.doc_ordinals)
+        return self.doc_ordinals[doc_id]
+
+    def append_encoded(self, ids, doc_ids, vectors, scales, records):
+        """Appends rows already in storage format (copied from the previous generation)"""
+        end = self.position + len(ids)
+        self.ids[self.position:end] = ids
+        self.docs[self.position:end] = [self._doc_ordinal(doc_id) for doc_id in doc_ids]
+        self.vectors[self.position:end] = vectors
+        if self.scales is not None:
+            self.scales[self.position:end] = scales
+        offset = int(self.offsets[self.position])
+        for i, record in enumerate(records):
+            self.records.write(record)
+            offset += len(record)
+            self.offsets[self.position + i + 1] = offset
+        self.position = end
+
+    def append_rows(self, rows):
+        """Appends (id, doc_id, chunk_id, text, embedding) rows read from Postgres"""
+        if not rows:
+            return
+        vectors = normalize_rows(np.stack([row[4] for row in rows]))
+        scales = None
+        if self.dtype == "int8":
+            vectors, scales = quantize_int8(vectors)
+        records = [
+            json.dumps({"doc_id": row[1], "chunk_id": row[2], "text": row[3]}, ensure_ascii=False).encode("utf-8")
+            for row in rows
+        ]
+        self.append_encoded([row[0] for row in rows], [row[1] for row in rows], vectors, scales, records)
+
+    def close(self, manifest: dict) -> int:
+        self.records.close()
+        for array in (self.vectors, self.scales, self.ids, self.docs, self.offsets):
+            if array is not None:
+                array.flush()
+        manifest = dict(manifest, count=self.position, dtype=self.dtype, dim=DIM,
+                        docs=sorted(self.doc_ordinals, key=self.doc_ordinals.get))
+        with open(os.path.join(self.path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        return self.position
+
+
+class _Generation:
+    """Read-only view of a published generation"""
+
+    def __init__(self, path: str, manifest: dict):
+        self.path = path
+        self.manifest = manifest
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r") if manifest["dtype"] == "int8" else None
+        self.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self.docs = np.load(os.path.join(path, "docs.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        records_path = os.path.join(path, "records.bin")
+        self.records = np.memmap(records_path, dtype=np.uint8, mode="r") if os.path.getsize(records_path) else b""
+
+    def record_bytes(self, position: int) -> bytes:
+        return bytes(self.records[int(self.offsets[position]):int(self.offsets[position + 1])])
+
+    def record(self, position: int) -> dict:
+        return json.loads(self.record_bytes(position).decode("utf-8"))
+
+
+def current_generation(cursor) -> int:
+    cursor.execute("SELECT coalesce(sum(version), 0) FROM document_versions")
+    return int(cursor.fetchone()[0])
+
+
+def changed_documents(base_versions: dict, doc_versions: dict) -> list:
+    """doc_ids added, re-versioned or removed since the generation with base_versions"""
+    changed = [doc_id for doc_id, version in doc_versions.items() if base_versions.get(doc_id) != version]
+    return changed + [doc_id for doc_id in base_versions if doc_id not in doc_versions]
+
+
+def build_generation(directory: str = MMAP_INDEX_DIR, dtype: str = MMAP_INDEX_DTYPE, full: bool = False) -> dict:
+    """
+    Publishes a new generation, incrementally from the current one when possible
+    Args:
+        directory: Index directory
+        dtype: "float32" or "int8"
+        full: Re-export every row instead of reusing the previous generation
+    Returns:
+        Manifest of the published generation
+    """
+    from pgvector.psycopg2 import register_vector
+    from backend.utils.db_connection import engine
+
+    base_path, base_manifest = _read_current(directory)
+    base = None
+    if base_manifest and not full and base_manifest["dtype"] == dtype:
+        base = _Generation(base_path, base_manifest)
+
+    raw = engine.raw_connection()
+    try:
+        register_vector(raw.driver_connection)
+        raw.commit()
+        cursor = raw.cursor()
+        # One snapshot for the generation counter and every row read below
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        generation = current_generation(cursor)
+        cursor.execute("SELECT doc_id, version FROM document_versions")
+        doc_versions = dict(cursor.fetchall())
+        cursor.execute("SELECT coalesce(max(id), 0) FROM document_embeddings")
+        max_id = int(cursor.fetchone()[0])
+
+        keep = None
+        min_id = 0
+        dirty_docs = []
+        if base is not None:
+            min_id = base.manifest["max_id"]
+            # New or re-versioned documents are re-read whole by doc_id: a concurrent
+            # ingestion can commit rows with ids below the previous max_id after it was read
+            dirty_docs = changed_documents(base.manifest["doc_versions"], doc_versions)
+            keep = np.ones(len(base.ids), dtype=bool)
+            if dirty_docs:
+                dirty = set(dirty_docs)
+                ordinals = [i for i, doc_id in enumerate(base.manifest["docs"]) if doc_id in dirty]
+                keep &= ~np.isin(base.docs, ordinals)
+
+        # Rows past the watermark (appends without a version) plus every row of the dirty documents
+        export_filter = "embedding IS NOT NULL AND (id > %s OR doc_id = ANY(%s))"
+        cursor.execute(f"SELECT count(*) FROM document_embeddings WHERE {export_filter}", (min_id, dirty_docs))
+        new_count = int(cursor.fetchone()[0])
+        kept_count = int(keep.sum()) if keep is not None else 0
+
+        tmp_path = os.path.join(directory, f"gen-{generation}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        writer = _GenerationWriter(tmp_path, kept_count + new_count, dtype)
+
+        if keep is not None:
+            positions = np.flatnonzero(keep)
+            docs = base.manifest["docs"]
+            for start in range(0, len(positions), EXPORT_FETCH_ROWS):
+                block = positions[start:start + EXPORT_FETCH_ROWS]
+                writer.append_encoded(
+                    base.ids[block],
+                    [docs[ordinal] for ordinal in base.docs[block]],
+                    base.vectors[block],
+                    base.scales[block] if base.scales is not None else None,
+                    [base.record_bytes(position) for position in block],
+                )
+
+        stream = raw.cursor(name="mmap_index_export")
+        stream.itersize = EXPORT_FETCH_ROWS
+        stream.execute(
+            f"SELECT id, doc_id, chunk_id, text, embedding FROM document_embeddings "
+            f"WHERE {export_filter} ORDER BY id",
+            (min_id, dirty_docs),
+        )
+        while True:
+            rows = stream.fetchmany(EXPORT_FETCH_ROWS)
+            if not rows:
+                break
+            writer.append_rows(rows)
+        stream.close()
+        raw.rollback()
+    finally:
+        raw.close()
+
+    manifest = {
+        "generation": generation,
+        "max_id": max_id,
+        "doc_versions": doc_versions,
+        "created_at": time.time(),
+        "incremental": base is not None,
+    }
+    writer.close(manifest)
+    with open(os.path.join(tmp_path, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    final_name = f"gen-{generation}"
+    final_path = os.path.join(directory, final_name)
+    shutil.rmtree(final_path, ignore_errors=True)
+    os.rename(tmp_path, final_path)
+    current_tmp = os.path.join(directory, f"CURRENT.tmp-{os.getpid()}")
+    with open(current_tmp, "w", encoding="utf-8") as f:
+        f.write(final_name)
+    os.replace(current_tmp, os.path.join(directory, "CURRENT"))
+    _remove_old_generations(directory, keep_names={final_name, os.path.basename(base.path) if base else ""})
+
+    print(f"✅ mmap index generation {generation}: {manifest['count']} rows "
+          f"({'incremental' if base is not None else 'full'} export, {dtype})")
+    return manifest
+
+
+def _remove_old_generations(directory: str, keep_names: set):
+    """Processes that still map an older generation keep their pages until they reload"""
+    for name in os.listdir(directory):
+        if name.startswith("gen-") and name not in keep_names and ".tmp-" not in name:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+class MmapVectorIndex:
+    """Process-local view of the published generation, refreshed on the generation counter"""
+
+    def __init__(self, directory: str = MMAP_INDEX_DIR, dtype: str = MMAP_INDEX_DTYPE,
+                 refresh_seconds: float = MMAP_INDEX_REFRESH_SECONDS):
+        self.directory = directory
+        self.dtype = dtype
+        self.refresh_seconds = refresh_seconds
+        self._generation = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"searches": 0, "refreshes": 0}
+
+    def _load_current(self) -> bool:
+        path, manifest = _read_current(self.directory)
+        if path is None:
+            return False
+        if self._generation is None or self._generation.path != path:
+            self._generation = _Generation(path, manifest)
+        return True
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Checks the generation counter (at most every refresh_seconds) and loads or
+        builds the newer generation
+        Returns:
+            True if a different generation was loaded
+        """
+        now = time.monotonic()
+        if not force and self._generation is not None and now - self._checked_at < self.refresh_seconds:
+            return False
+        with self._lock:
+            self._checked_at = now
+            from backend.utils.db_connection import engine
+
+            raw = engine.raw_connection()
+            try:
+                generation = current_generation(raw.cursor())
+                raw.rollback()
+            finally:
+                raw.close()
+
+            loaded = self._generation.manifest["generation"] if self._generation else None
+            if generation == loaded:
+                return False
+            with _directory_lock(self.directory):
+                _, manifest = _read_current(self.directory)
+                # Another worker may already have published it
+                if manifest is None or manifest["generation"] != generation or manifest["dtype"] != self.dtype:
+                    build_generation(self.directory, self.dtype)
+                self._load_current()
+            self._stats["refreshes"] += 1
+            return True
+
+    def search(self, query_embedding, top_k: int = 5) -> list:
+        """
+        Top-k chunks by cosine similarity
+        Returns:
+            List of MmapHit (id, doc_id, chunk_id, text, distance)
+        """
+        self.refresh()
+        generation = self._generation
+        if generation is None:
+            return []
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32))
+        positions, similarities = top_k_scores(generation.vectors, query, top_k, generation.scales)
+        self._stats["searches"] += 1
+
+        hits = []
+        for position, similarity in zip(positions, similarities):
+            record = generation.record(position)
+            hits.append(MmapHit(int(generation.ids[position]), record["doc_id"], record["chunk_id"],
+                                record["text"], 1.0 - float(similarity)))
+        return hits
+
+    def stats(self) -> dict:
+        generation = self._generation
+        return dict(
+            self._stats,
+            generation=generation.manifest["generation"] if generation else None,
+            rows=generation.manifest["count"] if generation else 0,
+            dtype=generation.manifest["dtype"] if generation else self.dtype,
+            pid=os.getpid(),
+        )
+
+
+_mmap_index = None
+_mmap_index_lock = threading.Lock()
+
+
+def get_mmap_index() -> MmapVectorIndex:
+    global _mmap_index
+    if _mmap_index is None:
+        with _mmap_index_lock:
+            if _mmap_index is None:
+                _mmap_index = MmapVectorIndex()
+    return _mmap_index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory-mapped export of document_embeddings")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Publish a new generation")
+    export_parser.add_argument("--dir", default=MMAP_INDEX_DIR)
+    export_parser.add_argument("--dtype", choices=["float32", "int8"], default=MMAP_INDEX_DTYPE)
+    export_parser.add_argument("--full", action="store_true", help="Ignore the previous generation")
+    args = parser.parse_args()
+
+    with _directory_lock(args.dir):
+        build_generation(args.dir, args.dtype, full=args.full)
@@ -0,0 +1,233 @@
+"""
+ONNX Runtime backend for the e5-base-v2 embedder (EMBED_BACKEND=onnx | onnx-int8)
+
+The HuggingFace model is exported once to ONNX (last_hidden_state with dynamic
+batch / sequence axes) next to its tokenizer.json; the int8 variant is the same
+graph with dynamically quantized weights. OnnxEmbedding is a drop-in
+BaseEmbedding: mean pooling over the attention mask and L2 normalization, the
+same as the sentence-transformers model HuggingFaceEmbedding runs, so vectors
+stay comparable with the ones already stored.
+
+Usage:
+    python -m backend.utils.onnx_embedder export [--int8]
+    python -m backend.utils.onnx_embedder check [--int8] [--threshold 0.99]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from typing import Any, List
+sys.path.append("..")
+
+import numpy as np
+from dotenv import load_dotenv
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+
+from backend.utils.embeddings import EMBED_INTRA_OP_THREADS, EMBED_MODEL_NAME
+
+load_dotenv(override=True)
+
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "storage/onnx_models")
+# Minimum cosine similarity between ONNX and PyTorch vectors of the same text
+ONNX_ACCURACY_THRESHOLD = float(os.getenv("ONNX_ACCURACY_THRESHOLD", "0.99"))
+EMBED_MAX_LENGTH = 512
+ONNX_BATCH_SIZE = 32
+ONNX_OPSET = 17
+
+
+def model_directory(model_name: str, base_dir: str = None) -> str:
+    return os.path.join(base_dir or ONNX_MODEL_DIR, model_name.replace("/", "__"))
+
+
+def model_path(model_name: str, quantized: bool = False, base_dir: str = None) -> str:
+    filename = "model.int8.onnx" if quantized else "model.onnx"
+    return os.path.join(model_directory(model_name, base_dir), filename)
+
+
+def mean_pool_normalize(hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """Mean of the token vectors under the attention mask, L2-normalized"""
+    mask = attention_mask[..., None].astype(np.float32)
+    summed = (hidden * mask).sum(axis=1)
+    pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+    norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+    return pooled / np.clip(norms, 1e-12, None)
+
+
+def export_onnx(model_name: str, quantize: bool = False, base_dir: str = None) -> str:
+    """
+    Exports the HuggingFace model to ONNX (and optionally int8)
+    Args:
+        model_name: HuggingFace model id
+        quantize: Also write the dynamically quantized int8 graph
+        base_dir: Root directory of the exported models (defaults to ONNX_MODEL_DIR)
+    Returns:
+        Path of the graph the embedder should load
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    directory = model_directory(model_name, base_dir)
+    fp32_path = model_path(model_name, False, base_dir)
+    os.makedirs(directory, exist_ok=True)
+
+    if not os.path.exists(fp32_path):
+        print(f"🔄 Exporting {model_name} to ONNX...")
+        start = time.perf_counter()
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name).eval()
+        sample = tokenizer(["query: sample"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=ONNX_OPSET,
+            )
+        tokenizer.save_pretrained(directory)
+        print(f"✅ ONNX model exported in {time.perf_counter() - start:.1f}s: {fp32_path}")
+
+    if not quantize:
+        return fp32_path
+
+    int8_path = model_path(model_name, True, base_dir)
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print("🔄 Quantizing ONNX model weights to int8...")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"✅ int8 model written: {int8_path}")
+    return int8_path
+
+
+class OnnxEmbedding(BaseEmbedding):
+    """e5 embeddings computed with ONNX Runtime on CPU"""
+
+    max_length: int = Field(default=EMBED_MAX_LENGTH, description="Maximum tokens per text.")
+    quantized: bool = Field(default=False, description="Load the int8 graph.")
+    intra_op_threads: int = Field(default=EMBED_INTRA_OP_THREADS, description="ONNX Runtime intra-op threads (0 = one per core).")
+
+    _session: Any = PrivateAttr()
+    _tokenizer: Any = PrivateAttr()
+    _input_names: List[str] = PrivateAttr()
+
+    def __init__(self, model_name: str, quantized: bool = False, intra_op_threads: int = None,
+                 max_length: int = EMBED_MAX_LENGTH, base_dir: str = None, **kwargs: Any):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        intra_op_threads = EMBED_INTRA_OP_THREADS if intra_op_threads is None else intra_op_threads
+        super().__init__(model_name=model_name, quantized=quantized, intra_op_threads=intra_op_threads,
+                         max_length=max_length, embed_batch_size=ONNX_BATCH_SIZE, **kwargs)
+
+        path = model_path(model_name, quantized, base_dir)
+        if not os.path.exists(path):
+            path = export_onnx(model_name, quantize=quantized, base_dir=base_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        self._session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_names = [node.name for node in self._session.get_inputs()]
+
+        tokenizer = Tokenizer.from_file(os.path.join(model_directory(model_name, base_dir), "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=max_length)
+        tokenizer.enable_padding()
+        self._tokenizer = tokenizer
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "OnnxEmbedding"
+
+    def _embed(self, texts: List[str], prompt_name: str = None) -> List[List[float]]:
+        """Same signature as HuggingFaceEmbedding._embed (e5 here runs without prompts)"""
+        vectors = []
+        for start in range(0, len(texts), ONNX_BATCH_SIZE):
+            encodings = self._tokenizer.encode_batch(list(texts[start:start + ONNX_BATCH_SIZE]))
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = self._session.run(None, {name: feeds[name] for name in self._input_names})[0]
+            vectors.extend(mean_pool_normalize(hidden, feeds["attention_mask"]).tolist())
+        return vectors
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed([query], prompt_name="query")[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed([text], prompt_name="text")[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, prompt_name="text")
+
+
+def sample_texts(limit: int = 200) -> list:
+    """Chunks of the documents in storage/ (the texts the embedder really sees)"""
+    from backend.utils.llamaindex_utils import split_text_into_nodes
+
+    texts = []
+    for path in sorted(glob.glob("storage/*.txt")):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            texts.extend(node.text for node in split_text_into_nodes(f.read()))
+        if len(texts) >= limit:
+            break
+    return texts[:limit]
+
+
+def check_accuracy(model_name: str, texts: list, quantized: bool = False, threshold: float = None) -> dict:
+    """
+    Cosine similarity between the ONNX and the PyTorch vector of each text
+    Returns:
+        Dict with min/mean cosine, threshold and passed
+    """
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    threshold = ONNX_ACCURACY_THRESHOLD if threshold is None else threshold
+    reference = np.array(HuggingFaceEmbedding(model_name=model_name).get_text_embedding_batch(texts))
+    candidate = np.array(OnnxEmbedding(model_name, quantized=quantized).get_text_embedding_batch(texts))
+    cosines = (reference * candidate).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    return {
+        "backend": "onnx-int8" if quantized else "onnx",
+        "texts": len(texts),
+        "min_cosine": round(float(cosines.min()), 5),
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "threshold": threshold,
+        "passed": bool(cosines.min() >= threshold),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ONNX export and accuracy check of the embedding model")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Export the model to ONNX")
+    export_parser.add_argument("--int8", action="store_true", help="Also write the int8 quantized graph")
+    check_parser = subparsers.add_parser("check", help="Compare ONNX vectors with the PyTorch ones")
+    check_parser.add_argument("--int8", action="store_true")
+    check_parser.add_argument("--threshold", type=float, default=ONNX_ACCURACY_THRESHOLD)
+    check_parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(EMBED_MODEL_NAME, quantize=args.int8)
+    elif args.command == "check":
+        result = check_accuracy(EMBED_MODEL_NAME, sample_texts(args.samples), args.int8, args.threshold)
+        print(f"📊 {result}")
+        if not result["passed"]:
+            print(f"❌ {result['backend']} min cosine {result['min_cosine']} below {result['threshold']}")
+            sys.exit(1)
+        print(f"✅ {result['backend']} vectors match PyTorch (min cosine {result['min_cosine']})")
@@ -0,0 +1,166 @@
+"""
+Bounded LRU/TTL cache for query embeddings
+
+Keys are the normalized query string (plus the model name). Entries live in
+an in-process OrderedDict and, optionally, in a SQLite file (WAL mode) so
+several MCP server workers on the same host share the embeddings.
+"""
+import array
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+sys.path.append("..")
+
+from dotenv import load_dotenv
+
+from backend.utils.embedding_service import embed_queries
+from backend.utils.embeddings import EMBED_MODEL_NAME
+
+load_dotenv(override=True)
+
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "2048"))
+QUERY_EMBED_CACHE_TTL = int(os.getenv("QUERY_EMBED_CACHE_TTL", "86400"))  # seconds, 0 = no expiry
+# Optional on-disk backing shared between processes, e.g. storage/query_embeddings.sqlite
+QUERY_EMBED_CACHE_PATH = os.getenv("QUERY_EMBED_CACHE_PATH", "")
+
+
+def normalize_query(query: str) -> str:
+    query = unicodedata.normalize("NFC", query or "").lower()
+    return re.sub(r"\s+", " ", query).strip()
+
+
+def _to_blob(embedding) -> bytes:
+    return array.array("f", embedding).tobytes()
+
+
+def _from_blob(blob: bytes) -> list:
+    values = array.array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU cache with TTL and optional SQLite backing"""
+
+    def __init__(self, max_size: int = QUERY_EMBED_CACHE_SIZE, ttl_seconds: int = QUERY_EMBED_CACHE_TTL,
+                 path: str = QUERY_EMBED_CACHE_PATH):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.path = path or None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._local = threading.local()
+        if self.path:
+            disk = self._disk()
+            disk.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(key TEXT PRIMARY KEY, embedding BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            if self.ttl_seconds:
+                disk.execute("DELETE FROM query_embeddings WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+
+    def _disk(self):
+        """One SQLite connection per thread"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def _expired(self, created_at: float) -> bool:
+        return bool(self.ttl_seconds) and time.time() - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, embedding: list, created_at: float):
+        self._entries[key] = (embedding, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not self._expired(entry[1]):
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+
+        if self.path:
+            try:
+                row = self._disk().execute(
+                    "SELECT embedding, created_at FROM query_embeddings WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"❌ Query cache disk read error: {e}")
+                row = None
+            if row and not self._expired(row[1]):
+                embedding = _from_blob(row[0])
+                with self._lock:
+                    self._remember(key, embedding, row[1])
+                    self._stats["disk_hits"] += 1
+                return embedding
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key: str, embedding: list):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, list(embedding), created_at)
+        if self.path:
+            try:
+                self._disk().execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, embedding, created_at) VALUES (?, ?, ?)",
+                    (key, _to_blob(embedding), created_at),
+                )
+            except sqlite3.Error as e:
+                print(f"❌ Query cache disk write error: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), max_size=self.max_size)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_query_cache = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    global _query_cache
+    if _query_cache is None:
+        with _query_cache_lock:
+            if _query_cache is None:
+                _query_cache = QueryEmbeddingCache()
+    return _query_cache
+
+
+def embed_query(query: str) -> list:
+    """Query embedding through the LRU cache (computed by the batching service on a miss)"""
+    if QUERY_EMBED_CACHE_SIZE <= 0:
+        return embed_queries([query])[0]
+
+    cache = get_query_cache()
+    key = f"{EMBED_MODEL_NAME}:{normalize_query(query)}"
+    embedding = cache.get(key)
+    if embedding is None:
+        embedding = embed_queries([query])[0]
+        cache.set(key, embedding)
+    return embedding
+
+
+def get_query_cache_stats() -> dict:
+    return get_query_cache().stats()
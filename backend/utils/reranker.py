@@ -0,0 +1,142 @@
+"""
+Optional cross-encoder re-ranking of first-stage retrieval candidates (CPU)
+
+The retriever over-fetches RERANK_CANDIDATES chunks, a small local
+cross-encoder scores each (query, chunk) pair in batches of RERANK_BATCH_SIZE
+and the top k by cross-encoder score are returned. The batches run on a
+worker thread and the caller waits at most RERANK_LATENCY_BUDGET_MS for them:
+when the deadline passes, the candidates scored so far are ranked ahead of the
+unscored ones (kept in first-stage order), so a slow box never makes retrieval
+slower than the budget.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+# Multilingual MiniLM cross-encoder trained on mMARCO (the FAQs are in Spanish)
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+# Small batches: the scores of every finished batch survive a deadline
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "8"))
+RERANK_LATENCY_BUDGET_MS = float(os.getenv("RERANK_LATENCY_BUDGET_MS", "300"))
+# Threads scoring batches; a batch that outlived its deadline still finishes on one
+RERANK_WORKERS = int(os.getenv("RERANK_WORKERS", "2"))
+RERANK_MAX_LENGTH = 512
+
+_reranker = None
+_reranker_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_rerank_stats = {"calls": 0, "reranked": 0, "over_budget": 0, "errors": 0, "total_ms": 0.0}
+
+
+def get_reranker():
+    """Lazy load the cross-encoder once per process"""
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                try:
+                    from sentence_transformers import CrossEncoder
+
+                    print(f"🔄 Loading re-ranking model {RERANK_MODEL_NAME}...")
+                    start = time.perf_counter()
+                    _reranker = CrossEncoder(RERANK_MODEL_NAME, device="cpu", max_length=RERANK_MAX_LENGTH)
+                    print(f"✅ Re-ranking model loaded in {time.perf_counter() - start:.2f}s")
+                except Exception as e:
+                    print(f"❌ Error loading re-ranking model: {e}")
+                    raise e
+    return _reranker
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    # Worker threads don't survive fork(): children build their own pool
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=RERANK_WORKERS, thread_name_prefix="rerank")
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _cross_encoder_scores(query: str, texts: list) -> list:
+    return get_reranker().predict([(query, text) for text in texts], batch_size=RERANK_BATCH_SIZE).tolist()
+
+
+def _count(**values):
+    with _stats_lock:
+        for key, value in values.items():
+            _rerank_stats[key] += value
+
+
+def rerank(query: str, texts: list, top_k: int, budget_ms: float = None, scorer=None) -> tuple:
+    """
+    Re-orders candidate texts by cross-encoder relevance
+    Args:
+        query: User question
+        texts: Candidate chunk texts in first-stage order
+        top_k: Number of positions to return
+        budget_ms: Latency budget (defaults to RERANK_LATENCY_BUDGET_MS)
+        scorer: Function (query, texts) -> scores, defaults to the cross-encoder
+    Returns:
+        (list of (candidate position, score or None), stats dict). Candidates
+        scored before the deadline come first by score, the rest keep the
+        first-stage order with a None score
+    """
+    budget_ms = RERANK_LATENCY_BUDGET_MS if budget_ms is None else budget_ms
+    scorer = scorer or _cross_encoder_scores
+    start = time.perf_counter()
+    scores, status = [], "reranked"
+    try:
+        for i in range(0, len(texts), RERANK_BATCH_SIZE):
+            remaining_s = budget_ms / 1000 - (time.perf_counter() - start)
+            if remaining_s <= 0:
+                status = "over_budget"
+                break
+            future = _get_executor().submit(scorer, query, texts[i:i + RERANK_BATCH_SIZE])
+            try:
+                scores.extend(future.result(timeout=remaining_s))
+            except FutureTimeoutError:
+                # The batch keeps running on its thread, its scores are not waited for
+                status = "over_budget"
+                break
+    except Exception as e:
+        print(f"❌ Re-ranking error, keeping first-stage order: {e}")
+        status = "error"
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if status == "error":
+        scores = []
+    scored = sorted(enumerate(scores), key=lambda item: item[1], reverse=True)
+    ranking = [(position, float(score)) for position, score in scored]
+    ranking += [(position, None) for position in range(len(scores), len(texts))]
+    ranking = ranking[:top_k]
+
+    _count(calls=1, reranked=int(status == "reranked"), over_budget=int(status == "over_budget"),
+           errors=int(status == "error"), total_ms=elapsed_ms)
+    stats = {
+        "status": status,
+        "candidates": len(texts),
+        "scored": len(scores),
+        "rerank_ms": round(elapsed_ms, 2),
+        "budget_ms": budget_ms,
+    }
+    return ranking, stats
+
+
+def get_rerank_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_rerank_stats)
+    stats["avg_ms"] = round(stats["total_ms"] / stats["calls"], 2) if stats["calls"] else 0.0
+    stats["total_ms"] = round(stats["total_ms"], 2)
+    stats.update(enabled=RERANK_ENABLED, model=RERANK_MODEL_NAME, candidates_per_query=RERANK_CANDIDATES)
+    return stats
@@ -0,0 +1,176 @@
+"""
+Streaming ingestion with bounded memory for very large documents
+
+The source (local file or S3 body) is read in pieces, re-assembled into text
+blocks cut at paragraph / line boundaries, split into chunk nodes block by
+block and consumed in fixed-size batches: each batch is embedded and written
+with COPY before the next one is read. Peak memory depends on
+STREAM_BLOCK_CHARS and STREAM_EMBED_BATCH, not on the document size.
+"""
+import codecs
+import os
+import sys
+import time
+import uuid
+sys.path.append("..")
+
+from dotenv import load_dotenv
+
+from backend.utils.bulk_writer import iter_batches, write_chunk_batches
+from backend.utils.db_connection import engine
+from backend.utils.embedding_cache import content_hash, embed_texts_cached
+from backend.utils.faq_chunker import CHUNKING_MODE, last_question_start, resolve_chunking_mode
+from backend.utils.versioned_ingestion import ingest_document_version
+
+load_dotenv(override=True)
+
+# Characters of text handed to the splitter at once
+STREAM_BLOCK_CHARS = int(os.getenv("STREAM_BLOCK_CHARS", "65536"))
+# Chunks embedded and flushed to the database per batch
+STREAM_EMBED_BATCH = int(os.getenv("STREAM_EMBED_BATCH", "256"))
+READ_SIZE = 65536
+BLOCK_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+
+def iter_file_text(file_path: str, encoding: str = "utf-8"):
+    """Yields the content of a text file in READ_SIZE pieces"""
+    with open(file_path, "r", encoding=encoding, errors="replace") as f:
+        while True:
+            piece = f.read(READ_SIZE)
+            if not piece:
+                return
+            yield piece
+
+
+def decode_stream(byte_pieces, encoding: str = "utf-8"):
+    """Decodes a byte stream incrementally (multi-byte characters may span pieces)"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    for piece in byte_pieces:
+        text = decoder.decode(piece)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _block_boundary(text: str, limit: int) -> int:
+    """
+    Last question start (FAQ chunking) or paragraph / line / sentence / word
+    break in the second half of text[:limit]
+    """
+    if CHUNKING_MODE != "sentence":
+        cut = last_question_start(text, limit)
+        if cut > limit // 2:
+            return cut
+    for separator in BLOCK_SEPARATORS:
+        cut = text.rfind(separator, 0, limit)
+        if cut > limit // 2:
+            return cut + len(separator)
+    return limit
+
+
+def iter_text_blocks(pieces, block_chars: int = None):
+    """
+    Re-assembles text pieces into blocks of about block_chars characters
+    ending at a natural boundary, so chunks never straddle two blocks mid-word
+    """
+    block_chars = block_chars or STREAM_BLOCK_CHARS
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) >= block_chars:
+            cut = _block_boundary(buffer, block_chars)
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+    if buffer.strip():
+        yield buffer
+
+
+def iter_chunk_nodes(blocks):
+    """
+    Splits each text block into chunk nodes and yields them one by one.
+    "auto" chunking is decided once from the first block, so a document
+    never mixes Q/A units and splitter chunks
+    """
+    from backend.utils.llamaindex_utils import split_text_into_nodes
+
+    mode = None
+    for block in blocks:
+        mode = mode or resolve_chunking_mode(block)
+        for node in split_text_into_nodes(block, mode=mode):
+            yield node
+
+
+def append_chunks_streaming(nodes, doc_id: str, batch_size: int = None) -> dict:
+    """
+    Embeds and inserts chunk nodes batch by batch in a single transaction
+    Args:
+        nodes: Iterable of chunk nodes (consumed lazily)
+        doc_id: Document ID
+        batch_size: Chunks per embedding call and COPY (defaults to STREAM_EMBED_BATCH)
+    Returns:
+        Stats dict with doc_id, chunks, batches and seconds
+    """
+    from backend.utils.db_actions import bump_document_version
+
+    batch_size = batch_size or STREAM_EMBED_BATCH
+    start = time.perf_counter()
+    chunks, batches = 0, 0
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for batch in iter_batches(nodes, batch_size):
+            embeddings = embed_texts_cached([node.text for node in batch])
+            rows = (
+                {
+                    "doc_id": doc_id,
+                    "chunk_id": node.node_id or str(uuid.uuid4()),
+                    "text": node.text,
+                    "embedding": embedding,
+                    "content_hash": content_hash(node.text),
+                    "chunk_index": chunks + i,
+                }
+                for i, (node, embedding) in enumerate(zip(batch, embeddings))
+            )
+            write_chunk_batches(cursor, rows, batch_size=batch_size)
+            chunks += len(batch)
+            batches += 1
+            print(f"💾 Streamed {chunks} chunks of {doc_id} ({batches} batches)")
+        raw.commit()
+    except Exception as e:
+        raw.rollback()
+        print(f"❌ Error streaming chunks of {doc_id}: {e}")
+        raise e
+    finally:
+        raw.close()
+
+    bump_document_version(doc_id, chunks)
+    return {"doc_id": doc_id, "chunks": chunks, "batches": batches, "seconds": time.perf_counter() - start}
+
+
+def stream_ingest(pieces, doc_id: str = None, versioned: bool = False, batch_size: int = None) -> dict:
+    """
+    Ingests a document from an iterable of text pieces with bounded memory
+    Args:
+        pieces: Iterable of text pieces (iter_file_text, decode_stream(...))
+        doc_id: Document ID, generated if missing
+        versioned: If True, doc_id is a stable key and the stored version is
+            diffed against the streamed chunks instead of appending
+        batch_size: Chunks embedded and written per batch
+    Returns:
+        Stats dict (always includes doc_id)
+    Raises:
+        ValueError: versioned without a doc_id (appending would duplicate the document)
+    """
+    if versioned and not doc_id:
+        raise ValueError("versioned ingestion requires a doc_id")
+    nodes = iter_chunk_nodes(iter_text_blocks(pieces))
+    if versioned:
+        return ingest_document_version(nodes, doc_id, batch_size=batch_size or STREAM_EMBED_BATCH)
+
+    doc_id = doc_id or str(uuid.uuid4())
+    stats = append_chunks_streaming(nodes, doc_id, batch_size)
+    print(f"✅ {stats['chunks']} chunks streamed in {stats['seconds']:.1f}s with doc_id: {doc_id}")
+    return stats
@@ -0,0 +1,90 @@
+"""
+TTL cache of the MCP servers' tool catalogs
+
+The tool list of a server only changes between deployments, so the agents
+read it from here instead of asking the server on every request. An entry is
+refreshed when it is older than MCP_TOOLS_TTL seconds or after invalidate()
+(tools/list_changed notification, reconnection to the server). If the
+refresh fails, the last known catalog keeps being served and the refresh is
+retried after MCP_TOOLS_RETRY seconds, so requests don't wait for an
+unreachable server. Concurrent misses for one server share a single fetch.
+"""
+import asyncio
+import os
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+MCP_TOOLS_TTL = float(os.getenv("MCP_TOOLS_TTL", "300"))
+MCP_TOOLS_RETRY = float(os.getenv("MCP_TOOLS_RETRY", "15"))
+
+
+class ToolCatalog:
+    """Tool lists per server URL, fetched with an async fetch(url) callable"""
+
+    def __init__(self, fetch, ttl: float = MCP_TOOLS_TTL, retry: float = MCP_TOOLS_RETRY,
+                 clock=time.monotonic):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.retry = retry
+        self.clock = clock
+        self._entries = {}  # url -> (tools, fetched_at)
+        self._stale = set()
+        self._locks = {}
+        self.stats = {"hits": 0, "refreshes": 0, "invalidations": 0, "fallbacks": 0, "errors": 0}
+
+    def _fresh(self, url: str) -> bool:
+        entry = self._entries.get(url)
+        return entry is not None and url not in self._stale and self.clock() - entry[1] < self.ttl
+
+    def invalidate(self, url: str):
+        """The next get(url) fetches the catalog again"""
+        self._stale.add(url)
+        self.stats["invalidations"] += 1
+
+    async def get(self, url: str) -> list:
+        """
+        Returns:
+            The server's tools as [{"name", "description"}]
+        Raises:
+            The fetch error when the server never answered
+        """
+        if self._fresh(url):
+            self.stats["hits"] += 1
+            return self._entries[url][0]
+
+        lock = self._locks.setdefault(url, asyncio.Lock())
+        async with lock:
+            # Another caller refreshed it while this one waited
+            if self._fresh(url):
+                self.stats["hits"] += 1
+                return self._entries[url][0]
+            # An invalidation that arrives during the fetch is kept for the next get
+            self._stale.discard(url)
+            try:
+                tools = await self.fetch(url)
+            except Exception as e:
+                self.stats["errors"] += 1
+                if url not in self._entries:
+                    raise
+                self.stats["fallbacks"] += 1
+                print(f"⚠️ Tool catalog refresh failed ({url}), using the last known one: {e}")
+                tools = self._entries[url][0]
+                # Served for `retry` seconds before the next attempt, not refetched on every request
+                self._entries[url] = (tools, self.clock() - self.ttl + min(self.retry, self.ttl))
+                return tools
+            self._entries[url] = (tools, self.clock())
+            self.stats["refreshes"] += 1
+            return tools
+
+    def snapshot(self) -> dict:
+        now = self.clock()
+        stats = dict(self.stats, ttl=self.ttl)
+        stats["servers"] = {
+            url: {"tools": [tool["name"] for tool in tools], "age_s": round(now - fetched_at, 1),
+                  "stale": url in self._stale}
+            for url, (tools, fetched_at) in list(self._entries.items())
+        }
+        return stats
@@ -0,0 +1,159 @@
+import sys
+sys.path.append("..")
+
+from llama_index.core.schema import NodeWithScore, TextNode
+from sqlalchemy.sql import text
+from backend.models.db import DocumentEmbedding
+from backend.utils.bulk_writer import vector_to_text
+from backend.utils.db_connection import SessionLocal
+from backend.utils.db_schema import (
+    HNSW_EF_SEARCH,
+    QUANTIZATION_OVERFETCH,
+    TABLE_NAME,
+    VECTOR_QUANTIZATION,
+    ann_distance_sql,
+    apply_search_params,
+)
+from backend.utils.hybrid_search import search_hybrid_rows, text_search_available
+from backend.utils.query_cache import embed_query
+
+
+def _row_to_node(row) -> NodeWithScore:
+    """Builds the same NodeWithScore shape returned by a VectorStoreIndex retriever"""
+    node = TextNode(
+        text=row.text,
+        id_=row.chunk_id,
+        metadata={
+            "doc_id": row.doc_id,
+            "chunk_id": row.chunk_id,
+            "row_id": row.id,
+            # Position in the document, used to merge adjacent chunks (not in the mmap export)
+            "chunk_index": getattr(row, "chunk_index", None),
+        },
+    )
+    # pgvector returns cosine distance, the index retriever reports cosine similarity
+    return NodeWithScore(node=node, score=1.0 - float(row.distance))
+
+
+# Candidates come from the quantized index, the outer query re-ranks them
+# with the exact float32 cosine distance
+QUANTIZED_SEARCH_SQL = """
+SELECT id, doc_id, chunk_id, chunk_index, text, embedding <=> CAST(:embedding AS vector) AS distance
+FROM (
+    SELECT id, doc_id, chunk_id, chunk_index, text, embedding
+    FROM {table}
+    ORDER BY {ann_distance}
+    LIMIT :candidates
+) candidates
+ORDER BY distance
+LIMIT :top_k
+"""
+
+
+def search_quantized_chunks(query_embedding, top_k: int = 5, ef_search: int = None, probes: int = None,
+                            quantization: str = None):
+    """
+    Two-stage search: over-fetches top_k * QUANTIZATION_OVERFETCH candidates
+    from the halfvec/binary index and re-ranks them at full precision
+    (one SQL round trip)
+    """
+    candidates = top_k * QUANTIZATION_OVERFETCH
+    db = SessionLocal()
+    try:
+        # HNSW returns at most ef_search rows
+        apply_search_params(db, ef_search=max(ef_search or HNSW_EF_SEARCH or 40, candidates), probes=probes)
+        sql = QUANTIZED_SEARCH_SQL.format(table=TABLE_NAME, ann_distance=ann_distance_sql(quantization))
+        rows = db.execute(text(sql), {
+            "embedding": vector_to_text(query_embedding),
+            "candidates": candidates,
+            "top_k": top_k,
+        }).all()
+        return [_row_to_node(row) for row in rows]
+    finally:
+        db.close()
+
+
+def search_similar_chunks(query_embedding, top_k: int = 5, ef_search: int = None, probes: int = None,
+                          quantization: str = None):
+    """
+    Runs a single ANN query against document_embeddings
+    (ORDER BY embedding <=> :q LIMIT :k)
+    Args:
+        query_embedding: Query vector (768 dims)
+        top_k: Number of chunks to return
+        ef_search: HNSW ef_search for this query (optional)
+        probes: IVFFlat probes for this query (optional)
+        quantization: "none", "halfvec" or "binary" (defaults to VECTOR_QUANTIZATION)
+    Returns:
+        List of NodeWithScore ordered by similarity
+    """
+    quantization = quantization or VECTOR_QUANTIZATION
+    if quantization != "none":
+        return search_quantized_chunks(query_embedding, top_k, ef_search, probes, quantization)
+
+    db = SessionLocal()
+    try:
+        apply_search_params(db, ef_search=ef_search, probes=probes)
+        distance = DocumentEmbedding.embedding.cosine_distance(query_embedding)
+        rows = (
+            db.query(
+                DocumentEmbedding.id,
+                DocumentEmbedding.doc_id,
+                DocumentEmbedding.chunk_id,
+                DocumentEmbedding.chunk_index,
+                DocumentEmbedding.text,
+                distance.label("distance"),
+            )
+            .order_by(distance)
+            .limit(top_k)
+            .all()
+        )
+        return [_row_to_node(row) for row in rows]
+    finally:
+        db.close()
+
+
+def retrieve_chunks_pgvector(query: str, top_k: int = 5, **search_params):
+    """Embeds only the query (LRU cached) and delegates the similarity search to pgvector"""
+    query_embedding = embed_query(query)
+    return search_similar_chunks(query_embedding, top_k, **search_params)
+
+
+def search_hybrid_chunks(query: str, query_embedding, top_k: int = 5, **search_params):
+    """
+    Lexical + vector search fused with reciprocal-rank fusion (one SQL round trip)
+    Returns:
+        List of NodeWithScore in fused order. The score stays the cosine
+        similarity; the RRF score and the rank in each leg go to metadata.
+        Vector-only results while the text_search column does not exist
+    """
+    if not text_search_available():
+        return search_similar_chunks(query_embedding, top_k, **search_params)
+    nodes = []
+    for row in search_hybrid_rows(query, query_embedding, top_k, **search_params):
+        node = _row_to_node(row)
+        node.node.metadata.update({
+            "rrf_score": float(row.rrf_score),
+            "vector_rank": row.vector_rank,
+            "lexical_rank": row.lexical_rank,
+        })
+        nodes.append(node)
+    return nodes
+
+
+def retrieve_chunks_hybrid(query: str, top_k: int = 5, **search_params):
+    """Hybrid counterpart of retrieve_chunks_pgvector"""
+    query_embedding = embed_query(query)
+    return search_hybrid_chunks(query, query_embedding, top_k, **search_params)
+
+
+def retrieve_chunks_mmap(query: str, top_k: int = 5, **search_params):
+    """
+    Searches the memory-mapped export instead of Postgres (read replicas).
+    ANN parameters don't apply: the scan over the mapped matrix is exact
+    """
+    # Imported here: only the mmap replicas need it (POSIX file locking, numpy memmaps)
+    from backend.utils.mmap_index import get_mmap_index
+
+    query_embedding = embed_query(query)
+    return [_row_to_node(hit) for hit in get_mmap_index().search(query_embedding, top_k)]
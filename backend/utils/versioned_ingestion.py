@@ -0,0 +1,171 @@
+"""
+Versioned re-ingestion of a document keyed by a stable doc_id
+
+The new version is chunked and diffed against the stored chunks by content
+hash: unchanged chunks are kept (only their position is updated), removed
+chunks are deleted and only new chunks are embedded and inserted, batch by
+batch as the chunks arrive. Everything
+(including the invalidation of cached answers built from this document)
+happens in one transaction, serialized per doc_id.
+"""
+import sys
+import uuid
+from collections import defaultdict
+sys.path.append("..")
+
+from backend.utils.bulk_writer import INGEST_BATCH_SIZE, iter_batches, write_chunk_batches
+from backend.utils.db_connection import engine
+from backend.utils.embedding_cache import content_hash, embed_texts_cached
+
+
+class ChunkMatcher:
+    """
+    Matches the chunks of a new version, in document order, against the stored
+    rows with the same content hash. Works one chunk at a time, so a version
+    can be streamed without holding every chunk in memory
+    """
+
+    def __init__(self, existing: list):
+        """
+        Args:
+            existing: List of (row_id, content_hash, chunk_index) of the stored version
+        """
+        self.available = defaultdict(list)
+        for row_id, chunk_hash, _ in sorted(existing, key=lambda r: (r[2] is None, r[2], r[0])):
+            self.available[chunk_hash].append(row_id)
+
+    def match(self, chunk_hash: str):
+        """Returns the stored row id reused for this chunk, or None if it must be inserted"""
+        if self.available[chunk_hash]:
+            return self.available[chunk_hash].pop(0)
+        return None
+
+    def leftover(self) -> list:
+        """Row ids no chunk of the new version matched (to delete)"""
+        return [row_id for row_ids in self.available.values() for row_id in row_ids]
+
+
+def diff_chunks(existing: list, new_hashes: list) -> dict:
+    """
+    Matches stored chunks with the chunks of the new version
+    Args:
+        existing: List of (row_id, content_hash, chunk_index) of the stored version
+        new_hashes: Content hashes of the new version in document order
+    Returns:
+        Dict with:
+            keep: List of (row_id, new_index) for reused rows
+            delete: Row ids that are no longer in the document
+            insert: Positions in new_hashes that need a new row
+    """
+    matcher = ChunkMatcher(existing)
+    keep, insert = [], []
+    for position, chunk_hash in enumerate(new_hashes):
+        row_id = matcher.match(chunk_hash)
+        if row_id is None:
+            insert.append(position)
+        else:
+            keep.append((row_id, position))
+    return {"keep": keep, "delete": matcher.leftover(), "insert": insert}
+
+
+def ingest_document_version(nodes, doc_id: str, batch_size: int = None) -> dict:
+    """
+    Replaces the stored version of doc_id with the given chunk nodes
+    Args:
+        nodes: Chunk nodes of the new version (without embeddings), a list or
+            any iterable: a generator is consumed batch by batch
+        doc_id: Stable document key
+        batch_size: Chunks embedded and written per batch (defaults to INGEST_BATCH_SIZE)
+    Returns:
+        Stats dict with version, inserted, deleted and unchanged counts
+    """
+    batch_size = batch_size or INGEST_BATCH_SIZE
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        # Lock the version row so concurrent updates of the same document serialize
+        cursor.execute(
+            "INSERT INTO document_versions (doc_id, version, chunk_count) VALUES (%s, 0, 0) "
+            "ON CONFLICT (doc_id) DO NOTHING",
+            (doc_id,),
+        )
+        cursor.execute("SELECT version FROM document_versions WHERE doc_id = %s FOR UPDATE", (doc_id,))
+        version = cursor.fetchone()[0] + 1
+
+        cursor.execute(
+            "SELECT id, content_hash, chunk_index FROM document_embeddings WHERE doc_id = %s",
+            (doc_id,),
+        )
+        matcher = ChunkMatcher(cursor.fetchall())
+
+        keep, inserted, position = [], 0, 0
+        for batch in iter_batches(nodes, batch_size):
+            new_chunks = []
+            for node in batch:
+                chunk_hash = content_hash(node.text)
+                row_id = matcher.match(chunk_hash)
+                if row_id is None:
+                    new_chunks.append((node, chunk_hash, position))
+                else:
+                    keep.append((row_id, position))
+                position += 1
+
+            if new_chunks:
+                # Only chunks that are not stored yet are embedded
+                embeddings = embed_texts_cached([node.text for node, _, _ in new_chunks])
+                rows = (
+                    {
+                        "doc_id": doc_id,
+                        "chunk_id": node.node_id or str(uuid.uuid4()),
+                        "text": node.text,
+                        "embedding": embedding,
+                        "content_hash": chunk_hash,
+                        "chunk_index": chunk_position,
+                    }
+                    for (node, chunk_hash, chunk_position), embedding in zip(new_chunks, embeddings)
+                )
+                inserted += write_chunk_batches(cursor, rows, batch_size=batch_size)["rows"]
+
+        deleted = matcher.leftover()
+        if deleted:
+            cursor.execute("DELETE FROM document_embeddings WHERE id = ANY(%s)", (deleted,))
+
+        if keep:
+            from psycopg2.extras import execute_values
+
+            execute_values(
+                cursor,
+                "UPDATE document_embeddings AS d SET chunk_index = v.position "
+                "FROM (VALUES %s) AS v(id, position) "
+                "WHERE d.id = v.id AND d.chunk_index IS DISTINCT FROM v.position",
+                keep,
+                page_size=batch_size,
+            )
+
+        cursor.execute(
+            "UPDATE document_versions SET version = %s, chunk_count = %s, updated_at = now() WHERE doc_id = %s",
+            (version, position, doc_id),
+        )
+        # Cached answers built from the previous version are no longer valid
+        cursor.execute(
+            "DELETE FROM semantic_answer_cache WHERE doc_ids && ARRAY[%s]::varchar[]",
+            (doc_id,),
+        )
+        raw.commit()
+    except Exception as e:
+        raw.rollback()
+        print(f"❌ Error ingesting new version of {doc_id}: {e}")
+        raise e
+    finally:
+        raw.close()
+
+    stats = {
+        "doc_id": doc_id,
+        "version": version,
+        "inserted": inserted,
+        "deleted": len(deleted),
+        "unchanged": len(keep),
+    }
+    print(f"✅ Document {doc_id} v{version}: +{stats['inserted']} -{stats['deleted']} ={stats['unchanged']}")
+    return stats
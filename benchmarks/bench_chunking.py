@@ -0,0 +1,126 @@
+"""
+Benchmark of the Q/A-aware FAQ chunker against the fixed SentenceSplitter
+
+For every text in storage/ reports, per chunking mode:
+    chunks             rows that would be stored (and embedded)
+    chunk_seconds      chunking time
+    embed_seconds      embedding time of all chunks (--embed, uses the real model)
+    avg_chunk_tokens   estimated tokens per chunk
+    context_tokens     estimated tokens of the top-k context faq_query sends to Gemini
+    chunks_per_answer  chunks an answer of the document is spread over (FAQ documents)
+
+Usage:
+    python -m benchmarks.bench_chunking
+    python -m benchmarks.bench_chunking --embed --k 5
+
+Results are written to output/bench_chunking_<timestamp>.json
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.utils.faq_chunker import estimate_tokens, split_faq_units
+from backend.utils.llamaindex_utils import split_text_into_nodes
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def chunks_per_answer(text: str, chunks: list) -> float:
+    """Average number of chunks containing a piece of each answer"""
+    units = [unit for unit in split_faq_units(text) if unit.question and unit.answer]
+    if not units:
+        return None
+    normalized_chunks = [_normalize(chunk) for chunk in chunks]
+    counts = []
+    for unit in units:
+        # Answer sentences (or answer start) found in each chunk
+        fragments = [f for f in re.split(r"(?<=[.!?])\s+", unit.answer) if len(f) >= 12] or [unit.answer]
+        touched = {
+            i for i, chunk in enumerate(normalized_chunks)
+            for fragment in fragments if fragment[:40] in chunk
+        }
+        counts.append(max(len(touched), 1))
+    return round(sum(counts) / len(counts), 3)
+
+
+def benchmark_file(path: str, mode: str, k: int, embed: bool) -> dict:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+
+    start = time.perf_counter()
+    nodes = split_text_into_nodes(text, mode=mode)
+    chunk_seconds = time.perf_counter() - start
+    chunks = [node.text for node in nodes]
+
+    embed_seconds = None
+    if embed and chunks:
+        from backend.utils.embeddings import get_embed_model
+
+        start = time.perf_counter()
+        get_embed_model().get_text_embedding_batch(chunks)
+        embed_seconds = round(time.perf_counter() - start, 3)
+
+    tokens = [estimate_tokens(chunk) for chunk in chunks] or [0]
+    avg_tokens = sum(tokens) / len(tokens)
+    return {
+        "file": os.path.basename(path),
+        "mode": mode,
+        "chunks": len(chunks),
+        "chunk_seconds": round(chunk_seconds, 4),
+        "embed_seconds": embed_seconds,
+        "avg_chunk_tokens": round(avg_tokens, 1),
+        "max_chunk_tokens": max(tokens),
+        "context_tokens": round(avg_tokens * min(k, len(chunks)), 1),
+        "chunks_per_answer": chunks_per_answer(text, chunks),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAQ chunker vs SentenceSplitter")
+    parser.add_argument("--storage", default="storage/*.txt")
+    parser.add_argument("--modes", default="sentence,auto")
+    parser.add_argument("--k", type=int, default=5, help="Chunks faq_query puts in the prompt")
+    parser.add_argument("--embed", action="store_true", help="Also time embedding every chunk")
+    args = parser.parse_args()
+
+    if args.embed:
+        from backend.utils.embeddings import get_embed_model
+        get_embed_model()  # model load is not part of the measurement
+
+    results = []
+    for path in sorted(glob.glob(args.storage)):
+        for mode in args.modes.split(","):
+            result = benchmark_file(path, mode, args.k, args.embed)
+            print(f"📊 {result['file']} [{mode}]: {result['chunks']} chunks, "
+                  f"{result['avg_chunk_tokens']} tokens/chunk, context={result['context_tokens']} tokens, "
+                  f"chunks/answer={result['chunks_per_answer']}")
+            results.append(result)
+
+    totals = {}
+    for result in results:
+        total = totals.setdefault(result["mode"], {"chunks": 0, "chunk_seconds": 0.0, "embed_seconds": 0.0})
+        total["chunks"] += result["chunks"]
+        total["chunk_seconds"] = round(total["chunk_seconds"] + result["chunk_seconds"], 4)
+        total["embed_seconds"] = round(total["embed_seconds"] + (result["embed_seconds"] or 0.0), 3)
+    for mode, total in totals.items():
+        print(f"✅ {mode}: {total['chunks']} chunks, chunking {total['chunk_seconds']}s, embedding {total['embed_seconds']}s")
+
+    report = {"timestamp": datetime.now().isoformat(), "k": args.k, "totals": totals, "results": results}
+    os.makedirs("output", exist_ok=True)
+    output_path = os.path.join("output", f"bench_chunking_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results saved in: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark of the embedding backends: PyTorch vs ONNX Runtime vs ONNX int8
+
+Every backend runs in its own process (so memory is not shared between them)
+and embeds the same chunks of the documents in storage/. Reports, per backend
+and thread count:
+    load_seconds        model load time (ONNX export excluded, run `export` first)
+    sentences_per_sec   chunks embedded per second
+    rss_mb              resident memory after loading the model
+    peak_rss_mb         peak resident memory of the process
+    min_cosine          lowest cosine similarity against the PyTorch vectors
+
+Usage:
+    python -m benchmarks.bench_embedder_backends
+    python -m benchmarks.bench_embedder_backends --backends torch,onnx-int8 --threads 1,4 --samples 500
+
+Results are written to output/bench_embedder_backends_<timestamp>.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from datetime import datetime
+from importlib import metadata
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def run_backend(backend: str, threads: int, texts: list, batch_size: int, queue):
+    """Child process: load one backend, embed the texts and report timings and memory"""
+    os.environ["EMBED_BACKEND"] = backend
+    os.environ["EMBED_INTRA_OP_THREADS"] = str(threads)
+    import psutil
+    from backend.utils.embeddings import _load_embed_model
+
+    start = time.perf_counter()
+    model = _load_embed_model(backend)
+    load_seconds = time.perf_counter() - start
+    rss_mb = psutil.Process().memory_info().rss / 2**20
+
+    model.get_text_embedding_batch(texts[:batch_size])  # warm-up
+    start = time.perf_counter()
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        vectors.extend(model.get_text_embedding_batch(texts[i:i + batch_size]))
+    elapsed = time.perf_counter() - start
+
+    queue.put({
+        "backend": backend,
+        "threads": threads,
+        "load_seconds": round(load_seconds, 2),
+        "sentences_per_sec": round(len(texts) / elapsed, 1),
+        "rss_mb": round(rss_mb, 1),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "vectors": vectors,
+    })
+
+
+def measure(backend: str, threads: int, texts: list, batch_size: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=run_backend, args=(backend, threads, texts, batch_size, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def package_versions() -> dict:
+    """Installed versions of the export / inference toolchain, to compare runs"""
+    versions = {}
+    for package in ("torch", "transformers", "tokenizers", "onnx", "onnxruntime"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PyTorch vs ONNX embedding backends")
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--threads", default="0", help="Intra-op thread counts to try (0 = library default)")
+    parser.add_argument("--samples", type=int, default=300)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    from backend.utils.onnx_embedder import sample_texts
+
+    texts = sample_texts(args.samples)
+    print(f"📊 {len(texts)} chunks from storage/")
+
+    results, reference = [], None
+    for threads in [int(t) for t in args.threads.split(",")]:
+        for backend in args.backends.split(","):
+            result = measure(backend, threads, texts, args.batch_size)
+            vectors = np.array(result.pop("vectors"))
+            if backend == "torch":
+                reference = vectors
+            result["min_cosine"] = (
+                round(float((vectors * reference).sum(axis=1).min()), 5) if reference is not None else None
+            )
+            print(f"📊 {backend} threads={threads}: {result['sentences_per_sec']} sentences/s, "
+                  f"rss={result['rss_mb']}MB peak={result['peak_rss_mb']}MB, min_cosine={result['min_cosine']}")
+            results.append(result)
+
+    report = {"timestamp": datetime.now().isoformat(), "samples": len(texts),
+              "batch_size": args.batch_size, "versions": package_versions(), "results": results}
+    os.makedirs("output", exist_ok=True)
+    output_path = os.path.join("output", f"bench_embedder_backends_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results saved in: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
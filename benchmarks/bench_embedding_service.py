@@ -0,0 +1,109 @@
+"""
+Benchmark of the micro-batching embedding service under concurrent callers
+
+N client threads embed one query at a time (the RAG server pattern), first
+calling the model directly and then through the shared EmbeddingBatcher.
+Reports, per run:
+    embeddings_per_sec   throughput seen by the clients
+    latency p50/p95      per-call latency (ms)
+    queue_wait_ms        time spent waiting for a batch to be formed (batcher only)
+    avg_batch_size       texts per model call (batcher only)
+
+Usage:
+    python -m benchmarks.bench_embedding_service --clients 1,8,32 --requests 50
+    python -m benchmarks.bench_embedding_service --max-wait-ms 2 --max-batch 64
+
+Results are written to output/bench_embedding_service_<timestamp>.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.utils.embedding_service import EmbeddingBatcher
+from backend.utils.embeddings import encode_batch, get_embed_model
+
+
+def load_queries(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [item["query"] for item in json.load(f)]
+
+
+def run_clients(embed_one, queries: list, clients: int, requests: int) -> dict:
+    """Each client embeds `requests` queries sequentially"""
+    def client(offset):
+        latencies = []
+        for i in range(requests):
+            start = time.perf_counter()
+            embed_one(queries[(offset + i) % len(queries)])
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = [ms for result in pool.map(client, range(clients)) for ms in result]
+    elapsed = time.perf_counter() - start
+    return {
+        "clients": clients,
+        "embeddings": len(latencies),
+        "seconds": round(elapsed, 3),
+        "embeddings_per_sec": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(float(np.percentile(latencies, 50)), 2),
+            "p95": round(float(np.percentile(latencies, 95)), 2),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Direct model calls vs micro-batched embedding service")
+    parser.add_argument("--queries", default="benchmarks/data/faq_queries.json")
+    parser.add_argument("--clients", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=50, help="Queries embedded per client")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    get_embed_model()  # model load is not part of the measurement
+
+    results = []
+    for clients in [int(c) for c in args.clients.split(",")]:
+        direct = run_clients(lambda q: encode_batch([q], "query")[0], queries, clients, args.requests)
+        direct["mode"] = "direct"
+
+        batcher = EmbeddingBatcher(max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
+        batched = run_clients(lambda q: batcher.embed([q], "query")[0], queries, clients, args.requests)
+        service_stats = batcher.stats()
+        batched.update(mode="batched", queue_wait_ms=service_stats["queue_wait_ms"],
+                       avg_batch_size=service_stats["avg_batch_size"])
+
+        for result in (direct, batched):
+            print(f"📊 {result['mode']} x{clients}: {result['embeddings_per_sec']} emb/s, "
+                  f"p50={result['latency_ms']['p50']}ms p95={result['latency_ms']['p95']}ms")
+            results.append(result)
+        print(f"📊 batched x{clients}: avg_batch={service_stats['avg_batch_size']}, "
+              f"queue_wait={service_stats['queue_wait_ms']}")
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "max_batch_size": args.max_batch,
+        "max_wait_ms": args.max_wait_ms,
+        "results": results,
+    }
+    os.makedirs("output", exist_ok=True)
+    output_path = os.path.join("output", f"bench_embedding_service_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results saved in: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark of hybrid (full-text + vector, RRF) retrieval against vector-only
+
+Ingests the FAQ texts in storage/ as versioned documents (re-runs don't
+duplicate rows), then runs the labeled queries in benchmarks/data/faq_queries.json
+through both retrievers with the same query embedding and reports hit
+rate@k, MRR and latency (overall and per query kind: exact / semantic).
+
+A query counts as a hit when one of the top k chunks contains one of its
+expected strings.
+
+Usage:
+    python -m benchmarks.bench_hybrid_retrieval
+    python -m benchmarks.bench_hybrid_retrieval --skip-ingest --k 3 --repeat 5
+
+Results are written to output/bench_hybrid_retrieval_<timestamp>.json
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.utils.hybrid_search import HYBRID_CANDIDATES, HYBRID_RRF_K
+from backend.utils.llamaindex_utils import update_document_version
+from backend.utils.query_cache import embed_query
+from backend.utils.vector_search import search_hybrid_chunks, search_similar_chunks
+from benchmarks.stats import latency_summary
+
+DEFAULT_QUERIES = os.path.join(os.path.dirname(__file__), "data", "faq_queries.json")
+
+
+def ingest_storage(pattern: str):
+    for path in sorted(glob.glob(pattern)):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            content = f.read()
+        update_document_version(content, f"bench:{os.path.basename(path)}")
+
+
+def first_hit_rank(nodes: list, expected: list):
+    """1-based rank of the first chunk containing an expected string, or None"""
+    expected = [e.lower() for e in expected]
+    for rank, node in enumerate(nodes, start=1):
+        chunk = re.sub(r"\s+", " ", node.text).lower()
+        if any(e in chunk for e in expected):
+            return rank
+    return None
+
+
+def score(ranks: list, k: int) -> dict:
+    hits = [r for r in ranks if r is not None and r <= k]
+    return {
+        f"hit_rate@{k}": round(len(hits) / len(ranks), 4),
+        "mrr": round(sum(1.0 / r for r in hits) / len(ranks), 4),
+    }
+
+
+def run_retriever(name: str, search, queries: list, embeddings: list, k: int, repeat: int) -> dict:
+    ranks, latencies, by_kind = [], [], {}
+    for item, embedding in zip(queries, embeddings):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            nodes = search(item["query"], embedding, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        rank = first_hit_rank(nodes, item["expected"])
+        ranks.append(rank)
+        by_kind.setdefault(item.get("kind", "all"), []).append(rank)
+        if rank is None:
+            print(f"   [{name}] miss: {item['query']}")
+
+    result = {"retriever": name, **score(ranks, k), **latency_summary(latencies)}
+    result["by_kind"] = {kind: score(kind_ranks, k) for kind, kind_ranks in by_kind.items()}
+    print(f"✅ {name}: hit_rate@{k}={result[f'hit_rate@{k}']:.3f} mrr={result['mrr']:.3f} "
+          f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hybrid vs vector-only retrieval benchmark")
+    parser.add_argument("--storage", default="storage/*.txt")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per query")
+    parser.add_argument("--skip-ingest", action="store_true")
+    args = parser.parse_args()
+
+    if not args.skip_ingest:
+        print("🔄 Ingesting storage/ documents...")
+        ingest_storage(args.storage)
+
+    with open(args.queries, "r", encoding="utf-8") as f:
+        queries = json.load(f)
+    # Embeddings are computed once so both retrievers are timed on SQL alone
+    embeddings = [embed_query(item["query"]) for item in queries]
+
+    retrievers = {
+        "vector": lambda query, embedding, k: search_similar_chunks(embedding, k),
+        "hybrid": lambda query, embedding, k: search_hybrid_chunks(query, embedding, k),
+    }
+    # Warm-up so the first timed retriever doesn't pay for cold caches
+    for search in retrievers.values():
+        search(queries[0]["query"], embeddings[0], args.k)
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "k": args.k,
+        "queries": len(queries),
+        "hybrid_candidates": HYBRID_CANDIDATES,
+        "rrf_k": HYBRID_RRF_K,
+        "results": [
+            run_retriever(name, search, queries, embeddings, args.k, args.repeat)
+            for name, search in retrievers.items()
+        ],
+    }
+
+    os.makedirs("output", exist_ok=True)
+    output_path = os.path.join("output", f"bench_hybrid_retrieval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"✅ Results saved in: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
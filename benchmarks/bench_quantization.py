@@ -0,0 +1,172 @@
+"""
+Benchmark of quantized ANN indexes (float32 / halfvec / binary) with exact re-ranking
+
+Loads synthetic clustered 768-dim vectors into the bench_vectors scratch
+table and, for each quantization mode, builds the expression index used by
+backend.utils.db_schema and reports index size, build time, recall@k
+against exact search and latency of the two-stage query (quantized ANN
+candidates re-ranked with the float32 cosine distance).
+
+Synthetic vectors are zero-centered; real e5 embeddings are not, so binary
+recall on production data is usually lower and needs a higher --overfetch.
+
+Usage:
+    python -m benchmarks.bench_quantization --sizes 10000,100000
+    python -m benchmarks.bench_quantization --sizes 100000 --index ivfflat --overfetch 4,8,16
+
+Results are written to output/bench_quantization_<timestamp>.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy.sql import text
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.utils.db_connection import engine
+from backend.utils.db_schema import QUANTIZED_EXPRESSIONS, _index_ddl, ann_distance_sql, recommended_ivfflat_lists
+from benchmarks.bench_vector_index import (
+    BENCH_TABLE,
+    DIM,
+    load_table,
+    recall_at_k,
+    synthetic_vectors,
+    vector_literal,
+)
+from benchmarks.stats import latency_summary
+
+EXACT_SQL = f"SELECT id FROM {BENCH_TABLE} ORDER BY embedding <=> CAST(:embedding AS vector) LIMIT :top_k"
+RERANK_SQL = f"""
+SELECT id FROM (
+    SELECT id, embedding FROM {BENCH_TABLE} ORDER BY {{ann_distance}} LIMIT :candidates
+) candidates
+ORDER BY embedding <=> CAST(:embedding AS vector)
+LIMIT :top_k
+"""
+
+
+def run_queries(queries: np.ndarray, sql: str, params: dict, settings: list) -> tuple:
+    """Returns (ids per query, latencies in ms) running each query in its own transaction"""
+    results, latencies = [], []
+    with engine.connect() as connection:
+        for query in queries:
+            transaction = connection.begin()
+            for setting in settings:
+                connection.execute(text(setting))
+            start = time.perf_counter()
+            rows = connection.execute(text(sql), {"embedding": vector_literal(query), **params}).all()
+            latencies.append((time.perf_counter() - start) * 1000)
+            transaction.rollback()
+            results.append([row.id for row in rows])
+    return results, latencies
+
+
+def build_quantized_index(index_type: str, quantization: str, n: int) -> dict:
+    name = f"ix_{BENCH_TABLE}_{quantization}_{index_type}"
+    ddl = _index_ddl(index_type, name, lists=recommended_ivfflat_lists(n), quantization=quantization,
+                     table=BENCH_TABLE)
+    with engine.connect() as connection:
+        start = time.perf_counter()
+        connection.execute(text(ddl))
+        connection.execute(text(f"ANALYZE {BENCH_TABLE}"))
+        connection.commit()
+        build_seconds = time.perf_counter() - start
+        index_bytes = connection.execute(text("SELECT pg_relation_size(CAST(:name AS regclass))"), {"name": name}).scalar()
+    return {"name": name, "build_seconds": round(build_seconds, 2), "index_bytes": index_bytes}
+
+
+def drop_index(name: str):
+    with engine.connect() as connection:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        connection.commit()
+
+
+def benchmark_size(n: int, index_type: str, k: int, query_count: int, overfetch_values: list,
+                   knob_value: int) -> dict:
+    print(f"🔄 Loading {n} vectors...")
+    vectors = synthetic_vectors(n)
+    load_table(vectors)
+    with engine.connect() as connection:
+        table_bytes = connection.execute(text(f"SELECT pg_table_size('{BENCH_TABLE}')")).scalar()
+
+    rng = np.random.default_rng(7)
+    queries = vectors[rng.integers(0, n, query_count)] + 0.05 * rng.standard_normal((query_count, DIM)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact, exact_latencies = run_queries(queries, EXACT_SQL, {"top_k": k}, ["SET LOCAL enable_indexscan = off"])
+
+    knob = "hnsw.ef_search" if index_type == "hnsw" else "ivfflat.probes"
+    modes = []
+    for quantization in QUANTIZED_EXPRESSIONS:
+        index = build_quantized_index(index_type, quantization, n)
+        print(f"✅ {quantization}: {index['name']} {index['index_bytes'] / 1024 ** 2:.1f}MB "
+              f"built in {index['build_seconds']}s")
+        runs = []
+        for overfetch in (overfetch_values if quantization != "none" else [1]):
+            candidates = k * overfetch
+            # HNSW returns at most ef_search rows
+            value = max(knob_value, candidates) if index_type == "hnsw" else knob_value
+            sql = RERANK_SQL.format(ann_distance=ann_distance_sql(quantization))
+            approximate, latencies = run_queries(
+                queries, sql, {"candidates": candidates, "top_k": k}, [f"SET LOCAL {knob} = {value}"]
+            )
+            run = {"overfetch": overfetch, knob: value,
+                   f"recall@{k}": round(recall_at_k(approximate, exact, k), 4), **latency_summary(latencies)}
+            print(f"   overfetch={overfetch}: recall@{k}={run[f'recall@{k}']:.3f} "
+                  f"p50={run['p50_ms']}ms p95={run['p95_ms']}ms")
+            runs.append(run)
+        drop_index(index["name"])
+        modes.append({
+            "quantization": quantization,
+            **index,
+            "index_bytes_per_row": round(index["index_bytes"] / n, 1),
+            "runs": runs,
+        })
+
+    return {
+        "rows": n,
+        "index": index_type,
+        "table_bytes": table_bytes,
+        "exact_search": latency_summary(exact_latencies),
+        "modes": modes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index size / recall / latency of quantized pgvector indexes")
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--index", choices=["hnsw", "ivfflat"], default="hnsw")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--overfetch", default="2,4,8,16", help="Candidates per requested row to re-rank")
+    parser.add_argument("--knob", type=int, default=None, help="ef_search (hnsw, default 40) or probes (ivfflat, default 10)")
+    args = parser.parse_args()
+
+    knob_value = args.knob or (40 if args.index == "hnsw" else 10)
+    overfetch_values = [int(v) for v in args.overfetch.split(",")]
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "results": [
+            benchmark_size(int(n), args.index, args.k, args.queries, overfetch_values, knob_value)
+            for n in args.sizes.split(",")
+        ],
+    }
+
+    with engine.connect() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+        connection.commit()
+
+    os.makedirs("output", exist_ok=True)
+    output_path = os.path.join("output", f"bench_quantization_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results saved in: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Retrieval quality and latency suite over the storage/ corpus
+
+Ingests the FAQ texts in storage/ (optionally scaled up with --scale: extra
+copies with their Q/A units shuffled) as versioned "bench:" documents, then
+runs the labeled queries in benchmarks/data/faq_queries.json through
+retrieve_chunks with every selected retriever and reports:
+    recall@k        share of queries with an expected string in the top k chunks
+    mrr             mean reciprocal rank of the first relevant chunk
+    p50/p95/p99     sequential latency per query (ms, query embedding cached)
+    qps             throughput with N concurrent clients (--clients)
+    peak_rss_mb     peak resident memory of the process after each retriever
+
+Runs offline: with --embedder auto the real model is used only when it is
+already in the HuggingFace cache, otherwise EMBED_BACKEND=hashing (a
+deterministic local embedder) is selected. Hashing vectors must not be mixed
+with e5 vectors, so that mode refuses to run on a database holding
+non-benchmark documents unless --allow-mixed is given: point backend.config
+at a scratch database.
+
+Retrievers: pgvector, hybrid, mmap (exports the memory-mapped index first)
+and rerank (pgvector candidates re-ranked by the cross-encoder).
+
+Usage:
+    python -m benchmarks.bench_retrieval_suite
+    python -m benchmarks.bench_retrieval_suite --embedder hashing --scale 20 --retrievers pgvector,hybrid,mmap
+    python -m benchmarks.bench_retrieval_suite --skip-ingest --clients 1,8,32 --qps-seconds 20
+
+Results are written to output/bench_retrieval_suite_<timestamp>.json
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stats import latency_summary
+
+DEFAULT_QUERIES = os.path.join(os.path.dirname(__file__), "data", "faq_queries.json")
+DEFAULT_MODEL = "intfloat/e5-base-v2"
+RETRIEVAL_PERCENTILES = (50, 95, 99)
+
+
+def model_is_cached(model_name: str) -> bool:
+    try:
+        from huggingface_hub import try_to_load_from_cache
+
+        return isinstance(try_to_load_from_cache(model_name, "config.json"), str)
+    except Exception:
+        return False
+
+
+def select_embedder(choice: str) -> str:
+    """Sets EMBED_BACKEND before any backend module is imported"""
+    if choice == "auto":
+        choice = "model" if model_is_cached(os.getenv("EMBED_MODEL_NAME", DEFAULT_MODEL)) else "hashing"
+    if choice == "hashing":
+        os.environ["EMBED_BACKEND"] = "hashing"
+    else:
+        # The model is in the local cache, never reach the network
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    return choice
+
+
+@contextmanager
+def quiet():
+    """retrieve_chunks prints every result, keep that out of the timings"""
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        yield
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def scaled_texts(text: str, copies: int) -> list:
+    """The original text plus copies with their Q/A units in a different order"""
+    from backend.utils.faq_chunker import split_faq_units
+
+    texts = [text]
+    units = split_faq_units(text)
+    for copy in range(1, copies):
+        shuffled = list(units)
+        random.Random(copy).shuffle(shuffled)
+        texts.append("\n\n".join(f"{unit.question}\n{unit.answer}".strip() for unit in shuffled))
+    return texts
+
+
+def ingest_corpus(pattern: str, scale: int) -> int:
+    from backend.utils.llamaindex_utils import update_document_version
+
+    documents = 0
+    for path in sorted(glob.glob(pattern)):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            content = f.read()
+        for copy, text in enumerate(scaled_texts(content, scale)):
+            suffix = f":{copy}" if copy else ""
+            update_document_version(text, f"bench:{os.path.basename(path)}{suffix}")
+            documents += 1
+    return documents
+
+
+def corpus_counts() -> dict:
+    from sqlalchemy.sql import text
+    from backend.utils.db_connection import engine
+
+    with engine.connect() as connection:
+        row = connection.execute(text(
+            "SELECT count(*) FILTER (WHERE doc_id LIKE 'bench:%'), count(*) FILTER (WHERE doc_id NOT LIKE 'bench:%') "
+            "FROM document_embeddings"
+        )).one()
+    return {"bench_chunks": row[0], "other_chunks": row[1]}
+
+
+def build_retrievers(names: list) -> dict:
+    from backend.utils.llamaindex_utils import retrieve_chunks
+
+    retrievers = {}
+    for name in names:
+        if name in ("pgvector", "hybrid"):
+            retrievers[name] = lambda query, k, mode=name: retrieve_chunks(query, k, mode=mode)
+        elif name == "mmap":
+            from backend.utils.mmap_index import build_generation, get_mmap_index
+
+            build_generation()
+            get_mmap_index().refresh(force=True)
+            retrievers[name] = lambda query, k: retrieve_chunks(query, k, mode="mmap")
+        elif name == "rerank":
+            from backend.utils.reranker import RERANK_CANDIDATES, get_reranker, rerank
+
+            get_reranker()
+
+            def reranked(query, k):
+                candidates = retrieve_chunks(query, max(k, RERANK_CANDIDATES), mode="pgvector")
+                ranking, _ = rerank(query, [node.text for node in candidates], k)
+                return [candidates[position] for position, _ in ranking]
+
+            retrievers[name] = reranked
+        else:
+            raise ValueError(f"Unknown retriever: {name}")
+    return retrievers
+
+
+def evaluate(name: str, retrieve, queries: list, ks: list, repeat: int) -> dict:
+    from benchmarks.bench_hybrid_retrieval import first_hit_rank
+
+    max_k = max(ks)
+    ranks, latencies = [], []
+    with quiet():
+        retrieve(queries[0]["query"], max_k)  # warm-up (model, caches, connections)
+        for item in queries:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                nodes = retrieve(item["query"], max_k)
+                latencies.append((time.perf_counter() - start) * 1000)
+            ranks.append(first_hit_rank(nodes, item["expected"]))
+
+    result = {"retriever": name}
+    for k in ks:
+        result[f"recall@{k}"] = round(sum(1 for r in ranks if r is not None and r <= k) / len(ranks), 4)
+    result["mrr"] = round(sum(1.0 / r for r in ranks if r is not None) / len(ranks), 4)
+    result.update(latency_summary(latencies, RETRIEVAL_PERCENTILES))
+    result["misses"] = [item["query"] for item, rank in zip(queries, ranks) if rank is None]
+    return result
+
+
+def measure_qps(retrieve, queries: list, clients: int, k: int, seconds: float) -> dict:
+    """Each client loops over the queries until the time is up"""
+    deadline = time.perf_counter() + seconds
+
+    def client(offset):
+        latencies, i = [], offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            retrieve(queries[i % len(queries)]["query"], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            i += 1
+        return latencies
+
+    start = time.perf_counter()
+    with quiet(), ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = [ms for result in pool.map(client, range(clients)) for ms in result]
+    elapsed = time.perf_counter() - start
+    return {"clients": clients, "requests": len(latencies),
+            "qps": round(len(latencies) / elapsed, 1), **latency_summary(latencies, RETRIEVAL_PERCENTILES)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality / latency suite")
+    parser.add_argument("--storage", default="storage/*.txt")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES)
+    parser.add_argument("--scale", type=int, default=1, help="Copies of each document to ingest")
+    parser.add_argument("--retrievers", default="pgvector,hybrid")
+    parser.add_argument("--ks", default="1,3,5,10")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed sequential runs per query")
+    parser.add_argument("--clients", default="1,4,16", help="Concurrent clients for the QPS runs")
+    parser.add_argument("--qps-seconds", type=float, default=10.0)
+    parser.add_argument("--embedder", choices=["auto", "model", "hashing"], default="auto")
+    parser.add_argument("--skip-ingest", action="store_true")
+    parser.add_argument("--allow-mixed", action="store_true",
+                        help="Run with the hashing embedder even if the table holds other documents")
+    args = parser.parse_args()
+
+    embedder = select_embedder(args.embedder)
+    from backend.utils.embeddings import EMBED_BACKEND, EMBED_MODEL_NAME
+
+    if embedder == "hashing" and EMBED_BACKEND != "hashing":
+        print(f"❌ EMBED_BACKEND={EMBED_BACKEND} in .env overrides the hashing embedder, remove it to run offline")
+        sys.exit(1)
+    print(f"📊 Embedder: {EMBED_BACKEND} ({EMBED_MODEL_NAME})")
+
+    counts = corpus_counts()
+    if EMBED_BACKEND == "hashing" and counts["other_chunks"] and not args.allow_mixed:
+        print(f"❌ document_embeddings holds {counts['other_chunks']} non-benchmark chunks embedded with "
+              f"another model; use a scratch database or --allow-mixed")
+        sys.exit(1)
+
+    if not args.skip_ingest:
+        print(f"🔄 Ingesting storage/ documents (scale x{args.scale})...")
+        start = time.perf_counter()
+        documents = ingest_corpus(args.storage, args.scale)
+        print(f"✅ {documents} documents ingested in {time.perf_counter() - start:.1f}s")
+        counts = corpus_counts()
+
+    with open(args.queries, "r", encoding="utf-8") as f:
+        queries = json.load(f)
+    ks = [int(k) for k in args.ks.split(",")]
+    clients = [int(c) for c in args.clients.split(",")]
+
+    results = []
+    for name, retrieve in build_retrievers(args.retrievers.split(",")).items():
+        result = evaluate(name, retrieve, queries, ks, args.repeat)
+        result["load"] = [measure_qps(retrieve, queries, n, max(ks), args.qps_seconds) for n in clients]
+        result["peak_rss_mb"] = peak_rss_mb()
+        recalls = " ".join(f"recall@{k}={result[f'recall@{k}']:.3f}" for k in ks)
+        print(f"✅ {name}: {recalls} mrr={result['mrr']:.3f} "
+              f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms")
+        for load in result["load"]:
+            print(f"   {load['clients']} clients: {load['qps']} qps, p95={load['p95_ms']}ms")
+        results.append(result)
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "embedder": {"backend": EMBED_BACKEND, "model": EMBED_MODEL_NAME},
+        "scale": args.scale,
+        "corpus": counts,
+        "queries": len(queries),
+        "ks": ks,
+        "repeat": args.repeat,
+        "qps_seconds": args.qps_seconds,
+        "results": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    os.makedirs("output", exist_ok=True)
+    output_path = os.path.join("output", f"bench_retrieval_suite_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"✅ Results saved in: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark of pgvector ANN indexes (HNSW / IVFFlat) against exact search
+
+Loads synthetic clustered 768-dim vectors into a scratch table for each size,
+builds the index and reports recall@k against an exact (sequential scan)
+search plus query latency for several ef_search / probes values.
+
+Usage:
+    python -m benchmarks.bench_vector_index --sizes 10000,100000,1000000 --index hnsw
+    python -m benchmarks.bench_vector_index --sizes 10000 --index ivfflat --probes 1,10,40
+
+Results are written to output/bench_vector_index_<timestamp>.json
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy.sql import text
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.utils.db_connection import engine
+from backend.utils.db_schema import HNSW_M, HNSW_EF_CONSTRUCTION, recommended_ivfflat_lists
+from benchmarks.stats import latency_summary
+
+DIM = 768
+BENCH_TABLE = "bench_vectors"
+
+
+def synthetic_vectors(n: int, seed: int = 42, clusters: int = 256) -> np.ndarray:
+    """Clustered unit vectors, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, DIM)).astype(np.float32)
+    assignments = rng.integers(0, clusters, n)
+    vectors = centers[assignments] + 0.35 * rng.standard_normal((n, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def vector_literal(vector) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+def load_table(vectors: np.ndarray, batch_size: int = 10000):
+    """Recreates the scratch table and streams the vectors with COPY"""
+    with engine.connect() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+        connection.execute(text(f"CREATE TABLE {BENCH_TABLE} (id bigserial PRIMARY KEY, embedding vector({DIM}))"))
+        connection.commit()
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for start in range(0, len(vectors), batch_size):
+            buffer = io.StringIO()
+            for vector in vectors[start:start + batch_size]:
+                buffer.write(vector_literal(vector) + "\n")
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {BENCH_TABLE} (embedding) FROM STDIN", buffer)
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def build_index(index_type: str, n: int) -> float:
+    if index_type == "hnsw":
+        params = f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}"
+    else:
+        params = f"lists = {recommended_ivfflat_lists(n)}"
+    start = time.perf_counter()
+    with engine.connect() as connection:
+        connection.execute(text(
+            f"CREATE INDEX ON {BENCH_TABLE} USING {index_type} (embedding vector_cosine_ops) WITH ({params})"
+        ))
+        connection.execute(text(f"ANALYZE {BENCH_TABLE}"))
+        connection.commit()
+    return time.perf_counter() - start
+
+
+def run_queries(queries: np.ndarray, k: int, settings: list) -> tuple:
+    """Returns (ids per query, latencies in ms) running each query in its own transaction"""
+    results, latencies = [], []
+    with engine.connect() as connection:
+        for query in queries:
+            transaction = connection.begin()
+            for setting in settings:
+                connection.execute(text(setting))
+            start = time.perf_counter()
+            rows = connection.execute(
+                text(f"SELECT id FROM {BENCH_TABLE} ORDER BY embedding <=> CAST(:q AS vector) LIMIT :k"),
+                {"q": vector_literal(query), "k": k},
+            ).all()
+            latencies.append((time.perf_counter() - start) * 1000)
+            transaction.rollback()
+            results.append([row.id for row in rows])
+    return results, latencies
+
+
+def recall_at_k(approximate: list, exact: list, k: int) -> float:
+    hits = sum(len(set(a[:k]) & set(e[:k])) for a, e in zip(approximate, exact))
+    return hits / (k * len(exact))
+
+
+def benchmark_size(n: int, index_type: str, k: int, query_count: int, knob_values: list) -> dict:
+    print(f"🔄 Loading {n} vectors...")
+    vectors = synthetic_vectors(n)
+    load_table(vectors)
+
+    # Queries are perturbed copies of stored vectors, like paraphrased questions
+    rng = np.random.default_rng(7)
+    queries = vectors[rng.integers(0, n, query_count)] + 0.05 * rng.standard_normal((query_count, DIM)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact, exact_latencies = run_queries(queries, k, ["SET LOCAL enable_indexscan = off"])
+    build_seconds = build_index(index_type, n)
+    print(f"✅ {index_type} index built in {build_seconds:.1f}s")
+
+    knob = "hnsw.ef_search" if index_type == "hnsw" else "ivfflat.probes"
+    runs = []
+    for value in knob_values:
+        approximate, latencies = run_queries(queries, k, [f"SET LOCAL {knob} = {int(value)}"])
+        run = {knob: value, f"recall@{k}": round(recall_at_k(approximate, exact, k), 4), **latency_summary(latencies)}
+        print(f"   {knob}={value}: recall@{k}={run[f'recall@{k}']:.3f} p50={run['p50_ms']}ms p95={run['p95_ms']}ms")
+        runs.append(run)
+
+    return {
+        "rows": n,
+        "index": index_type,
+        "build_seconds": round(build_seconds, 2),
+        "exact_search": latency_summary(exact_latencies),
+        "runs": runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/latency benchmark for pgvector ANN indexes")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--index", choices=["hnsw", "ivfflat"], default="hnsw")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--ef-search", default="20,40,100,200", help="HNSW ef_search values to sweep")
+    parser.add_argument("--probes", default="1,5,10,40", help="IVFFlat probes values to sweep")
+    args = parser.parse_args()
+
+    knob_values = [int(v) for v in (args.ef_search if args.index == "hnsw" else args.probes).split(",")]
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "results": [
+            benchmark_size(int(n), args.index, args.k, args.queries, knob_values)
+            for n in args.sizes.split(",")
+        ],
+    }
+
+    with engine.connect() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+        connection.commit()
+
+    os.makedirs("output", exist_ok=True)
+    output_path = os.path.join("output", f"bench_vector_index_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results saved in: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
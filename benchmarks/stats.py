@@ -0,0 +1,18 @@
+"""
+Summary statistics shared by the benchmark scripts
+"""
+import numpy as np
+
+
+def latency_summary(latencies: list, percentiles: tuple = (50, 95)) -> dict:
+    """
+    Args:
+        latencies: Per-query latencies in milliseconds
+        percentiles: Percentiles to report, as p<N>_ms keys
+    Returns:
+        {"p50_ms": ..., "p95_ms": ..., "mean_ms": ...} rounded to microseconds
+    """
+    values = np.array(latencies)
+    summary = {f"p{p}_ms": round(float(np.percentile(values, p)), 3) for p in percentiles}
+    summary["mean_ms"] = round(float(values.mean()), 3)
+    return summary
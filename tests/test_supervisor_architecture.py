@@ -334,10 +334,10 @@ def test_end_to_end_chat_with_sentiment_server(monkeypatch):
         assert _wait_for_port("127.0.0.1", 8080, timeout_seconds=30), "Sentiment MCP server no arranco a tiempo"
 
         # 2) Mockear clasificacion del supervisor para ir directo a sentiment_agent
-        monkeypatch.setattr(
-            "backend.supervisor.agent_supervisor.classify_with_gemini",
-            lambda user_input: "sentiment_agent",
-        )
+        async def fake_classify(user_input):
+            return "sentiment_agent"
+
+        monkeypatch.setattr("backend.supervisor.agent_supervisor.aclassify_with_gemini", fake_classify)
 
         # 3) Mockear cadena LLM del sentiment_agent (seleccion de tool y respuesta final)
         class FakeChain:
@@ -350,13 +350,19 @@ def test_end_to_end_chat_with_sentiment_server(monkeypatch):
             def invoke(self, *args, **kwargs):
                 return "respuesta simulada sin tildes"
 
+            async def arun(self, *args, **kwargs):
+                return self.run(*args, **kwargs)
+
+            async def ainvoke(self, *args, **kwargs):
+                return self.invoke(*args, **kwargs)
+
         monkeypatch.setattr("backend.agents.sentiment_agent.LLMChain", FakeChain)
 
         # 4) Opcional: evitar loops, devolver guardrail tras ejecutar sentiment
-        monkeypatch.setattr(
-            "backend.supervisor.agent_supervisor.supervise_agent_response",
-            lambda original_input, current_agent, agent_response, messages=None, executed_agents=None: "guardrail",
-        )
+        async def fake_supervise(original_input, current_agent, agent_response, messages=None, executed_agents=None):
+            return "guardrail"
+
+        monkeypatch.setattr("backend.supervisor.agent_supervisor.asupervise_agent_response", fake_supervise)
 
         # 5) Invocar API del backend con TestClient
         from backend.main import app as fastapi_app
@@ -375,4 +381,86 @@ def test_end_to_end_chat_with_sentiment_server(monkeypatch):
             sentiment_proc.terminate()
             sentiment_proc.wait(timeout=10)
         except Exception:
-            sentiment_proc.kill()
\ No newline at end of file
+            sentiment_proc.kill()
+
+def test_concurrent_send_requests_overlap(monkeypatch):
+    """
+    Varias llamadas concurrentes a /chat/send deben solaparse: la lectura del historial
+    (consulta sincrona a Postgres) corre en un hilo y no bloquea el event loop
+    """
+    import threading
+    import httpx
+    from fastapi import FastAPI
+    from backend.api import chat_routes
+    from backend.utils.db_chat_history import SQLAlchemyChatMessageHistory
+
+    requests_count, db_seconds = 8, 0.2
+    active = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    def slow_get_messages(self):
+        with lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        time.sleep(db_seconds)
+        with lock:
+            active["now"] -= 1
+        return []
+
+    async def noop(*args, **kwargs):
+        return None
+
+    async def fake_classify(user_input):
+        return "rag_agent", "test"
+
+    async def fake_tools():
+        return [{"name": "faq_query", "description": "FAQ"}]
+
+    async def fake_execute(tool_name, arguments):
+        return "contexto recuperado"
+
+    async def fake_supervise(*args, **kwargs):
+        return "guardrail"
+
+    async def fake_guardrail(state):
+        return {**state, "final_output": f"respuesta a {state['input']}"}
+
+    class FakeChain:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        async def arun(self, *args, **kwargs):
+            return "faq_query"
+
+        async def ainvoke(self, *args, **kwargs):
+            return {"text": "respuesta simulada"}
+
+    monkeypatch.setattr(SQLAlchemyChatMessageHistory, "get_messages", slow_get_messages)
+    monkeypatch.setattr(chat_routes, "ainsert_chat_session", noop)
+    monkeypatch.setattr(chat_routes, "asave_message", noop)
+    monkeypatch.setattr("backend.supervisor.graph_builder.aclassify_intent", fake_classify)
+    monkeypatch.setattr("backend.supervisor.graph_builder.asupervise_agent_response", fake_supervise)
+    monkeypatch.setattr("backend.supervisor.graph_builder.apply_toxic_guardrail_and_store", fake_guardrail)
+    monkeypatch.setattr("backend.agents.rag_agent.get_available_tools", fake_tools)
+    monkeypatch.setattr("backend.agents.rag_agent.execute_tool", fake_execute)
+    monkeypatch.setattr("backend.agents.rag_agent.LLMChain", FakeChain)
+
+    fastapi_app = FastAPI()
+    fastapi_app.include_router(chat_routes.router)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=fastapi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*[
+                client.post("/chat/send", json={"message": f"pregunta {i}", "session_id": f"s-{i}"})
+                for i in range(requests_count)
+            ])
+
+    start = time.perf_counter()
+    responses = asyncio.run(scenario())
+    elapsed = time.perf_counter() - start
+
+    assert all(response.status_code == 200 for response in responses)
+    assert responses[3].json()["response"] == "respuesta a pregunta 3"
+    assert active["max"] > 1
+    assert elapsed < requests_count * db_seconds
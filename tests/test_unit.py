@@ -381,5 +381,766 @@ class TestPerformance:
         assert response_time < 1, f"Tiempo de respuesta muy alto: {response_time:.4f}s"
 
 
+class TestVectorIndexUnits:
+    """Tests unitarios para la gestion de indices ANN"""
+
+    def test_index_ddl(self):
+        """Test del DDL generado para HNSW e IVFFlat"""
+        from backend.utils.db_schema import _index_ddl
+
+        hnsw_ddl = _index_ddl("hnsw", "ix_test")
+        assert "USING hnsw (embedding vector_cosine_ops)" in hnsw_ddl
+        assert "ef_construction" in hnsw_ddl
+
+        ivfflat_ddl = _index_ddl("ivfflat", "ix_test", lists=50, concurrently=True)
+        assert "CONCURRENTLY" in ivfflat_ddl
+        assert "lists = 50" in ivfflat_ddl
+
+        with pytest.raises(ValueError):
+            _index_ddl("flat", "ix_test")
+
+    def test_quantized_index_ddl(self):
+        """Test del DDL y la expresion de distancia para indices cuantizados"""
+        from backend.utils.db_schema import _index_ddl, ann_distance_sql, index_name
+
+        halfvec_ddl = _index_ddl("hnsw", "ix_test", quantization="halfvec")
+        assert "((embedding::halfvec(768)) halfvec_cosine_ops)" in halfvec_ddl
+        binary_ddl = _index_ddl("hnsw", "ix_test", quantization="binary")
+        assert "bit_hamming_ops" in binary_ddl
+
+        # La consulta debe usar la misma expresion que el indice
+        assert ann_distance_sql("halfvec").startswith("(embedding::halfvec(768)) <=>")
+        assert "<~>" in ann_distance_sql("binary")
+        assert index_name("hnsw", "binary") == "ix_document_embeddings_embedding_binary_hnsw"
+
+        with pytest.raises(ValueError):
+            _index_ddl("hnsw", "ix_test", quantization="int8")
+
+    def test_recommended_ivfflat_lists(self):
+        """Test de la heuristica de cantidad de listas"""
+        from backend.utils.db_schema import recommended_ivfflat_lists
+
+        assert recommended_ivfflat_lists(500) == 1
+        assert recommended_ivfflat_lists(100_000) == 100
+        assert recommended_ivfflat_lists(4_000_000) == 2000
+
+    def test_rebuild_ivfflat_skips_other_index_types(self):
+        """Test de que el rebuild no crea un IVFFlat cuando el indice configurado es HNSW"""
+        from backend.utils import db_schema
+
+        engine = MagicMock()
+        with patch.object(db_schema, "VECTOR_INDEX_TYPE", "hnsw"):
+            assert db_schema.rebuild_ivfflat_index(engine, lists=10) is None
+        engine.execution_options.assert_not_called()
+
+
+class TestBulkWriterUnits:
+    """Tests unitarios para el escritor masivo de chunks"""
+
+    def test_format_copy_row_escapes_text(self):
+        """Test del escape de tabs, saltos de linea y backslashes en formato COPY"""
+        from backend.utils.bulk_writer import format_copy_row
+
+        row = {
+            "doc_id": "doc-1",
+            "chunk_id": "chunk-1",
+            "text": "Linea 1\nCol\tA \\ fin",
+            "embedding": [0.5, -1.0],
+        }
+        line = format_copy_row(row)
+
+        assert line.endswith("\n")
+        columns = line[:-1].split("\t")
+        assert columns[:4] == ["doc-1", "chunk-1", "Linea 1\\nCol\\tA \\\\ fin", "[0.5,-1.0]"]
+        assert columns[4:] == ["\\N", "\\N"]
+
+    def test_write_chunk_batches_values_fallback(self):
+        """Test del fallback a INSERT multi-fila cuando el cursor no soporta COPY"""
+        from backend.utils import bulk_writer
+
+        cursor = object()
+        batches = []
+        with patch.object(bulk_writer, "_values_batch", lambda cur, batch, columns: batches.append(len(batch))):
+            rows = ({"doc_id": "d", "chunk_id": str(i), "text": "t", "embedding": [0.0]} for i in range(5))
+            stats = bulk_writer.write_chunk_batches(cursor, rows, batch_size=2, method="copy")
+
+        assert batches == [2, 2, 1]
+        assert stats["rows"] == 5
+        assert stats["method"] == "values"
+
+
+class TestEmbeddingCacheUnits:
+    """Tests unitarios para el cache de embeddings por hash de contenido"""
+
+    def test_content_hash_ignores_formatting(self):
+        """Test de que cambios de espacios no alteran el hash"""
+        from backend.utils.embedding_cache import content_hash
+
+        assert content_hash("Hola   mundo\n") == content_hash(" Hola mundo")
+        assert content_hash("Hola mundo") != content_hash("Hola mundo!")
+        assert content_hash("Hola", model_name="a") != content_hash("Hola", model_name="b")
+
+    def test_embed_texts_cached_only_embeds_misses(self):
+        """Test de que solo se embeben los chunks que no estan en cache"""
+        from backend.utils import embedding_cache
+
+        cached_hash = embedding_cache.content_hash("chunk viejo")
+
+        with patch.object(embedding_cache, "embed_texts", return_value=[[0.2]]) as mock_embed, \
+             patch.object(embedding_cache, "lookup_embeddings", return_value={cached_hash: [0.1]}), \
+             patch.object(embedding_cache, "store_embeddings") as mock_store:
+            result = embedding_cache.embed_texts_cached(["chunk viejo", "chunk nuevo", "chunk nuevo"])
+
+        assert result == [[0.1], [0.2], [0.2]]
+        mock_embed.assert_called_once_with(["chunk nuevo"])
+        mock_store.assert_called_once()
+
+
+class TestVersionedIngestionUnits:
+    """Tests unitarios para la re-ingesta incremental de documentos"""
+
+    def test_diff_chunks(self):
+        """Test del diff por hash: se reutilizan, borran e insertan los chunks correctos"""
+        from backend.utils.versioned_ingestion import diff_chunks
+
+        existing = [(10, "a", 0), (11, "b", 1), (12, "c", 2), (13, "b", 3)]
+        diff = diff_chunks(existing, ["a", "x", "b", "c"])
+
+        assert diff["keep"] == [(10, 0), (11, 2), (12, 3)]
+        assert diff["delete"] == [13]
+        assert diff["insert"] == [1]
+
+    def test_diff_chunks_legacy_rows_without_hash(self):
+        """Test de que las filas sin hash (ingestas viejas) se reemplazan"""
+        from backend.utils.versioned_ingestion import diff_chunks
+
+        diff = diff_chunks([(1, None, None), (2, None, None)], ["a"])
+
+        assert diff["keep"] == []
+        assert sorted(diff["delete"]) == [1, 2]
+        assert diff["insert"] == [0]
+
+
+class TestQueryCacheUnits:
+    """Tests unitarios para el cache LRU de embeddings de consultas"""
+
+    def test_lru_eviction_and_stats(self):
+        """Test de expulsion LRU y conteo de hits/misses"""
+        from backend.utils.query_cache import QueryEmbeddingCache
+
+        cache = QueryEmbeddingCache(max_size=2, ttl_seconds=0, path="")
+        cache.set("a", [1.0])
+        cache.set("b", [2.0])
+        assert cache.get("a") == [1.0]
+        cache.set("c", [3.0])  # expulsa "b", el menos usado
+
+        assert cache.get("b") is None
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["evictions"] == 1
+
+    def test_ttl_expiration(self):
+        """Test de expiracion por TTL"""
+        from backend.utils import query_cache
+
+        cache = query_cache.QueryEmbeddingCache(max_size=10, ttl_seconds=60, path="")
+        with patch.object(query_cache.time, "time", return_value=1000.0):
+            cache.set("horario", [0.5])
+        with patch.object(query_cache.time, "time", return_value=1100.0):
+            assert cache.get("horario") is None
+
+    def test_disk_backing_is_shared(self, tmp_path):
+        """Test de que dos instancias comparten el backing en disco"""
+        from backend.utils.query_cache import QueryEmbeddingCache, normalize_query
+
+        path = str(tmp_path / "query_cache.sqlite")
+        writer = QueryEmbeddingCache(max_size=10, ttl_seconds=0, path=path)
+        writer.set(normalize_query("  ¿Cuál es el   HORARIO?"), [0.25, 0.5])
+
+        reader = QueryEmbeddingCache(max_size=10, ttl_seconds=0, path=path)
+        assert reader.get("¿cuál es el horario?") == [0.25, 0.5]
+        assert reader.stats()["disk_hits"] == 1
+
+
+class TestAnswerCacheUnits:
+    """Tests unitarios para el cache semantico de respuestas"""
+
+    @staticmethod
+    def _session_with(entry, similarity):
+        row = Mock(SemanticAnswerCache=entry, distance=1.0 - similarity)
+        db = MagicMock()
+        db.query.return_value.filter.return_value.order_by.return_value.limit.return_value.first.return_value = row
+        return db
+
+    def test_different_entity_does_not_share_answer(self):
+        """Test de que dos preguntas casi identicas sobre planes distintos no comparten respuesta"""
+        from backend.utils import answer_cache
+
+        # "¿Cuánto cuesta el plan Basic?" ya respondida; "¿Cuánto cuesta el plan Pro?" queda a 0.99
+        entry = Mock(answer="El plan Basic cuesta $10", query_text="¿Cuánto cuesta el plan Basic?",
+                     chunk_ids=["precio-basic", "precio-pro", "medios-de-pago"], hits=0)
+        with patch.object(answer_cache, "SessionLocal", return_value=self._session_with(entry, 0.99)):
+            other_plan = answer_cache.lookup_answer([0.1] * 768, ["precio-pro", "precio-basic", "medios-de-pago"])
+        with patch.object(answer_cache, "SessionLocal", return_value=self._session_with(entry, 0.99)):
+            paraphrase = answer_cache.lookup_answer([0.1] * 768, ["precio-basic", "precio-pro", "medios-de-pago"])
+
+        assert other_plan is None
+        assert paraphrase["answer"] == "El plan Basic cuesta $10"
+
+    def test_opt_in_and_strict_threshold(self):
+        """Test de que el cache es opcional y el umbral por defecto es estricto"""
+        from backend.utils import answer_cache
+
+        assert answer_cache.SEMANTIC_CACHE_THRESHOLD >= 0.98
+        assert not answer_cache.sources_match([], ["a"])
+        assert not answer_cache.sources_match(["a", "b", "c", "d"], ["a", "x", "y", "z"])
+
+
+class TestHybridSearchUnits:
+    """Tests unitarios para la busqueda hibrida (texto completo + vectores)"""
+
+    def test_build_tsquery(self):
+        """Test de que la consulta se convierte en un OR de terminos validos"""
+        from backend.utils.hybrid_search import build_tsquery
+
+        assert build_tsquery("¿Qué es el error E-4012?") == "qué | es | el | error | e | 4012"
+        assert build_tsquery("plan PRO, plan pro") == "plan | pro"
+        assert build_tsquery("¿?!") == ""
+        assert "&" not in build_tsquery("a & b | !c")
+
+    def test_text_search_available_rechecks_until_column_exists(self):
+        """Test de que sin la columna text_search se re-consulta solo tras el intervalo"""
+        from backend.utils import hybrid_search
+
+        state = {"available": False, "checked_at": None}
+        with patch.object(hybrid_search, "_text_search", state), \
+                patch.object(hybrid_search, "engine", MagicMock()), \
+                patch.object(hybrid_search, "has_text_search", return_value=False) as has_column:
+            assert hybrid_search.text_search_available() is False
+            assert hybrid_search.text_search_available() is False
+            assert has_column.call_count == 1
+
+            state["checked_at"] -= hybrid_search.TEXT_SEARCH_RECHECK_SECONDS
+            has_column.return_value = True
+            assert hybrid_search.text_search_available() is True
+            assert hybrid_search.text_search_available() is True
+            assert has_column.call_count == 2
+
+
+class TestMmapIndexUnits:
+    """Tests unitarios para el indice vectorial mapeado en memoria"""
+
+    def test_generation_roundtrip_and_search(self, tmp_path):
+        """Test de escritura de una generacion y busqueda top-k sobre el mmap"""
+        import numpy as np
+        from backend.utils.mmap_index import _Generation, _GenerationWriter, top_k_scores
+
+        rng = np.random.default_rng(0)
+        embeddings = rng.standard_normal((20, 768)).astype(np.float32)
+        rows = [(i + 1, f"doc-{i % 3}", f"chunk-{i}", f"texto ñ {i}", embeddings[i]) for i in range(20)]
+
+        path = str(tmp_path / "gen-1")
+        writer = _GenerationWriter(path, len(rows), "float32")
+        writer.append_rows(rows)
+        writer.close({"generation": 1, "max_id": 20, "doc_versions": {}})
+
+        with open(f"{path}/manifest.json") as f:
+            generation = _Generation(path, json.load(f))
+        assert isinstance(generation.vectors, np.memmap)
+        assert generation.record(7) == {"doc_id": "doc-1", "chunk_id": "chunk-7", "text": "texto ñ 7"}
+        assert generation.manifest["docs"] == ["doc-0", "doc-1", "doc-2"]
+
+        positions, similarities = top_k_scores(generation.vectors, embeddings[7] / np.linalg.norm(embeddings[7]), 3)
+        assert positions[0] == 7
+        assert similarities[0] == pytest.approx(1.0, abs=1e-5)
+
+    def test_int8_keeps_ranking(self):
+        """Test de que la cuantizacion int8 conserva el orden del top-k"""
+        import numpy as np
+        from backend.utils.mmap_index import normalize_rows, quantize_int8, top_k_scores
+
+        rng = np.random.default_rng(1)
+        vectors = normalize_rows(rng.standard_normal((500, 768)))
+        query = normalize_rows(vectors[42] + 0.1 * rng.standard_normal(768))
+        quantized, scales = quantize_int8(vectors)
+
+        exact, _ = top_k_scores(vectors, query, 5)
+        approximate, _ = top_k_scores(quantized, query, 5, scales)
+        assert approximate[0] == exact[0] == 42
+        assert len(set(exact) & set(approximate)) >= 4
+
+    def test_changed_documents(self):
+        """Test de que los documentos nuevos, re-versionados o borrados se re-exportan"""
+        from backend.utils.mmap_index import changed_documents
+
+        base = {"doc-a": 1, "doc-b": 2, "doc-c": 1}
+        current = {"doc-a": 1, "doc-b": 3, "doc-d": 1}
+        assert sorted(changed_documents(base, current)) == ["doc-b", "doc-c", "doc-d"]
+        assert changed_documents(base, dict(base)) == []
+
+
+class TestStreamingIngestionUnits:
+    """Tests unitarios para la ingesta en streaming"""
+
+    def test_text_blocks_cut_at_boundaries(self):
+        """Test de que los bloques no cortan palabras y conservan todo el texto"""
+        from backend.utils.streaming_ingestion import iter_text_blocks
+
+        text = "\n".join(f"{i}. ¿Pregunta numero {i}? Respuesta larga numero {i}." for i in range(200))
+        pieces = [text[i:i + 37] for i in range(0, len(text), 37)]
+        blocks = list(iter_text_blocks(pieces, block_chars=500))
+
+        assert "".join(blocks) == text
+        assert all(len(block) <= 500 for block in blocks)
+        assert all(block.endswith("\n") for block in blocks[:-1])
+
+    def test_decode_stream_multibyte_split(self):
+        """Test de decodificacion incremental con caracteres partidos entre piezas"""
+        from backend.utils.streaming_ingestion import decode_stream
+
+        data = "Página ñandú ¿qué?".encode("utf-8")
+        pieces = [data[i:i + 3] for i in range(0, len(data), 3)]
+        assert "".join(decode_stream(pieces)) == "Página ñandú ¿qué?"
+
+
+class TestFaqChunkerUnits:
+    """Tests unitarios para el chunker de preguntas frecuentes"""
+
+    FAQ = (
+        "\n--- Página 1 ---\n"
+        "Preguntas Frecuentes\n"
+        "1. ¿Qué productos ofrecen?\n"
+        "Un motor predictivo y un chatbot.\n"
+        "2. **Pregunta 2**: ¿Tienen prueba gratuita?\n"
+        "**Respuesta Pregunta 2**: Sí, de 14\n"
+        "\n--- Página 2 ---\n"
+        "días con funcionalidades limitadas.\n"
+        "3. ¿Dónde están?\n"
+        "En Buenos Aires.\n"
+    )
+
+    def test_one_chunk_per_question_across_pages(self):
+        """Test de una pregunta/respuesta por chunk aunque cruce de pagina"""
+        from backend.utils.faq_chunker import chunk_faq_text
+
+        chunks = chunk_faq_text(self.FAQ, mode="auto")
+        assert len(chunks) == 3
+        assert chunks[0].startswith("Preguntas Frecuentes\n1. ¿Qué productos")
+        assert "de 14 días con funcionalidades limitadas." in chunks[1]
+        assert not any("Página" in chunk for chunk in chunks)
+
+    def test_long_answer_respects_budget(self):
+        """Test de que una respuesta larga se divide repitiendo la pregunta"""
+        from backend.utils.faq_chunker import chunk_faq_text, estimate_tokens
+
+        text = "1. ¿Qué incluye?\n" + " ".join(f"Incluye el modulo {i}." for i in range(60))
+        chunks = chunk_faq_text(text, max_tokens=60, mode="faq")
+        assert len(chunks) > 1
+        assert all(chunk.startswith("1. ¿Qué incluye?\n") for chunk in chunks)
+        assert all(estimate_tokens(chunk) <= 60 for chunk in chunks)
+
+    def test_auto_mode_falls_back_for_non_faq(self):
+        """Test de que un documento sin preguntas usa el splitter por oraciones"""
+        from backend.utils.faq_chunker import chunk_faq_text
+
+        assert chunk_faq_text("Monitor 27 pulgadas\nResolucion 2560 x 1440", mode="auto") is None
+
+    def test_auto_mode_resolved_once_per_document(self):
+        """Test de que "auto" se resuelve con el primer bloque y se mantiene para el resto"""
+        from backend.utils.faq_chunker import resolve_chunking_mode
+
+        assert resolve_chunking_mode(self.FAQ, mode="auto") == "faq"
+        assert resolve_chunking_mode("Monitor 27 pulgadas", mode="auto") == "sentence"
+        assert resolve_chunking_mode("Monitor 27 pulgadas", mode="faq") == "faq"
+
+
+class TestEmbeddingServiceUnits:
+    """Tests unitarios para el servicio de embeddings con micro-batching"""
+
+    def test_concurrent_requests_share_batches(self):
+        """Test de que pedidos concurrentes se agrupan en pocos batches"""
+        import threading
+        import time
+        from backend.utils.embedding_service import EmbeddingBatcher
+
+        calls = []
+
+        def fake_encode(texts, kind):
+            calls.append((kind, list(texts)))
+            time.sleep(0.01)
+            return [[float(len(text))] for text in texts]
+
+        batcher = EmbeddingBatcher(encode=fake_encode, max_batch_size=16, max_wait_ms=50)
+        results = {}
+
+        def worker(i):
+            results[i] = batcher.embed(["x" * i], "query")
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == {i: [[float(i)]] for i in range(1, 9)}
+        assert len(calls) < 8
+        stats = batcher.stats()
+        assert stats["embeddings"] == 8
+        assert stats["avg_batch_size"] > 1
+
+    def test_kinds_are_encoded_separately(self):
+        """Test de que consultas y chunks no se mezclan en la misma llamada al modelo"""
+        from backend.utils.embedding_service import EmbeddingBatcher
+
+        calls = []
+        batcher = EmbeddingBatcher(
+            encode=lambda texts, kind: calls.append(kind) or [[0.0] for _ in texts],
+            max_batch_size=8, max_wait_ms=20,
+        )
+        text_futures = batcher.submit(["chunk a", "chunk b"], "text")
+        query_futures = batcher.submit(["pregunta"], "query")
+        assert [f.result(timeout=2) for f in text_futures + query_futures] == [[0.0]] * 3
+        assert set(calls) == {"text", "query"}
+
+
+class TestContextAssemblyUnits:
+    """Tests unitarios para el armado adaptativo del contexto de faq_query"""
+
+    @staticmethod
+    def _doc(text, score, doc_id="doc-1", chunk_index=None, chunk_id=None):
+        return {
+            "page_content": text,
+            "type": "Document",
+            "metadata": {"doc_id": doc_id, "chunk_id": chunk_id or f"{doc_id}-{chunk_index}",
+                         "chunk_index": chunk_index, "score": score},
+        }
+
+    def test_drops_low_score_and_duplicates(self):
+        """Test de umbral de similitud y eliminacion de casi duplicados"""
+        from backend.utils.context_assembly import select_chunks
+
+        docs = [
+            self._doc("El envio demora tres dias habiles", 0.90, chunk_index=0),
+            self._doc("El envio demora tres dias habiles en total", 0.89, "doc-2", 0),
+            self._doc("Aceptamos tarjetas de credito", 0.70, "doc-3", 0),
+        ]
+        selected, stats = select_chunks(docs, min_similarity=0.75, max_gap=0.1, token_budget=1000)
+
+        assert [doc["metadata"]["doc_id"] for doc in selected] == ["doc-1"]
+        assert stats["duplicates"] == 1
+        assert stats["low_score"] == 1
+
+    def test_token_budget_keeps_best_chunk(self):
+        """Test de que el presupuesto corta el contexto pero conserva el mejor chunk"""
+        from backend.utils.context_assembly import select_chunks
+
+        docs = [self._doc("a " * 300, 0.9, chunk_index=0), self._doc("otro tema distinto", 0.88, "doc-2", 0)]
+        selected, stats = select_chunks(docs, min_similarity=0.5, token_budget=50)
+
+        assert len(selected) == 1
+        assert stats["over_budget"] == 1
+
+    def test_merges_adjacent_and_overlapping_chunks(self):
+        """Test de union de chunks contiguos sin repetir el solapamiento"""
+        from backend.utils.context_assembly import assemble_context
+
+        docs = [
+            self._doc("las devoluciones se aceptan dentro de los treinta dias", 0.85, chunk_index=4),
+            self._doc("Politica de cambios: las devoluciones se aceptan", 0.90, chunk_index=3),
+        ]
+        result = assemble_context(docs, min_similarity=0.5, duplicate_ratio=1.0)
+
+        assert result["context"] == "Politica de cambios: las devoluciones se aceptan dentro de los treinta dias"
+        assert result["passages"][0]["chunk_ids"] == ["doc-1-3", "doc-1-4"]
+        assert result["stats"]["passages"] == 1
+
+
+class TestRerankerUnits:
+    """Tests unitarios para el re-ranking con cross-encoder"""
+
+    def test_reorders_by_cross_encoder_score(self):
+        """Test de que se devuelven los top k segun el puntaje del cross-encoder"""
+        from backend.utils.reranker import rerank
+
+        texts = ["envios", "devoluciones", "garantia", "pagos"]
+        scores = {"envios": 0.1, "devoluciones": 0.9, "garantia": 0.5, "pagos": 0.2}
+        ranking, stats = rerank("como devuelvo", texts, 2, budget_ms=1000,
+                                scorer=lambda query, batch: [scores[text] for text in batch])
+
+        assert [position for position, _ in ranking] == [1, 2]
+        assert stats["status"] == "reranked"
+
+    def test_over_budget_keeps_first_stage_order(self):
+        """Test de que al exceder el presupuesto se mantiene el orden original"""
+        import time
+        from backend.utils import reranker
+
+        def slow_scorer(query, batch):
+            time.sleep(0.02)
+            return [1.0] * len(batch)
+
+        texts = [f"chunk {i}" for i in range(reranker.RERANK_BATCH_SIZE * 3)]
+        ranking, stats = reranker.rerank("consulta", texts, 3, budget_ms=10, scorer=slow_scorer)
+
+        assert ranking == [(0, None), (1, None), (2, None)]
+        assert stats["status"] == "over_budget"
+        assert stats["scored"] < len(texts)
+
+    def test_deadline_keeps_partial_scores(self):
+        """Test de que el plazo corta el lote lento y conserva los puntajes ya calculados"""
+        import time
+        from backend.utils import reranker
+
+        size = reranker.RERANK_BATCH_SIZE
+        texts = [f"chunk {i}" for i in range(size * 2)]
+
+        def scorer(query, batch):
+            if batch[0] != texts[0]:
+                time.sleep(0.5)
+            return [float(texts.index(text)) for text in batch]
+
+        start = time.perf_counter()
+        ranking, stats = reranker.rerank("consulta", texts, size + 1, budget_ms=100, scorer=scorer)
+
+        assert time.perf_counter() - start < 0.4
+        assert stats["status"] == "over_budget"
+        assert stats["scored"] == size
+        assert ranking[0] == (size - 1, float(size - 1))
+        assert ranking[-1] == (size, None)
+
+
+class TestIntentClassifierUnits:
+    """Tests unitarios para el clasificador local de intenciones"""
+
+    @staticmethod
+    def _bag_of_words(texts):
+        vocabulary = ["horario", "atencion", "correo", "email", "excel", "datos", "chiste"]
+        return [[float(word in text.lower()) + 0.01 for word in vocabulary] for text in texts]
+
+    def test_heuristics(self):
+        """Test de saludos, insultos y datos tabulares sin llamar al modelo"""
+        from backend.supervisor.intent_classifier import heuristic_intent
+
+        assert heuristic_intent("Buen día")[0] == "guardrail"
+        assert heuristic_intent("Muchas gracias")[0] == "guardrail"
+        assert heuristic_intent("Esta app es una mierda")[0] == "analisis_sentimiento"
+        assert heuristic_intent("Hola, necesito ayuda con esto: nombre,edad,ciudad")[0] == "tarea_tecnica"
+        assert heuristic_intent("¿Cuál es el horario de atención?") is None
+
+    def test_heuristics_skip_ordinary_inputs(self):
+        """Test de que palabras comunes y montos con separador de miles no se atajan"""
+        from backend.supervisor.intent_classifier import heuristic_intent
+
+        assert heuristic_intent("¿Cómo separan la basura en la oficina?") is None
+        assert heuristic_intent("El plan cuesta 1,200,000 pesos, quiero contratarlo") is None
+        assert heuristic_intent("Cargá estas filas: juan,30,cordoba")[0] == "tarea_tecnica"
+
+    def test_confirmations_skip_small_talk_fast_path(self):
+        """Test de que las confirmaciones no se clasifican como charla sin ver el contexto"""
+        from backend.supervisor.intent_classifier import heuristic_intent
+
+        for reply in ("Sí", "no", "Dale", "Ok", "listo, perfecto", "sí, gracias"):
+            assert heuristic_intent(reply) is None
+
+    def test_knn_short_circuits_and_reports_stats(self):
+        """Test de que el kNN decide los casos claros y deriva los dudosos al LLM"""
+        from backend.supervisor.intent_classifier import IntentClassifier
+
+        examples = [
+            ("horario de atencion", "consulta_documento"),
+            ("cual es el horario", "consulta_documento"),
+            ("escribi un correo", "generar_email"),
+            ("redacta un email", "generar_email"),
+        ]
+        classifier = IntentClassifier(examples, embed=self._bag_of_words, k=2, threshold=0.8, min_similarity=0.5)
+
+        confident = classifier.predict("¿Cuál es el horario de atención?")
+        unknown = classifier.predict("Contame un chiste")
+        classifier.record_llm_call(800.0)
+
+        assert confident.label == "consulta_documento"
+        assert confident.confident and confident.source == "knn"
+        assert not unknown.confident
+        stats = classifier.stats()
+        assert stats["requests"] == 2
+        assert stats["short_circuit_rate"] == 0.5
+        assert stats["avg_llm_ms"] == 800.0
+
+
+class TestSupervisorPolicyUnits:
+    """Tests unitarios para las reglas deterministas del supervisor"""
+
+    def test_rules_skip_the_llm(self):
+        """Test de que sentiment_agent y el limite de saltos no llaman al LLM"""
+        from backend.supervisor.policy import decide_next_step
+
+        llm = Mock(return_value="rag_agent")
+        sentiment = decide_next_step("sentiment_agent", {"sentiment_agent": 1}, 1, llm)
+        hop_limit = decide_next_step("rag_agent", {"rag_agent": 2, "email_agent": 1}, 3, llm, max_hops=3)
+
+        assert (sentiment["decision"], sentiment["path"], sentiment["rule"]) == ("guardrail", "rule", "sentiment_final")
+        assert (hop_limit["decision"], hop_limit["rule"]) == ("guardrail", "hop_limit")
+        llm.assert_not_called()
+
+    def test_exhausted_agents_and_enforced_limits(self):
+        """Test de agentes agotados y de una decision del LLM que excede el limite"""
+        from backend.supervisor.policy import decide_next_step
+
+        limits = {"rag_agent": 2, "email_agent": 1}
+        exhausted = decide_next_step("email_agent", {"rag_agent": 2, "email_agent": 1}, 3,
+                                     Mock(), limits=limits, max_hops=10)
+        overridden = decide_next_step("email_agent", {"rag_agent": 1, "email_agent": 1}, 2,
+                                      Mock(return_value="email_agent"), limits=limits, max_hops=10)
+        allowed = decide_next_step("email_agent", {"rag_agent": 1, "email_agent": 1}, 2,
+                                   Mock(return_value="rag_agent"), limits=limits, max_hops=10)
+
+        assert exhausted["rule"] == "all_exhausted"
+        assert (overridden["decision"], overridden["path"], overridden["rule"]) == ("guardrail", "llm", "limit_enforced")
+        assert (allowed["decision"], allowed["path"]) == ("rag_agent", "llm")
+
+
+class TestFanoutPolicyUnits:
+    """Tests unitarios para el modo fan-out del supervisor"""
+
+    def test_only_independent_intents_fan_out(self):
+        """Test de que las tareas dependientes y el sentimiento siguen la cadena secuencial"""
+        from backend.supervisor.policy import fanout_agents
+
+        agents = ["rag_agent", "email_agent"]
+        independent = "¿Cuál es el horario? Y aparte redactame un correo pidiendo una reunión"
+
+        assert fanout_agents(agents, False, independent) == agents
+        assert fanout_agents(agents, True, independent) == []
+        assert fanout_agents(agents, False, "Buscá la política de envíos y mandala por correo") == []
+        assert fanout_agents(["rag_agent"], False, independent) == []
+        assert fanout_agents(["sentiment_agent", "email_agent"], False, independent) == []
+
+    def test_merged_branches_go_to_guardrail(self):
+        """Test de que despues del merge el supervisor no llama al LLM"""
+        from backend.supervisor.policy import decide_next_step
+
+        llm = Mock(return_value="tech_agent")
+        entry = decide_next_step("rag_agent, email_agent", {"rag_agent": 1, "email_agent": 1}, 2, llm,
+                                 max_hops=10, fanout=True)
+
+        assert (entry["decision"], entry["rule"]) == ("guardrail", "fanout_complete")
+        llm.assert_not_called()
+
+
+class TestStreamingUnits:
+    """Tests unitarios para el streaming de la respuesta final"""
+
+    def test_sentence_buffer_releases_complete_sentences(self):
+        """Test de que los tokens se liberan por oracion sin perder texto"""
+        from backend.moderation.streaming import SentenceBuffer
+
+        buffer = SentenceBuffer(max_chars=40)
+        tokens = ["Hola, el hora", "rio es de 9 a 18. ", "¿Algo ", "más?\nSaludos y ", "gracias por escribir a soporte tecnico hoy"]
+        sentences = [sentence for token in tokens for sentence in buffer.feed(token)]
+        sentences += buffer.flush()
+
+        assert sentences[:2] == ["Hola, el horario es de 9 a 18. ", "¿Algo más?\n"]
+        assert all(len(sentence) <= 41 for sentence in sentences)
+        assert "".join(sentences) == "".join(tokens)
+        assert buffer.flush() == []
+
+    def test_bilingual_lines(self):
+        """Test de que cada linea 'es ||| en' se libera entera y se separa la traduccion"""
+        from backend.moderation.streaming import LINE_END_RE, SentenceBuffer, split_bilingual
+
+        buffer = SentenceBuffer(max_chars=None, pattern=LINE_END_RE)
+        tokens = ["¡Hola! Con gusto te ", "ayudo. ||| Hi! I'm happy", " to help.\nEl plan cuesta 10. |||", " It costs 10.\nSin traduccion"]
+        lines = [line for token in tokens for line in buffer.feed(token)] + buffer.flush()
+
+        assert [split_bilingual(line) for line in lines] == [
+            ("¡Hola! Con gusto te ayudo.", "Hi! I'm happy to help."),
+            ("El plan cuesta 10.", "It costs 10."),
+            ("Sin traduccion", None),
+        ]
+
+    def test_stream_latency_stats(self):
+        """Test de los percentiles de time-to-first-token"""
+        from backend.moderation.streaming import StreamLatencyStats
+
+        stats = StreamLatencyStats()
+        for ttft in (100, 200, 300):
+            stats.record(ttft, ttft * 4)
+        stats.record(None, 50, filtered=1)
+
+        result = stats.stats()
+        assert (result["requests"], result["filtered_sentences"]) == (4, 1)
+        assert result["ttft_ms"]["p50"] == 200.0
+        assert result["total_ms"]["mean"] == 612.5
+
+
+class TestToolCatalogUnits:
+    """Tests unitarios para el cache de catálogos de herramientas MCP"""
+
+    def test_ttl_invalidation_and_single_fetch(self):
+        """Test de TTL, invalidación por list_changed y una sola consulta concurrente"""
+        import asyncio
+        from backend.utils.tool_catalog import ToolCatalog
+
+        now = {"t": 0.0}
+        calls = []
+
+        async def fetch(url):
+            calls.append(url)
+            await asyncio.sleep(0.01)
+            return [{"name": f"tool_{len(calls)}", "description": ""}]
+
+        catalog = ToolCatalog(fetch, ttl=60, clock=lambda: now["t"])
+
+        async def scenario():
+            first = await asyncio.gather(*[catalog.get("http://rag") for _ in range(10)])
+            now["t"] = 30
+            cached = await catalog.get("http://rag")
+            catalog.invalidate("http://rag")
+            invalidated = await catalog.get("http://rag")
+            now["t"] = 100
+            expired = await catalog.get("http://rag")
+            return first, cached, invalidated, expired
+
+        first, cached, invalidated, expired = asyncio.run(scenario())
+        assert len(calls) == 3
+        assert {tools[0]["name"] for tools in first} == {"tool_1"}
+        assert cached[0]["name"] == "tool_1"
+        assert invalidated[0]["name"] == "tool_2"
+        assert expired[0]["name"] == "tool_3"
+
+    def test_last_known_catalog_when_unreachable(self):
+        """Test de que se usa el último catálogo si el servidor no responde"""
+        import asyncio
+        from backend.utils.tool_catalog import ToolCatalog
+
+        now = {"t": 0.0}
+        state = {"up": True, "calls": 0}
+
+        async def fetch(url):
+            state["calls"] += 1
+            if not state["up"]:
+                raise ConnectionError("server down")
+            return [{"name": "summarize_text", "description": ""}]
+
+        catalog = ToolCatalog(fetch, ttl=60, retry=10, clock=lambda: now["t"])
+
+        async def scenario():
+            await catalog.get("http://tech")
+            state["up"] = False
+            now["t"] = 61
+            fallback = await catalog.get("http://tech")
+            again = await catalog.get("http://tech")
+            with pytest.raises(ConnectionError):
+                await catalog.get("http://email")
+            return fallback, again
+
+        fallback, again = asyncio.run(scenario())
+        assert fallback == again == [{"name": "summarize_text", "description": ""}]
+        # The second request is served without retrying the unreachable server
+        assert state["calls"] == 3
+        assert catalog.stats["fallbacks"] == 1
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])